@@ -1,8 +1,12 @@
 from tkinter import Entry, Label, Tk, Button, Text
 from tkinter.ttk import Progressbar, Combobox
-from zaber_motion import Units, MotionLibException
-from zaber_motion.ascii import Axis
-import constants, math
+from zaber_motion import Units, MotionLibException, Measurement
+from zaber_motion.ascii import Axis, DigitalOutputAction
+from zaber_motion.gcode import Translator
+from enum import IntEnum
+from gcodeparser import parse_gcode_lines
+import numpy as np
+import constants, csv, datetime, hashlib, io, json, math, os, queue, threading, time
 
 
 class EntryWithPlaceholder(Entry):
@@ -112,9 +116,16 @@ class Device:
         self.axisz = axisz
         self.axisrot = axisrot
         self.axes = [self.axisx, self.axisy, self.axisz, self.axisrot]
+        self.monitor = None
+        self.axis_units = {
+            "x": (self.axisx, Units.LENGTH_MILLIMETRES),
+            "y": (self.axisy, Units.LENGTH_MILLIMETRES),
+            "z": (self.axisz, Units.LENGTH_MILLIMETRES),
+            "rot": (self.axisrot, Units.ANGLE_RADIANS),
+        }
 
-    def get_current_positions(self):
-        """Returns the current positions of all axes.
+    def read_positions(self):
+        """Reads the current positions of all axes from the device.
 
         Returns:
             list: A list containing the current positions of the axes:
@@ -129,21 +140,108 @@ class Device:
         rot_pos = self.axisrot.get_position(Units.NATIVE)
         return [x_pos, y_pos, z_pos, rot_pos]
 
-    def extract_axes(self):
+    def get_current_positions(self, max_age=None, since=0.0):
+        """Returns the current positions of all axes.
+
+        If the position monitor is running and `max_age` is given, the latest
+        snapshot is returned without querying the device, provided it is at most
+        `max_age` seconds old and was taken after `since`. Otherwise the positions
+        are read from the device.
+
+        Args:
+            max_age (float): Maximum snapshot age in seconds. Defaults to None (always read).
+            since (float): `time.monotonic()` timestamp the snapshot must be newer than,
+                e.g. the end of the last blocking move. Defaults to 0.0.
+
+        Returns:
+            list: A list containing the current positions of the axes:
+                - Index 0: X position in millimeters (float).
+                - Index 1: Y position in millimeters (float).
+                - Index 2: Z position in millimeters (float).
+                - Index 3: Rotation position in native units (float).
+        """
+        if max_age is not None and self.monitor is not None:
+            positions, timestamp = self.monitor.snapshot()
+            if (
+                positions is not None
+                and timestamp >= since
+                and time.monotonic() - timestamp <= max_age
+            ):
+                return positions
+        return self.read_positions()
+
+    def start_monitor(self, interval=constants.POSITION_POLL_INTERVAL):
+        """Starts polling the axis positions in the background.
+
+        Args:
+            interval (float): Seconds between polls. Defaults to `constants.POSITION_POLL_INTERVAL`.
+
+        Returns:
+            PositionMonitor: The running monitor.
+        """
+        if self.monitor is None:
+            self.monitor = PositionMonitor(self, interval)
+            self.monitor.start()
+        return self.monitor
+
+    def stop_monitor(self):
+        """Stops the background position polling.
+
+        Returns:
+            None
+        """
+        if self.monitor is not None:
+            self.monitor.stop()
+            self.monitor = None
+
+    def move_groups(self, targets: dict, order):
+        """Moves the axes to absolute positions, group by group.
+
+        All moves of a group are started at once and waited for together, so a group
+        takes as long as its slowest axis. A group starts only after the previous one
+        is idle. Axes missing from `order` are moved in a final group.
+
+        Args:
+            targets (dict): Target positions keyed by axis name ("x", "y", "z", "rot").
+                X, Y and Z are in millimeters, rotation is in radians.
+            order (tuple): Groups of axis names, e.g. (("z",), ("x", "y")).
+
+        Returns:
+            None
+        """
+        listed = [name for group in order for name in group]
+        groups = list(order) + [[name for name in targets if name not in listed]]
+        for group in groups:
+            moving = []
+            for name in group:
+                if name not in targets:
+                    continue
+                axis, unit = self.axis_units[name]
+                axis.move_absolute(targets[name], unit, wait_until_idle=False)
+                moving.append(axis)
+            for axis in moving:
+                axis.wait_until_idle()
+
+    def extract_axes(self, order=constants.EXTRACT_ORDER):
         """Moves the axes to their maximum positions.
 
         This method moves the z-axis, y-axis, and x-axis to their respective
         maximum positions defined in the `constants` module. The units used
-        for the movements are millimeters.
+        for the movements are millimeters. By default Z clears before X and Y
+        start, which then move together.
+
+        Args:
+            order (tuple): Axis groups to move one after another. Defaults to
+                `constants.EXTRACT_ORDER`.
 
         Returns:
             None
         """
-        self.axisz.move_absolute(constants.Z_MAX, Units.LENGTH_MILLIMETRES)
-        self.axisy.move_absolute(constants.Y_MAX, Units.LENGTH_MILLIMETRES)
-        self.axisx.move_absolute(constants.X_MAX, Units.LENGTH_MILLIMETRES)
+        self.move_groups(
+            {"x": constants.X_MAX, "y": constants.Y_MAX, "z": constants.Z_MAX}, order
+        )
 
-    def set_axes(self, x_pos, y_pos, z_pos, rot_pos):
+    def set_axes(self, x_pos, y_pos, z_pos, rot_pos, order=constants.SET_ORDER):
         """Moves the axes to specified positions.
 
         Args:
@@ -151,14 +249,13 @@ class Device:
             y_pos (float): The target position for the Y-axis in millimeters.
             z_pos (float): The target position for the Z-axis in millimeters.
             rot_pos (float): The target position for the rotational axis in native units.
+            order (tuple): Axis groups to move one after another. Defaults to
+                `constants.SET_ORDER`.
 
         Returns:
             None
         """
-        self.axisx.move_absolute(x_pos, Units.LENGTH_MILLIMETRES)
-        self.axisy.move_absolute(y_pos, Units.LENGTH_MILLIMETRES)
-        self.axisz.move_absolute(z_pos, Units.LENGTH_MILLIMETRES)
-        self.axisrot.move_absolute(rot_pos, Units.ANGLE_RADIANS)
+        self.move_groups({"x": x_pos, "y": y_pos, "z": z_pos, "rot": rot_pos}, order)
 
     def stop_axes(self):
         """Stops all axis movements.
@@ -310,6 +407,1148 @@ class Device:
         )
 
 
+class LaserGate:
+    """
+    Switch the laser with a digital output or by moving Z in and out of focus
+    """
+
+    def __init__(
+        self, device: Device, mode=constants.LASER_GATE, focus_z=constants.INITIAL_Z
+    ):
+        """Initializes the gate.
+
+        In "digital" mode the laser is switched with output `constants.LASER_CHANNEL` of
+        the device driving `constants.LASER_AXIS`, and Z stays at focus. In "z" mode the
+        laser is switched by moving Z between the focus height and `constants.Z_MAX`.
+
+        Args:
+            device (Device): The device object controlling the axes, or None to only
+                compile programs for the gate.
+            mode (str): "digital" or "z". Defaults to `constants.LASER_GATE`.
+            focus_z (float): The focus height in millimeters. Defaults to `constants.INITIAL_Z`.
+
+        Returns:
+            None
+        """
+        if mode not in {"digital", "z"}:
+            raise ValueError("Unknown laser gate: {}".format(mode))
+        self.device = device
+        self.mode = mode
+        self.focus_z = focus_z
+        self.channel = constants.LASER_CHANNEL
+        self.io_device = None
+        if device is not None:
+            self.io_device = device.axis_units[constants.LASER_AXIS][0].device
+
+    @property
+    def digital(self):
+        """Whether the laser is switched with a digital output."""
+        return self.mode == "digital"
+
+    def z_target(self, on: bool, z=None):
+        """Returns the Z position of the laser state in "z" mode.
+
+        Args:
+            on (bool): The laser state.
+            z (float): The focus height to use instead of `focus_z`. Defaults to None.
+
+        Returns:
+            float: The Z position in millimeters.
+        """
+        if not on:
+            return constants.Z_MAX
+        return self.focus_z if z is None else z
+
+    def move_z(self, position):
+        """Moves Z to a position in millimeters, printing any MotionLibException.
+
+        Returns:
+            None
+        """
+        self.device.move_try_except(
+            axis=self.device.axisz,
+            type="move_absolute",
+            position=position,
+            unit=Units.LENGTH_MILLIMETRES,
+        )
+
+    def set_output(self, action, stream=None):
+        """Sets the laser output, inside `stream` if given.
+
+        Returns:
+            None
+        """
+        try:
+            io = self.io_device.io if stream is None else stream.io
+            io.set_digital_output(self.channel, action)
+        except MotionLibException as err:
+            print(err)
+
+    def setup(self):
+        """Turns the laser off and, in "digital" mode, moves Z to focus.
+
+        Returns:
+            None
+        """
+        self.off()
+        if self.digital:
+            self.move_z(self.focus_z)
+
+    def on(self, stream=None, z=None):
+        """Turns the laser on.
+
+        Args:
+            stream: Stream to queue the output change in ("digital" mode). Defaults to None.
+            z (float): Focus height to move to first, e.g. per Fresnel ring. Defaults to None.
+
+        Returns:
+            None
+        """
+        if self.digital:
+            if z is not None:
+                self.move_z(z)
+            self.set_output(DigitalOutputAction.ON, stream)
+        else:
+            self.move_z(self.z_target(True, z))
+
+    def off(self, stream=None):
+        """Turns the laser off.
+
+        Args:
+            stream: Stream to queue the output change in ("digital" mode). Defaults to None.
+
+        Returns:
+            None
+        """
+        if self.digital:
+            self.set_output(DigitalOutputAction.OFF, stream)
+        else:
+            self.move_z(constants.Z_MAX)
+
+    def finish(self):
+        """Turns the laser off and retracts Z.
+
+        Returns:
+            None
+        """
+        self.off()
+        self.move_z(constants.Z_MAX)
+
+
+class PositionMonitor:
+    """
+    Keep the latest axis positions of a device up to date in a background thread
+    """
+
+    def __init__(self, device: Device, interval=constants.POSITION_POLL_INTERVAL):
+        """Initializes the monitor without starting it.
+
+        Args:
+            device (Device): The device to poll.
+            interval (float): Seconds between polls. Defaults to `constants.POSITION_POLL_INTERVAL`.
+
+        Returns:
+            None
+        """
+        self.device = device
+        self.interval = interval
+        self.positions = None
+        self.timestamp = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the polling thread.
+
+        Returns:
+            None
+        """
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.poll, name="PositionMonitor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops the polling thread and waits for it to exit.
+
+        Returns:
+            None
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(1)
+            self._thread = None
+
+    def poll(self):
+        """Reads the positions every `interval` seconds until stopped.
+
+        Each snapshot is stamped with `time.monotonic()` taken before the reads,
+        so the positions are at least as new as the timestamp.
+
+        Returns:
+            None
+        """
+        while not self._stop_event.is_set():
+            timestamp = time.monotonic()
+            try:
+                positions = self.device.read_positions()
+                with self._lock:
+                    self.positions = positions
+                    self.timestamp = timestamp
+            except MotionLibException as err:
+                print(err)
+            self._stop_event.wait(self.interval)
+
+    def snapshot(self):
+        """Returns the latest positions and their timestamp without blocking.
+
+        Returns:
+            tuple: (positions, timestamp). Positions are None before the first poll.
+        """
+        with self._lock:
+            positions = None if self.positions is None else list(self.positions)
+            return positions, self.timestamp
+
+
+class LogStatus(IntEnum):
+    """
+    Status of the Avg_X_Velocity column in binary run logs
+    """
+
+    VALUE = 0
+    EMPTY = 1
+    PASSED = 2
+    ERROR = 3
+
+
+# Binary Run Log Record (One per constants.log_head Row)
+LOG_DTYPE = np.dtype(
+    [
+        ("n", "<i4"),
+        ("power", "<f8"),
+        ("x_position", "<f8"),
+        ("x_velocity", "<f8"),
+        ("y_position", "<f8"),
+        ("y_velocity", "<f8"),
+        ("avg_x_velocity", "<f8"),
+        ("status", "u1"),
+        ("initial_x", "<f8"),
+        ("initial_y", "<f8"),
+        ("initial_z", "<f8"),
+        ("initial_rot", "<f8"),
+    ]
+)
+
+
+def log_records(rows):
+    """Converts log rows to binary run log records.
+
+    Status strings of the Avg_X_Velocity column go to the `status` column and
+    leave NaN as the velocity.
+
+    Args:
+        rows (list): Rows in the `constants.log_head` layout.
+
+    Returns:
+        numpy.ndarray: Records with dtype `LOG_DTYPE`.
+    """
+    records = np.zeros(len(rows), dtype=LOG_DTYPE)
+    for i, row in enumerate(rows):
+        row = list(row)
+        status = LogStatus.VALUE
+        if isinstance(row[6], str):
+            status = LogStatus[row[6]]
+            row[6] = math.nan
+        records[i] = tuple(row[:7]) + (status,) + tuple(row[7:])
+    return records
+
+
+class RunLogger:
+    """
+    Stream log rows to a dated CSV file from a background thread
+    """
+
+    def __init__(
+        self,
+        log_head,
+        folder=constants.LOG_FOLDER,
+        queue_size=constants.LOG_QUEUE_SIZE,
+        batch_size=constants.LOG_BATCH_SIZE,
+        records=constants.LOG_RECORDS,
+    ):
+        """Opens the log file and starts the writer thread.
+
+        Creates a CSV file named with the current date and time under a folder
+        named with the current date, writes the header and starts writing rows.
+        With `records`, the rows are also appended to a `.rec` file of `LOG_DTYPE`
+        records, which `functions.read_run_log` memory-maps.
+
+        Args:
+            log_head (list): The header row for the CSV file.
+            folder (str): The root folder of the logs. Defaults to `constants.LOG_FOLDER`.
+            queue_size (int): Maximum rows waiting to be written. Defaults to `constants.LOG_QUEUE_SIZE`.
+            batch_size (int): Maximum rows written per flush. Defaults to `constants.LOG_BATCH_SIZE`.
+            records (bool): Whether to write the binary records. Defaults to `constants.LOG_RECORDS`.
+
+        Returns:
+            None
+        """
+        now = datetime.datetime.now()
+        date_folder = os.path.join(folder, now.strftime("%d-%m-%Y"))
+        if not os.path.exists(date_folder):
+            os.makedirs(date_folder)
+        self.file_path = os.path.join(
+            date_folder, "{}.csv".format(now.strftime("%Y-%m-%d_%H-%M-%S"))
+        )
+
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.error = None
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open(self.file_path, "w", newline="\n")
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(log_head)
+        self._file.flush()
+
+        self._records = None
+        if records:
+            self._records = open(os.path.splitext(self.file_path)[0] + ".rec", "wb")
+
+        self._thread = threading.Thread(target=self.write, name="RunLogger")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def log(self, row):
+        """Queues a row for writing without ever waiting for the disk.
+
+        Rows that find `queue_size` rows already waiting are dropped and counted
+        in `dropped`.
+
+        Args:
+            row (list): The row to write.
+
+        Returns:
+            bool: True if the row was queued.
+        """
+        if self._thread is None:
+            raise ValueError("Log is closed: {}".format(self.file_path))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._drop(1)
+            return False
+
+    def _drop(self, count):
+        with self._dropped_lock:
+            self.dropped += count
+
+    def write(self):
+        """Writes queued rows in batches and flushes after each batch until closed.
+
+        After a failed write the error is kept in `error` and the remaining rows
+        are drained and counted in `dropped`, so `log` and `close` never wait on it.
+
+        Returns:
+            None
+        """
+        closing = False
+        while not closing:
+            rows = [self._queue.get()]
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = any(row is None for row in rows)
+            rows = [row for row in rows if row is not None]
+            if self.error is not None:
+                self._drop(len(rows))
+                continue
+            try:
+                self._csv.writerows(rows)
+                self._file.flush()
+                if self._records is not None and rows:
+                    self._records.write(log_records(rows).tobytes())
+                    self._records.flush()
+            except Exception as err:
+                print("Log writing failed: {}".format(err))
+                self.error = err
+                self._drop(len(rows))
+
+    def close(self, timeout=constants.LOG_CLOSE_TIMEOUT):
+        """Writes the remaining rows and closes the file.
+
+        Args:
+            timeout (float): Seconds to wait for the writer. Defaults to
+                `constants.LOG_CLOSE_TIMEOUT`.
+
+        Returns:
+            None
+        """
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        try:
+            self._queue.put(None, timeout=timeout)
+            thread.join(timeout)
+        except queue.Full:
+            pass
+        if self.dropped:
+            print("Dropped {} log rows: {}".format(self.dropped, self.file_path))
+        if thread.is_alive():
+            print("Log writer did not finish: {}".format(self.file_path))
+            return
+        self._file.close()
+        if self._records is not None:
+            self._records.close()
+
+
+class AxisDispatcher:
+    """
+    Feed G-code to one translator per axis from long-lived worker threads
+    """
+
+    FLUSH = object()
+
+    def __init__(
+        self,
+        translators,
+        queue_size=constants.DISPATCH_QUEUE_SIZE,
+        batch_size=constants.DISPATCH_BATCH_SIZE,
+    ):
+        """Starts one worker thread with a bounded command queue per translator.
+
+        Args:
+            translators (list): The translators, one per axis.
+            queue_size (int): Maximum commands waiting per translator. Defaults to `constants.DISPATCH_QUEUE_SIZE`.
+            batch_size (int): Maximum commands translated per wake-up. Defaults to `constants.DISPATCH_BATCH_SIZE`.
+
+        Returns:
+            None
+        """
+        self.translators = list(translators)
+        self.batch_size = batch_size
+        self.errors = []
+        self._errors_lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in self.translators]
+        self._threads = []
+        for index in range(len(self.translators)):
+            thread = threading.Thread(
+                target=self.work, args=(index,), name="AxisDispatcher-{}".format(index)
+            )
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def send(self, index, command):
+        """Queues a command for a translator.
+
+        Returns immediately unless `queue_size` commands are already waiting.
+
+        Args:
+            index (int): The translator index.
+            command (str): The G-code block to translate.
+
+        Returns:
+            None
+        """
+        self._queues[index].put(command)
+
+    def work(self, index):
+        """Translates queued commands in batches, flushing only on `sync`.
+
+        Every exception is recorded in `errors`, so the worker never dies with
+        commands left in its queue.
+
+        Args:
+            index (int): The translator index.
+
+        Returns:
+            None
+        """
+        translator = self.translators[index]
+        commands = self._queues[index]
+        closing = False
+        while not closing:
+            batch = [commands.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(commands.get_nowait())
+                except queue.Empty:
+                    break
+            for command in batch:
+                try:
+                    if command is None:
+                        closing = True
+                    elif command is self.FLUSH:
+                        translator.flush()
+                    elif not closing:
+                        translator.translate(command)
+                except Exception as err:
+                    # Any failure is reported by `sync`; the worker keeps draining
+                    print(err)
+                    with self._errors_lock:
+                        self.errors.append((index, command, err))
+                finally:
+                    commands.task_done()
+
+    def sync(self, indexes=None):
+        """Flushes translators and waits until they have executed their commands.
+
+        Args:
+            indexes (list): The translator indexes. Defaults to None (all).
+
+        Returns:
+            list: The (index, command, error) of every failed command since the
+                last sync.
+        """
+        indexes = range(len(self.translators)) if indexes is None else indexes
+        for index in indexes:
+            self._queues[index].put(self.FLUSH)
+        for index in indexes:
+            self._queues[index].join()
+        with self._errors_lock:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        """Stops the workers after their queued commands, without flushing.
+
+        Returns:
+            None
+        """
+        for commands in self._queues:
+            commands.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+class PvtStreamer:
+    """
+    Feed time-synchronized PVT points to one live sequence per axis device
+    """
+
+    VELOCITY_UNITS = {
+        Units.LENGTH_MILLIMETRES: Units.VELOCITY_MILLIMETRES_PER_SECOND,
+        Units.ANGLE_RADIANS: Units.ANGULAR_VELOCITY_RADIANS_PER_SECOND,
+    }
+
+    def __init__(
+        self,
+        device: Device,
+        gate=None,
+        window=constants.GCODE_LOOKAHEAD_TIME,
+        preload=constants.PVT_PRELOAD,
+    ):
+        """Sets up live PVT sequences on the X, Y, Z and rotation devices.
+
+        Args:
+            device (Device): The device object controlling the axes.
+            gate (LaserGate): Gate switched inside the Y sequence in "digital" mode.
+                Defaults to None.
+            window (float): Seconds of motion queued ahead of the executing point.
+                Defaults to `constants.GCODE_LOOKAHEAD_TIME`.
+            preload (int): Points queued while corked before all sequences start
+                together. Defaults to `constants.PVT_PRELOAD`.
+
+        Returns:
+            None
+        """
+        self.device = device
+        self.gate = gate
+        self.window = window
+        self.preload = preload
+        self.names = ("x", "y", "z", "rot")
+        self.sequences = []
+        for name in self.names:
+            sequence = device.axis_units[name][0].device.pvt.get_sequence(1)
+            sequence.disable()
+            sequence.setup_live(1)
+            self.sequences.append(sequence)
+        # Simulated devices run on a virtual clock
+        self.clock = getattr(device.axisx.device, "clock", time)
+        self.laser = False
+        self._reset()
+
+    def _reset(self):
+        self.corked = False
+        self.count = 0
+        self.queued = 0.0
+        self.started = None
+
+    def _uncork(self):
+        for sequence in self.sequences:
+            sequence.uncork()
+        self.corked = False
+        self.started = self.clock.time()
+
+    def ahead(self):
+        """Returns the seconds of queued motion not executed yet.
+
+        Returns:
+            float: Zero before the sequences are started.
+        """
+        if self.started is None:
+            return 0.0
+        return max(self.queued - (self.clock.time() - self.started), 0.0)
+
+    def point(self, duration, positions, velocities, laser=None, wait=True):
+        """Queues one point on every sequence, throttled to `window` seconds ahead.
+
+        Args:
+            duration (float): Seconds from the previous point.
+            positions (list): X, Y, Z in millimeters and rotation in radians.
+            velocities (list): The axis velocities at the point.
+            laser (bool): Laser state up to the point, switched before it is
+                queued in "digital" mode. Defaults to None (unchanged).
+            wait (bool): Sleep until no more than `window` seconds are queued.
+                Callers that track progress meanwhile throttle with `ahead`
+                instead. Defaults to True.
+
+        Returns:
+            None
+        """
+        if self.started is None and not self.corked:
+            for sequence in self.sequences:
+                sequence.cork()
+            self.corked = True
+
+        if laser is not None and laser != self.laser and self.gate is not None:
+            if self.gate.digital:
+                if laser:
+                    self.gate.on(stream=self.sequences[1])
+                else:
+                    self.gate.off(stream=self.sequences[1])
+            self.laser = laser
+
+        time_measurement = Measurement(duration, Units.TIME_SECONDS)
+        for name, sequence, position, velocity in zip(
+            self.names, self.sequences, positions, velocities
+        ):
+            unit = self.device.axis_units[name][1]
+            sequence.point(
+                [Measurement(float(position), unit)],
+                [Measurement(float(velocity), self.VELOCITY_UNITS[unit])],
+                time_measurement,
+            )
+        self.count += 1
+        self.queued += duration
+
+        if self.corked and (self.count >= self.preload or self.queued >= self.window):
+            self._uncork()
+        while wait and self.ahead() > self.window:
+            time.sleep(constants.STREAM_POLL_INTERVAL)
+
+    def drain(self):
+        """Starts any corked points and waits until every sequence is idle.
+
+        Returns:
+            None
+        """
+        if self.corked:
+            self._uncork()
+        for sequence in self.sequences:
+            sequence.wait_until_idle()
+        self._reset()
+
+    def abort(self):
+        """Turns the laser output off, then stops the axes and disables the sequences.
+
+        The axes stop independently of each other, off the programmed path, so
+        the output is switched directly before they do.
+
+        Returns:
+            None
+        """
+        if self.gate is not None and self.gate.digital:
+            self.gate.set_output(DigitalOutputAction.OFF)
+        self.laser = False
+        try:
+            self.device.stop_axes()
+        finally:
+            self.close()
+
+    def close(self):
+        """Disables the sequences.
+
+        Returns:
+            None
+        """
+        for sequence in self.sequences:
+            try:
+                if not sequence.check_disabled():
+                    sequence.disable()
+            except MotionLibException as err:
+                print(err)
+        self._reset()
+
+
+class GcodeState:
+    """
+    Track the modal state of a G-code program in software
+    """
+
+    MODAL = {"G17", "G18", "G19", "G20", "G21", "G90", "G91", "G92", "G94", "M2", "M30"}
+    # Arc plane axes of G17/G18/G19: first, second (counterclockwise from the first), normal
+    PLANES = {"G17": (0, 1, 2), "G18": (2, 0, 1), "G19": (1, 2, 0)}
+
+    def __init__(
+        self,
+        position,
+        a_relative=constants.GCODE_A_RELATIVE,
+        arc_tolerance=constants.GCODE_ARC_TOLERANCE,
+    ):
+        """Starts in G90/G21/G17 at a machine position, with no feed programmed.
+
+        Args:
+            position (list): X, Y, Z in millimeters and A (rotation) in radians.
+            a_relative (bool): Whether A is always incremental. Defaults to
+                `constants.GCODE_A_RELATIVE`.
+            arc_tolerance (float): Largest distance in millimeters between an
+                arc and its chords. Defaults to `constants.GCODE_ARC_TOLERANCE`.
+
+        Returns:
+            None
+        """
+        self.position = [float(value) for value in position]
+        self.offset = [0.0, 0.0, 0.0, 0.0]
+        self.absolute = True
+        self.scale = 1.0
+        self.feed = math.inf
+        self.laser = False
+        self.plane = self.PLANES["G17"]
+        self.a_relative = a_relative
+        self.arc_tolerance = arc_tolerance
+        # Axes whose position (or G92 offset) is still measured from the start
+        self.from_start = [True, True, True, True]
+        self.offset_from_start = [False, False, False, False]
+        # False once the path depends on the start position in a non-additive way
+        self.shiftable = True
+
+    def target(self, line):
+        """Returns the machine position a move line goes to.
+
+        Args:
+            line: A `GcodeParser` line.
+
+        Returns:
+            tuple: X, Y, Z in millimeters and A in radians, and for every axis
+                whether it still depends on the start position.
+        """
+        target = list(self.position)
+        from_start = list(self.from_start)
+        for axis, name in enumerate("XYZA"):
+            value = line.get_param(name)
+            if value is None:
+                continue
+            value = float(value) * (self.scale if axis < 3 else 1.0)
+            if not self.absolute or (axis == 3 and self.a_relative):
+                target[axis] += value
+            else:
+                target[axis] = value + self.offset[axis]
+                from_start[axis] = self.offset_from_start[axis]
+        return target, from_start
+
+    def arc(self, line, clockwise, target):
+        """Linearizes an arc from the current position into chords.
+
+        The center is given by I/J/K offsets from the start or by the radius R
+        (negative for arcs over 180 degrees). Axes outside of the plane and A
+        move linearly along the arc. Chords stay within `arc_tolerance` of the
+        arc, and an arc ending where it starts is a full circle.
+
+        Args:
+            line: A `GcodeParser` G2 or G3 line.
+            clockwise (bool): Whether it is a G2 arc.
+            target (list): The end of the arc.
+
+        Returns:
+            np.ndarray: (k, 4) chord end points, the last being `target`, or
+                None if the arc is not well defined.
+        """
+        first, second, _ = self.plane
+        start = np.asarray(self.position)
+        end = np.asarray(target)
+        dx, dy = end[first] - start[first], end[second] - start[second]
+
+        if line.get_param("R") is not None:
+            radius = float(line.get_param("R")) * self.scale
+            chord = math.hypot(dx, dy)
+            if chord == 0 or 4 * radius**2 < chord**2:
+                return None
+            # Center on the side of the chord given by the direction and the sign of R
+            h = -math.sqrt(4 * radius**2 - chord**2) / chord
+            h = -h if not clockwise else h
+            h = -h if radius < 0 else h
+            i, j = (dx - dy * h) / 2, (dy + dx * h) / 2
+        else:
+            names = ("I", "J", "K")
+            i, j = (line.get_param(names[axis]) for axis in (first, second))
+            if i is None and j is None:
+                return None
+            i, j = float(i or 0) * self.scale, float(j or 0) * self.scale
+
+        radius = math.hypot(i, j)
+        if radius == 0:
+            return None
+        center_x, center_y = start[first] + i, start[second] + j
+        begin = math.atan2(-j, -i)
+        end_x, end_y = end[first] - center_x, end[second] - center_y
+        sweep = math.atan2(-i * end_y + j * end_x, -i * end_x - j * end_y)
+        if clockwise and sweep >= -1e-9:
+            sweep -= 2 * math.pi
+        elif not clockwise and sweep <= 1e-9:
+            sweep += 2 * math.pi
+
+        step = 2 * math.acos(max(1 - self.arc_tolerance / radius, -1.0))
+        count = max(math.ceil(abs(sweep) / step), 1)
+        fraction = np.arange(1, count + 1) / count
+        points = start + np.outer(fraction, end - start)
+        angles = begin + sweep * fraction
+        points[:, first] = center_x + radius * np.cos(angles)
+        points[:, second] = center_y + radius * np.sin(angles)
+        points[-1] = end
+        return points
+
+    def set_axis(self, axis, value):
+        """Moves an axis to a machine position outside of the program, e.g. a Z laser switch.
+
+        Args:
+            axis (int): 0 to 3 for X, Y, Z and A.
+            value (float): The position in millimeters or radians.
+
+        Returns:
+            None
+        """
+        self.position[axis] = value
+        self.from_start[axis] = False
+
+    def step(self, line):
+        """Applies a line to the state and returns what it asks the machine to do.
+
+        F is modal and in mm/s (in/s after G20). G0 moves at the axis limits.
+
+        Args:
+            line: A `GcodeParser` line.
+
+        Returns:
+            tuple: One of ("move", start, target, feed) with feed math.inf for G0,
+                ("arc", start, points, feed) with the (k, 4) chord end points of
+                G2/G3, ("laser", on), ("dwell", seconds), ("modal",) for lines that only
+                change the state, or ("unknown",).
+        """
+        command = line.command_str
+        if line.get_param("F") is not None and command != "G4":
+            self.feed = float(line.get_param("F")) * self.scale
+
+        if command in {"G0", "G1"}:
+            start = self.position
+            self.position, self.from_start = self.target(line)
+            return ("move", start, self.position, math.inf if command == "G0" else self.feed)
+        if command in {"G2", "G3"}:
+            target, from_start = self.target(line)
+            points = self.arc(line, command == "G2", target)
+            if points is None:
+                return ("unknown",)
+            # Chords between known and start-relative coordinates do not shift with the start
+            if from_start != self.from_start:
+                self.shiftable = False
+            start = self.position
+            self.position, self.from_start = target, from_start
+            return ("arc", start, points, self.feed)
+        if command in {"M3", "M4", "M5"}:
+            self.laser = command != "M5"
+            return ("laser", self.laser)
+        if command == "G4":
+            return ("dwell", float(line.get_param("P") or 0))
+        if command not in self.MODAL:
+            return ("unknown",)
+
+        if command in self.PLANES:
+            self.plane = self.PLANES[command]
+        elif command in {"G20", "G21"}:
+            self.scale = 25.4 if command == "G20" else 1.0
+        elif command in {"G90", "G91"}:
+            self.absolute = command == "G90"
+        elif command == "G92":
+            # The current position reads as the given values from now on
+            for axis, name in enumerate("XYZA"):
+                value = line.get_param(name)
+                if value is not None:
+                    value = float(value) * (self.scale if axis < 3 else 1.0)
+                    self.offset[axis] = self.position[axis] - value
+                    self.offset_from_start[axis] = self.from_start[axis]
+        return ("modal",)
+
+
+class GcodeReader:
+    """
+    Parse G-code lazily from a file or a string on a producer thread
+    """
+
+    DONE = object()
+
+    def __init__(
+        self,
+        source,
+        from_file=False,
+        batch_size=constants.GCODE_BATCH_LINES,
+        queue_size=constants.GCODE_QUEUE_SIZE,
+    ):
+        """Counts the lines of the program and starts parsing it.
+
+        At most `queue_size` batches of parsed lines wait for the consumer, so
+        memory does not grow with the program.
+
+        Args:
+            source (str): The program, or the path of a file holding it.
+            from_file (bool): Whether `source` is a path. Defaults to False.
+            batch_size (int): Lines per queued batch. Defaults to `constants.GCODE_BATCH_LINES`.
+            queue_size (int): Maximum batches waiting. Defaults to `constants.GCODE_QUEUE_SIZE`.
+
+        Returns:
+            None
+        """
+        self.source = source
+        self.from_file = from_file
+        self.batch_size = batch_size
+        self.total_lines = self.count_lines()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self.work, name="GcodeReader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def count_lines(self):
+        """Counts the lines of the program, reading a file in chunks.
+
+        Returns:
+            int: The number of lines, at least 1.
+        """
+        if not self.from_file:
+            return max(self.source.count("\n") + 1, 1)
+        count = 0
+        last = b"\n"
+        with open(self.source, "rb") as file:
+            while chunk := file.read(constants.GCODE_READ_SIZE):
+                count += chunk.count(b"\n")
+                last = chunk[-1:]
+        return max(count + (last != b"\n"), 1)
+
+    def work(self):
+        """Parses the program into batches until it ends or the reader is closed.
+
+        Returns:
+            None
+        """
+        try:
+            if self.from_file:
+                file = open(self.source, buffering=constants.GCODE_READ_SIZE)
+            else:
+                file = io.StringIO(self.source)
+            with file:
+                batch = []
+                for line in parse_gcode_lines(file):
+                    batch.append(line)
+                    if len(batch) == self.batch_size:
+                        if not self.put(batch):
+                            return
+                        batch = []
+                if batch:
+                    self.put(batch)
+            self.put(self.DONE)
+        except Exception as err:
+            self.put(err)
+
+    def put(self, item):
+        """Queues an item, giving up once the reader is closed.
+
+        Args:
+            item: A batch of lines, `DONE` or an exception.
+
+        Returns:
+            bool: True if the item was queued.
+        """
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        """Yields the parsed lines in order.
+
+        Raises:
+            Exception: Whatever stopped the parser, e.g. an OSError reading the file.
+        """
+        while True:
+            item = self._queue.get()
+            if item is self.DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+
+    def close(self):
+        """Stops the producer thread.
+
+        Returns:
+            None
+        """
+        self._closed.set()
+        self._thread.join()
+
+
+class GcodeSession:
+    """
+    Keep the G-code streams and translators, or PVT sequences, live between jobs
+    """
+
+    def __init__(self, device_list, reset=constants.GCODE_SESSION_RESET):
+        """Prepares a session; nothing is set up on the devices until a job needs it.
+
+        Args:
+            device_list (list): The X, Y, Z and rotation devices.
+            reset (str): G-code restoring the modal state of warm translators
+                before each job. Defaults to `constants.GCODE_SESSION_RESET`.
+
+        Returns:
+            None
+        """
+        self.device_list = list(device_list)
+        self.device = Device(*[device.get_axis(1) for device in self.device_list])
+        self.reset = reset
+        self.streams = []
+        self.translators = []
+        self.dispatcher = None
+        self.pvt = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def translate(self):
+        """Returns live translators, set up on first use and reset on reuse.
+
+        Releases the PVT sequences first, as both would own the same axes.
+
+        Returns:
+            tuple: The translators, one per axis, and their `AxisDispatcher`.
+
+        Raises:
+            MotionLibException: Setting up or resetting the translators failed;
+                the session is torn down.
+        """
+        with self._lock:
+            try:
+                self._close_pvt()
+                if self.dispatcher is not None:
+                    for index in range(len(self.translators)):
+                        self.dispatcher.send(index, self.reset)
+                    errors = self.dispatcher.sync()
+                    if errors:
+                        raise errors[0][2]
+                    # Other jobs may have moved the axes since the last one
+                    for translator in self.translators:
+                        translator.reset_position()
+                    return self.translators, self.dispatcher
+
+                self.streams = [
+                    device.streams.get_stream(1) for device in self.device_list
+                ]
+                for stream in self.streams:
+                    if not stream.check_disabled():
+                        stream.disable()
+                    stream.setup_live(1)
+                # Backends other than zaber_motion bring their own translator
+                translator_class = getattr(
+                    self.streams[0], "translator_class", Translator
+                )
+                self.translators = [
+                    translator_class.setup(stream) for stream in self.streams
+                ]
+                self.dispatcher = AxisDispatcher(self.translators)
+                return self.translators, self.dispatcher
+            except MotionLibException:
+                self._close_streams()
+                raise
+
+    def streamer(self, gate=None):
+        """Returns live PVT sequences, set up on first use.
+
+        Releases the translator streams first, as both would own the same axes.
+
+        Args:
+            gate (LaserGate): Gate switched inside the Y sequence in "digital"
+                mode. Defaults to None.
+
+        Returns:
+            PvtStreamer: The sequences, drained and at rest.
+        """
+        with self._lock:
+            self._close_streams()
+            if self.pvt is None:
+                self.pvt = PvtStreamer(self.device, gate)
+            self.pvt.gate = gate
+            self.pvt.laser = False
+            return self.pvt
+
+    def _close_streams(self):
+        if self.dispatcher is not None:
+            self.dispatcher.close()
+            self.dispatcher = None
+        for stream in self.streams:
+            try:
+                if not stream.check_disabled():
+                    stream.disable()
+            except MotionLibException as err:
+                print(err)
+        self.streams = []
+        self.translators = []
+
+    def _close_pvt(self):
+        if self.pvt is not None:
+            self.pvt.close()
+            self.pvt = None
+
+    def close(self):
+        """Disables everything the session set up; the next job sets it up again.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._close_streams()
+            self._close_pvt()
+
+
 class WindowController:
     """
     Change/Set Window Components
@@ -383,6 +1622,7 @@ class WindowController:
         self.gcode_label.grid(column=6, row=0)
         self.gcode_text.grid(column=6, row=1)
         self.gcode_text.insert("end", constants.GCODE_PLACEHOLDER)
+        self.gcode_path = ""
 
         self.set_degree_text = Label(
             self.window, text="Degree", font=("Arial Bold", 20)
@@ -598,6 +1838,8 @@ class Point:
         Returns the point in Cylindrical coordinates (r, theta, z).
     """
 
+    __slots__ = ("x", "y", "z", "r", "theta")
+
     def __init__(self, x: float, y: float, z: float):
         """
         Initializes the point with Cartesian coordinates and calculates
@@ -619,7 +1861,6 @@ class Point:
         self.theta = math.atan2(
             y, x
         )  # atan2(y, x) gives the correct quadrant for theta
-        self.r, self.theta = self.polar()
 
     def cartesian(self):
         """
@@ -655,6 +1896,146 @@ class Point:
         return (self.r, self.theta, self.z)
 
 
+POINT_DTYPE = np.dtype(
+    [("x", "f8"), ("y", "f8"), ("z", "f8"), ("r", "f8"), ("theta", "f8")]
+)
+
+
+class PointArray:
+    """
+    A class to represent many 3D points in a single structured NumPy array.
+
+    Attributes:
+    ----------
+    data : np.ndarray
+        Structured array with POINT_DTYPE fields (x, y, z, r, theta).
+
+    Methods:
+    -------
+    cartesian():
+        Returns the points in Cartesian coordinates (x, y, z).
+
+    polar():
+        Returns the points in Polar coordinates (r, theta).
+
+    cylindrical():
+        Returns the points in Cylindrical coordinates (r, theta, z).
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, x, y, z):
+        """
+        Initializes the points with Cartesian coordinates and calculates
+        their radial distances and angles at once.
+
+        Parameters:
+        ----------
+        x : array_like
+            The X-coordinates in Cartesian coordinates.
+        y : array_like
+            The Y-coordinates in Cartesian coordinates.
+        z : array_like or float
+            The Z-coordinates in Cartesian coordinates.
+        """
+        x, y, z = np.broadcast_arrays(
+            np.asarray(x, dtype=float),
+            np.asarray(y, dtype=float),
+            np.asarray(z, dtype=float),
+        )
+        self.data = np.empty(x.size, dtype=POINT_DTYPE)
+        self.data["x"] = x.ravel()
+        self.data["y"] = y.ravel()
+        self.data["z"] = z.ravel()
+        self.data["r"] = np.hypot(self.data["x"], self.data["y"])
+        self.data["theta"] = np.arctan2(self.data["y"], self.data["x"])
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        Wraps an existing POINT_DTYPE array without copying it.
+
+        Parameters:
+        ----------
+        data : np.ndarray
+            Structured array with POINT_DTYPE fields.
+
+        Returns:
+        -------
+        PointArray:
+            The points backed by the given array.
+        """
+        points = cls.__new__(cls)
+        points.data = data
+        return points
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            row = self.data[index]
+            return Point(float(row["x"]), float(row["y"]), float(row["z"]))
+        return PointArray.from_data(self.data[index])
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield self[i]
+
+    @property
+    def x(self):
+        return self.data["x"]
+
+    @property
+    def y(self):
+        return self.data["y"]
+
+    @property
+    def z(self):
+        return self.data["z"]
+
+    @property
+    def r(self):
+        return self.data["r"]
+
+    @property
+    def theta(self):
+        return self.data["theta"]
+
+    def cartesian(self):
+        """
+        Returns the Cartesian coordinates (x, y, z) of the points.
+
+        Returns:
+        -------
+        tuple:
+            A tuple of arrays (x, y, z) representing Cartesian coordinates.
+        """
+        return (self.x, self.y, self.z)
+
+    def polar(self):
+        """
+        Returns the Polar coordinates (r, theta) of the points.
+
+        Returns:
+        -------
+        tuple:
+            A tuple of arrays (r, theta)
+        """
+        return (self.r, self.theta)
+
+    def cylindrical(self):
+        """
+        Returns the Cylindrical coordinates (r, theta, z) of the points.
+
+        Returns:
+        -------
+        tuple:
+            A tuple of arrays (r, theta, z)
+        """
+        return (self.r, self.theta, self.z)
+
+
 class Ring:
     """
     A class to represent a ring moving in 3D space with given radial distances and speeds.
@@ -765,3 +2146,151 @@ class Ring:
             theta_vel = constants.MAX_ROT_VEL
 
         return theta_vel
+
+
+class HeightProfile:
+    """
+    A class to look up the lens profile for any radius.
+
+    The CSV at `path` holds radial distance, sag and height in metres. It is
+    parsed once and cached next to itself as a millimetre `.npy` array; the
+    cache is rebuilt when the CSV's modification time and SHA-256 both change.
+
+    Attributes:
+    ----------
+    path : str
+        Path of the source CSV.
+    data : np.ndarray
+        (n, 3) array of radial distance, sag and height in millimetres.
+
+    Methods:
+    -------
+    sag(r):
+        Returns the interpolated sag (mm) at radius r (mm).
+    z(r, initial_z):
+        Returns the Z target (mm) at radius r (mm).
+    """
+
+    _profiles = {}
+    _profiles_lock = threading.Lock()
+
+    def __init__(self, path=constants.HEIGHT_PATH, cache_path=None):
+        """
+        Loads the profile from its cache, or from the CSV when the cache is stale.
+
+        Parameters:
+        ----------
+        path : str
+            Path of the source CSV.
+        cache_path : str
+            Path of the `.npy` cache. Defaults to `path` with a `.npy` suffix.
+        """
+        self.path = path
+        self.cache_path = cache_path or os.path.splitext(path)[0] + ".npy"
+        self.data = self.load()
+
+    @classmethod
+    def get(cls, path=constants.HEIGHT_PATH):
+        """
+        Returns the shared profile of `path`, reloading it if the CSV changed.
+
+        Parameters:
+        ----------
+        path : str
+            Path of the source CSV.
+
+        Returns:
+        -------
+        HeightProfile:
+            The loaded profile.
+        """
+        with cls._profiles_lock:
+            profile = cls._profiles.get(path)
+            if profile is None or profile.mtime != os.path.getmtime(path):
+                profile = cls(path)
+                cls._profiles[path] = profile
+            return profile
+
+    def digest(self):
+        """
+        Returns the SHA-256 of the source CSV.
+
+        Returns:
+        -------
+        str:
+            Hex digest of the file contents.
+        """
+        sha = hashlib.sha256()
+        with open(self.path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def load(self):
+        """
+        Reads the `.npy` cache if it still matches the CSV, else parses the CSV
+        and rewrites the cache.
+
+        Returns:
+        -------
+        np.ndarray:
+            (n, 3) array of radial distance, sag and height in millimetres.
+        """
+        self.mtime = os.path.getmtime(self.path)
+        meta_path = self.cache_path + ".json"
+        meta = {}
+        if os.path.exists(self.cache_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as file:
+                meta = json.load(file)
+
+        if meta.get("mtime") == self.mtime:
+            return np.load(self.cache_path)
+        sha = self.digest()
+        if meta.get("sha256") == sha:
+            data = np.load(self.cache_path)
+        else:
+            # Radial distance (m),Sag (m),Height (m), to mm with µm precision
+            data = np.loadtxt(
+                self.path, delimiter=",", encoding="utf-8-sig", ndmin=2
+            )
+            data = np.round(data * 1000, 3)
+            data = data[np.argsort(data[:, 0], kind="stable")]
+            np.save(self.cache_path, data)
+
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump({"mtime": self.mtime, "sha256": sha}, file)
+        return data
+
+    def sag(self, r):
+        """
+        Returns the sag at radius r by linear interpolation.
+
+        Parameters:
+        ----------
+        r : float or array_like
+            Radius in millimetres.
+
+        Returns:
+        -------
+        float or np.ndarray:
+            Sag in millimetres, clamped to the profile's end values.
+        """
+        return np.interp(r, self.data[:, 0], self.data[:, 1])
+
+    def z(self, r, initial_z=constants.INITIAL_Z):
+        """
+        Returns the Z target at radius r.
+
+        Parameters:
+        ----------
+        r : float or array_like
+            Radius in millimetres.
+        initial_z : float
+            Focus Z at the lens vertex. Defaults to `constants.INITIAL_Z`.
+
+        Returns:
+        -------
+        float or np.ndarray:
+            Z target in millimetres.
+        """
+        return initial_z - self.sag(r)
@@ -23,6 +23,15 @@ RADIUS_LIST = [
     [2935, 2996],
 ]  # [Inner, Outer] um
 
+# LASER GATE
+LASER_GATE = "z"  # "digital": Switch a digital output, "z": Move Z in and out of focus
+LASER_CHANNEL = 1  # Digital output channel of the laser
+LASER_AXIS = "y"  # Axis whose device drives the laser output
+
+# AXIS ORDERING (Each group starts after the previous group is idle)
+SET_ORDER = (("x", "y", "rot"), ("z",))
+EXTRACT_ORDER = (("z",), ("x", "y"))
+
 # VELOCITIES (mm/s)
 MIN_X_VEL = 1e-3
 MAX_X_VEL = 150.0
@@ -33,6 +42,15 @@ MAX_Z_VEL = 150.0
 MAX_ROT_VEL = 50  # (Radians/s)
 Z_TEST_VELOCITY = 0.1
 MATRIX_VELOCITY = 50.0
+MATRIX_ORDER = "serpentine"  # "raster", "serpentine" or "optimized"
+MATRIX_2OPT_WINDOW = 500  # Segments considered per 2-opt reversal
+MATRIX_2OPT_PASSES = 5
+
+# ACCELERATIONS (mm/s^2)
+MAX_X_ACC = 1000.0
+MAX_Y_ACC = 1000.0
+MAX_Z_ACC = 1000.0
+MAX_ROT_ACC = 200.0  # (Radians/s^2)
 
 # PLACEHOLDERS
 INITIAL_X = 0.0
@@ -60,6 +78,53 @@ ENERGIES = {
 }
 GCODE_PLACEHOLDER = ";The first line should be the initial positions\n"
 
+# STREAMS
+RUNNER_STREAMED = False  # Queue runner lines ahead as time-synced PVT points
+STREAM_POLL_INTERVAL = 0.01  # (s)
+DISPATCH_QUEUE_SIZE = 64  # G-code blocks waiting per axis translator
+DISPATCH_BATCH_SIZE = 16  # Blocks translated per worker wake-up
+
+# G-CODE
+GCODE_LOOKAHEAD = True  # Blend moves in PVT sequences instead of stopping every line
+GCODE_A_RELATIVE = True  # A is incremental even in G90, as the translator path always did
+GCODE_BATCH_LINES = 1000  # Parsed lines handed over at once
+GCODE_QUEUE_SIZE = 8  # Parsed batches waiting for the executor
+GCODE_READ_SIZE = 1 << 20  # Bytes read from a program file at once
+GCODE_CHUNK_LINES = 5000  # Lines compiled and planned together
+GCODE_ARC_TOLERANCE = 0.002  # (mm) Largest distance between an arc and its chords
+GCODE_CACHE = True  # Keep compiled programs for repeat runs
+GCODE_CACHE_FOLDER = "./Data/gcode_cache"
+GCODE_CACHE_MAX_BYTES = 1 << 30  # (bytes) Least recently used programs are evicted above it
+GCODE_CACHE_MAX_AGE = 30 * 24 * 3600  # (s) Programs unused this long are evicted
+GCODE_SESSION = True  # Keep streams and translators live between G-code jobs
+GCODE_SESSION_RESET = "G90 G21"  # Modal state restored on warm translators
+DRY_RUN_SLOWEST = 10  # Longest moves listed by a dry run
+GCODE_LOOKAHEAD_TIME = 0.5  # (s) Motion queued ahead of the executing point
+GCODE_JUNCTION_DEVIATION = 0.01  # (mm) Corner rounding allowed when blending moves
+GCODE_HOLD_MOVES = 8  # Moves first tried for slowing down to a pause
+GCODE_MIN_SEGMENT_TIME = 0.02  # (s) Shorter PVT points are merged into their neighbours
+GCODE_TOLERANCE = 0.001  # (mm, rad) Largest path error allowed by merging
+
+# FRESNEL
+FRESNEL_MODE = "rings"  # "rings": Ring by ring, "pvt": One synchronized PVT spiral
+FRESNEL_R_VEL = 0.05  # (mm/s) Radial speed of the spiral
+FRESNEL_LINEAR_VEL = 30  # (mm/s) Speed along the spiral
+FRESNEL_TRAVEL_VEL = 20.0  # (mm/s) X/Z speed between rings
+FRESNEL_Z_LIFT = 0.5  # (mm) Defocus between rings when LASER_GATE is "z"
+PVT_SEGMENT_TIME = 0.1  # (s) Longest PVT segment along a ring
+PVT_RAMP_TIME = 0.1  # (s) Shortest speed-up/slow-down segment
+PVT_PRELOAD = 32  # Points queued on every sequence before they start together
+
+# PREVIEW
+PREVIEW = False  # Write a PNG of every matrix or G-code path before running it
+PREVIEW_PATH = "./Data/preview.png"
+PREVIEW_SIZE = 1024  # (px)
+PREVIEW_MARGIN = 16  # (px)
+
+# POSITION MONITOR (s), Only Running When Started for a Job
+POSITION_POLL_INTERVAL = 0.1
+POSITION_MAX_AGE = 0.25
+
 # GUI
 PROGRESS_BAR_LENGTH = 200
 
@@ -77,6 +142,11 @@ log_head = [
     "Initial_Z(mm)",
     "Initial_Rot(native)",
 ]
+LOG_FOLDER = "Data"
+LOG_QUEUE_SIZE = 10000  # Rows waiting for the disk before new rows are dropped
+LOG_CLOSE_TIMEOUT = 5  # (s) Wait for the writer to finish when closing
+LOG_BATCH_SIZE = 100  # Rows written per flush
+LOG_RECORDS = True  # Also write a fixed-dtype .rec file next to the CSV
 IMAGE_PATH = "sag.png"
 HEIGHT_PATH = "./Data/profile.csv"
 Z_TEST_STEP = 0.01
@@ -84,3 +154,8 @@ Z_TEST_STEP = 0.01
 # TEST.PY
 TEST_ID = "ae28609e-18a4-4b28-8d89-30c567001c23"
 TEST_TOKEN = "VJ_GV-w4_fYUQiI8zrSpz2F6Bh2ZLpCF"
+
+# SIMULATOR
+SIM_SPEEDUP = 10.0  # Virtual seconds per real second
+SIM_LINEAR_RESOLUTION = 5249.3  # Native units per mm
+SIM_ROT_RESOLUTION = 245479.8  # Native units per radian
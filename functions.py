@@ -1,18 +1,16 @@
 from tkinter import *
+from tkinter import filedialog
 from zaber_motion import Units, MotionLibException, Measurement
-from zaber_motion.ascii import WarningFlags, Device
-from zaber_motion.gcode import Translator
-from gcodeparser import GcodeParser
-from turtle import Turtle, Screen
-from random import random
+from zaber_motion.ascii import WarningFlags, Device, DigitalOutputAction
+from gcodeparser import parse_gcode_lines
 import numpy as np
-import time, threading, constants, classes, functions, os, datetime, csv, cv2, math
+import time, threading, constants, classes, functions, os, datetime, csv, cv2, math, multiprocessing, itertools, hashlib, json, io, re
 from typing import List
 
 
 # Logger
 def logger(
-    log_tail,
+    run_log,
     n,
     energy,
     x_position,
@@ -25,13 +23,13 @@ def logger(
     initial_z,
     initial_rot,
 ):
-    """Logs data into a list of lists.
+    """Logs a row of data into a run log.
 
-    Appends a new log entry consisting of the provided data to the log_tail list,
-    representing a log of various parameters over time.
+    Queues a new log entry consisting of the provided data on the run log,
+    which writes it to disk in the background.
 
     Args:
-        log_tail (list): The list of lists containing logged data entries.
+        run_log (classes.RunLogger): The run log receiving the entry.
         n (int): The index or number associated with the log entry.
         energy (float): The energy value to log.
         x_position (float): The X-axis position to log.
@@ -45,7 +43,7 @@ def logger(
         initial_rot (float): The initial rotational position to log.
 
     Returns:
-        list: The updated log_tail list with the new log entry appended.
+        classes.RunLogger: The run log.
     """
     log = [
         n,
@@ -60,39 +58,53 @@ def logger(
         initial_z,
         initial_rot,
     ]
-    log_tail.append(log)
-    return log_tail
+    run_log.log(log)
+    return run_log
 
 
-# Write the File
-def writer(log_head, log_tail):
-    """Writes log data to a CSV file.
+# Read a Binary Run Log
+def read_run_log(path):
+    """Memory-maps a binary run log written by `classes.RunLogger`.
 
-    Creates a CSV file named with the current date and time, stores it in a folder
-    structure under 'Data' directory, and writes log data with a header and rows.
+    A partially written last record (e.g. after a crash) is ignored.
 
     Args:
-        log_head (list): The header row for the CSV file.
-        log_tail (list of lists): The list of data rows to write into the CSV file.
+        path (str): Path of the `.rec` file.
 
     Returns:
-        None
+        numpy.ndarray: Read-only records with dtype `classes.LOG_DTYPE`.
     """
-    current_datetime = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{current_datetime}.csv"
+    count = os.path.getsize(path) // classes.LOG_DTYPE.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=classes.LOG_DTYPE)
+    return np.memmap(path, dtype=classes.LOG_DTYPE, mode="r", shape=(count,))
+
 
-    date_folder = datetime.datetime.now().strftime("%d-%m-%Y")
-    folder = os.path.join("Data", date_folder)
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+# Load All Binary Run Logs
+def load_run_logs(folder=constants.LOG_FOLDER):
+    """Loads every binary run log under a folder into one array.
 
-    # Define the full file path
-    file_path = os.path.join(folder, filename)
+    Args:
+        folder (str): The folder to search recursively. Defaults to `constants.LOG_FOLDER`.
 
-    with open(file_path, "w", newline="\n") as f:
-        write = csv.writer(f)
-        write.writerow(log_head)
-        write.writerows(log_tail)
+    Returns:
+        tuple: (records, runs, paths)
+            - records (numpy.ndarray): All records with dtype `classes.LOG_DTYPE`.
+            - runs (numpy.ndarray): Index into `paths` of the file of each record.
+            - paths (list): Sorted paths of the loaded `.rec` files.
+    """
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(folder)
+        for name in names
+        if name.endswith(".rec")
+    )
+    logs = [read_run_log(path) for path in paths]
+    if not logs:
+        return np.zeros(0, dtype=classes.LOG_DTYPE), np.zeros(0, dtype=int), paths
+    records = np.concatenate(logs)
+    runs = np.repeat(np.arange(len(logs)), [len(log) for log in logs])
+    return records, runs, paths
 
 
 # Switch for Threads
@@ -155,6 +167,217 @@ def img_2_mat(img_path):
     return th
 
 
+# Plan the task
+def plan_runner(dia, y_increment, x_length, initial_vel):
+    """Precompiles the runner task into arrays before any motion starts.
+
+    Line `n` (1-based) sweeps X by `x_length` in alternating directions with velocities
+    decreasing from fast to slow, then steps Y by `y_increment`. The middle line
+    skips its X sweep.
+
+    Args:
+        dia (float): The diameter to cover in Y (mm).
+        y_increment (float): The Y step per line (mm).
+        x_length (float): The X sweep length (mm).
+        initial_vel (float): The velocity step between lines (mm/s).
+
+    Returns:
+        dict: Arrays with one entry per line:
+            - "count": Line numbers starting at 1.
+            - "x_position": Relative X sweep (mm).
+            - "x_velocity": X sweep velocity (mm/s).
+            - "y_position": Relative Y step (mm).
+            - "y_velocity": Y step velocity (mm/s, 0 for default).
+            - "skipped": True for the middle line whose X sweep is passed.
+            - "x_offset": Cumulative X offset after the line (mm).
+            - "y_offset": Cumulative Y offset after the line (mm).
+    """
+    total_task = int(dia / y_increment)
+    if total_task % 2 == 0:
+        total_task -= 1
+    total_task = max(total_task, 0)
+
+    count = np.arange(1, total_task + 1)
+    skipped = count == int(total_task / 2) + 1
+    passed = (count > int(total_task / 2) + 1).astype(int)
+
+    max_velocity = initial_vel * total_task
+    x_velocity = max_velocity - initial_vel * (count - passed)  # Fast to Slow
+    # x_velocity = initial_vel * (count - passed)  # Slow to Fast
+    x_position = x_length * (-1.0) ** (count + 1 + passed)
+    y_position = np.full(total_task, float(y_increment))
+
+    return {
+        "count": count,
+        "x_position": x_position,
+        "x_velocity": x_velocity,
+        "y_position": y_position,
+        "y_velocity": np.zeros(total_task),
+        "skipped": skipped,
+        "x_offset": np.cumsum(np.where(skipped, 0.0, x_position)),
+        "y_offset": np.cumsum(y_position),
+    }
+
+
+# Validate the planned task
+def check_plan(plan, start_positions):
+    """Validates a runner plan against the velocity and range limits.
+
+    Args:
+        plan (dict): The plan returned by `plan_runner`.
+        start_positions (list): The current [x, y, z, rot] positions.
+
+    Returns:
+        str: The error message of the first violation, or None if the plan is valid.
+    """
+    if len(plan["count"]) == 0:
+        return "NO TASKS - CHECK DIAMETER AND INCREMENT"
+
+    x_velocity = plan["x_velocity"][~plan["skipped"]]
+    invalid = (x_velocity > constants.MAX_X_VEL) | (x_velocity < constants.MIN_X_VEL)
+    if np.any(invalid):
+        print("ERROR - CANNOT DO TASKS WITH VELOCITIES:", x_velocity[invalid])
+        return "X Velocity Out Of Range"
+
+    # Each line is checked from where the previous one ended
+    x_before = start_positions[0] + np.concatenate(([0.0], plan["x_offset"][:-1]))
+    y_before = start_positions[1] + np.concatenate(([0.0], plan["y_offset"][:-1]))
+    x_target = x_before + plan["x_position"]
+    y_target = y_before + plan["y_position"]
+
+    checks = [
+        (x_target > constants.X_MAX, "Reached Max X Range"),
+        (x_target < constants.X_MIN, "Reached Min X Range"),
+        (y_target > constants.Y_MAX, "Reached Max Y Range"),
+        (y_target < constants.Y_MIN, "Reached Min Y Range"),
+    ]
+    for violation, msg in checks:
+        if np.any(violation):
+            return "{} At Task {}".format(msg, plan["count"][np.argmax(violation)])
+    return None
+
+
+# Stream the task
+def stream_plan(
+    window: classes.WindowController,
+    device: classes.Device,
+    plan,
+    stop_event: threading.Event,
+    resume_event: threading.Event,
+    on_line,
+):
+    """Executes a runner plan as time-synced PVT points on the X and Y devices.
+
+    Every X sweep and Y step is a move ending at rest, planned with `plan_moves`
+    within the axis limits. Their points are queued in a `classes.PvtStreamer` up to
+    `constants.GCODE_LOOKAHEAD_TIME` ahead of the stage, so the sequences of both
+    devices run on one time base and each move starts as soon as the previous one
+    ends, without waiting for Python. Python only tracks the progress and handles
+    pause and stop: a pause holds at the end of the move being queued, a stop
+    stops the axes. The average X velocity is the sweep length over the duration
+    of its points, which the devices execute as given.
+
+    Args:
+        window (classes.WindowController): The GUI window controller object.
+        device (classes.Device): The device object controlling physical movements.
+        plan (dict): The plan returned by `plan_runner`.
+        stop_event (threading.Event): The event signaling to stop the task sequence.
+        resume_event (threading.Event): The event signaling to resume or pause the task execution.
+        on_line (callable): Called as `on_line(index, avg_x_velocity)` when a line is done.
+
+    Returns:
+        int: The number of completed lines.
+    """
+    total_task = len(plan["count"])
+    y_velocity = np.where(plan["y_velocity"] > 0, plan["y_velocity"], constants.MAX_Y_VEL)
+    start = device.read_positions()[:3] + [device.axisrot.get_position(Units.ANGLE_RADIANS)]
+
+    # Move 2i sweeps X (no length when skipped), move 2i + 1 steps Y
+    delta = np.zeros((2 * total_task, 4))
+    delta[0::2, 0] = np.where(plan["skipped"], 0.0, plan["x_position"])
+    delta[1::2, 1] = plan["y_position"]
+    positions = np.vstack([start, start + np.cumsum(delta, axis=0)])
+    feeds = np.empty(2 * total_task)
+    feeds[0::2] = plan["x_velocity"]
+    feeds[1::2] = y_velocity
+    moves = plan_moves(
+        positions, feeds, np.ones(2 * total_task, dtype=bool), np.zeros(2 * total_task)
+    )
+    duration = moves["t_acc"] + moves["t_cruise"] + moves["t_dec"]
+    knots = move_knots(moves)
+    line_of = knots["move"] // 2
+    first_knot = np.searchsorted(line_of, np.arange(total_task + 1))
+
+    streamer = classes.PvtStreamer(device)
+    done = 0
+    queued = 0
+    ends = []  # Queued seconds at the end of every line since the last drain
+
+    def report(count):
+        nonlocal done
+        while done < count:
+            avg_x_velocity = "PASSED"
+            if not plan["skipped"][done]:
+                avg_x_velocity = abs(float(plan["x_position"][done])) / float(
+                    duration[2 * done]
+                )
+            on_line(done, avg_x_velocity)
+            done += 1
+            window.bar["value"] = (done / total_task) * 100
+            window.config_progress_text(done, total_task)
+
+    try:
+        k = 0
+        while done < total_task:
+            if stop_event.is_set():
+                streamer.abort()
+                break
+
+            # Pauses start where a move ends at rest
+            at_rest = k == 0 or knots["end"][k - 1]
+            if queued < total_task and (resume_event.is_set() or not at_rest):
+                if streamer.ahead() > streamer.window:
+                    time.sleep(constants.STREAM_POLL_INTERVAL)
+                else:
+                    streamer.point(
+                        knots["time"][k],
+                        knots["position"][k],
+                        knots["velocity"][k],
+                        wait=False,
+                    )
+                    k += 1
+                while queued < total_task and k == first_knot[queued + 1]:
+                    queued += 1
+                    ends.append(streamer.queued)
+            else:
+                # Paused or all queued: run out what is queued
+                streamer.drain()
+                ends = []
+                report(queued)
+                while queued < total_task and not resume_event.is_set():
+                    if stop_event.is_set():
+                        break
+                    time.sleep(constants.STREAM_POLL_INTERVAL)
+                continue
+
+            # Lines whose points have been executed
+            if streamer.started is not None:
+                executed = streamer.queued - streamer.ahead()
+                count = int(np.searchsorted(ends, executed + 1e-9, side="right"))
+                report(queued - len(ends) + count)
+                ends = ends[count:]
+
+    except MotionLibException as err:
+        print(err)
+        window.print_msg("ERROR - TASK IS ABORTED!", "red")
+        streamer.abort()
+
+    finally:
+        streamer.close()
+
+    return done
+
+
 # Run the task
 def runner(
     window: classes.WindowController,
@@ -163,11 +386,14 @@ def runner(
     lock: threading.Lock,
     stop_event: threading.Event,
     resume_event: threading.Event,
+    streamed: bool = constants.RUNNER_STREAMED,
 ):
     """Runs a series of tasks controlled by a GUI and synchronized with threading events.
 
     Executes a series of tasks involving movement of a device controlled by the provided window,
-    using specified threading mechanisms for synchronization.
+    using specified threading mechanisms for synchronization. The whole task is planned and
+    validated with `plan_runner` and `check_plan` before the stage moves. In streamed mode
+    the lines are executed by `stream_plan`.
 
     Args:
         window (classes.WindowController): The GUI window controller object.
@@ -176,11 +402,12 @@ def runner(
         lock (threading.Lock): The lock object for thread synchronization.
         stop_event (threading.Event): The event signaling to stop the task sequence.
         resume_event (threading.Event): The event signaling to resume or pause the task execution.
+        streamed (bool): Whether to queue the lines ahead as time-synced PVT points.
+            Defaults to `constants.RUNNER_STREAMED`.
 
     Returns:
         None
     """
-    log_tail = []
     values = window.get_values()
     initial_x = values[0]
     initial_y = values[1]
@@ -193,129 +420,124 @@ def runner(
     deg = values[8]
     energy = values[9]
 
-    # Calculate Total Task
-    total_task = int((dia) / y_increment)
-    if total_task > constants.MAX_X_VEL:
-        print("ERROR - CANNOT DO TASKS WITH VELOCITIES:")
-        while total_task > constants.MAX_X_VEL:
-            max_velocity = initial_vel * (total_task)
-            total_task -= 1
-            print(max_velocity, end=", ")
-    if total_task % 2 == 0:
-        max_velocity = initial_vel * (total_task)
-        print(max_velocity)
-        total_task -= 1
-
-    # Calculate Max Velocity
-    max_velocity = initial_vel * total_task
-    passed = 0
-    count = 0
+    # Plan and Validate the Task
+    plan = plan_runner(dia, y_increment, x_length, initial_vel)
+    total_task = len(plan["count"])
+    msg = check_plan(plan, device.get_current_positions())
+    if msg is not None:
+        window.print_msg(msg, "red")
+        return
 
-    lock.acquire()
-    while not stop_event.is_set():
-        while not resume_event.is_set():
-            time.sleep(1)
+    # Log Rows Are Written While the Task Runs
+    run_log = classes.RunLogger(constants.log_head)
+    try:
+        if streamed:
+
+            def on_line(i, avg_x_velocity):
+                functions.logger(
+                    run_log,
+                    int(plan["count"][i]),
+                    energy,
+                    float(plan["x_position"][i]),
+                    float(plan["x_velocity"][i]),
+                    float(plan["y_position"][i]),
+                    float(plan["y_velocity"][i]),
+                    avg_x_velocity,
+                    initial_x,
+                    initial_y,
+                    initial_z,
+                    initial_rot,
+                )
+                print("Task: {}/{}, {}".format(i + 1, total_task, avg_x_velocity))
 
-        if count == total_task:
-            writer(constants.log_head, log_tail)
-            lock.release()
-            button.invoke()
+            with lock:
+                done = stream_plan(
+                    window, device, plan, stop_event, resume_event, on_line
+                )
+            if done == total_task:
+                button.invoke()
             return
 
-        else:
-            count += 1
-            window.bar["value"] = (count / total_task) * 100
-            window.config_progress_text(count, total_task)
-
-            # Set Position and Velocities
-            x_velocity = max_velocity - initial_vel * (count - passed)  # Fast to Slow
-            # x_velocity = initial_vel*(count-passed) #Slow to Fast
-            x_position = x_length * (-1) ** (count + 1 + passed)
-            y_position = y_increment
-            y_velocity = 0
-            avg_x_velocity = "EMPTY"
-
-            # Check Ranges
-            current_positions = device.get_current_positions()
-
-            if current_positions[0] + x_position > constants.X_MAX:
-                writer(constants.log_head, log_tail)
-                window.print_msg("Reached Max X Range", "red")
-                lock.release()
-                return
+        count = 0
 
-            if current_positions[0] + x_position < constants.X_MIN:
-                writer(constants.log_head, log_tail)
-                window.print_msg("Reached Min X Range", "red")
-                lock.release()
-                return
+        lock.acquire()
+        while not stop_event.is_set():
+            while not resume_event.is_set():
+                time.sleep(1)
 
-            if current_positions[1] + y_position > constants.Y_MAX:
-                writer(constants.log_head, log_tail)
-                window.print_msg("Reached Max Y Range", "red")
+            if count == total_task:
                 lock.release()
+                button.invoke()
                 return
 
-            if current_positions[1] + y_position < constants.Y_MIN:
-                writer(constants.log_head, log_tail)
-                window.print_msg("Reached Min Y Range", "red")
-                lock.release()
-                return
+            else:
+                i = count
+                count += 1
+                window.bar["value"] = (count / total_task) * 100
+                window.config_progress_text(count, total_task)
+
+                # Set Position and Velocities
+                x_velocity = float(plan["x_velocity"][i])
+                x_position = float(plan["x_position"][i])
+                y_position = float(plan["y_position"][i])
+                y_velocity = float(plan["y_velocity"][i])
+                avg_x_velocity = "EMPTY"
+
+                # Start Movement
+                if not plan["skipped"][i]:
+                    start = time.time()
+
+                    try:
+                        device.axisx.move_relative(
+                            position=x_position,
+                            unit=Units.LENGTH_MILLIMETRES,
+                            velocity=x_velocity,
+                            velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
+                        )
+
+                        end = time.time()
+                        avg_x_velocity = x_length / (end - start)
+                    except MotionLibException as err:
+                        print(err)
+                        avg_x_velocity = "ERROR"
 
-            # Start Movement
-            if count != int(total_task / 2) + 1:
-                start = time.time()
+                # Pass The Middle Movement
+                else:
+                    avg_x_velocity = "PASSED"
 
                 try:
-                    device.axisx.move_relative(
-                        position=x_position,
+                    device.axisy.move_relative(
+                        position=y_position,
                         unit=Units.LENGTH_MILLIMETRES,
-                        velocity=x_velocity,
+                        velocity=y_velocity,
                         velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
                     )
-
-                    end = time.time()
-                    avg_x_velocity = x_length / (end - start)
                 except MotionLibException as err:
                     print(err)
                     avg_x_velocity = "ERROR"
 
-            # Pass The Middle Movement
-            else:
-                avg_x_velocity = "PASSED"
-                passed += 1
-
-            try:
-                device.axisy.move_relative(
-                    position=y_position,
-                    unit=Units.LENGTH_MILLIMETRES,
-                    velocity=y_velocity,
-                    velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
+                # Log the Task
+                functions.logger(
+                    run_log,
+                    count,
+                    energy,
+                    x_position,
+                    x_velocity,
+                    y_position,
+                    y_velocity,
+                    avg_x_velocity,
+                    initial_x,
+                    initial_y,
+                    initial_z,
+                    initial_rot,
                 )
-            except MotionLibException as err:
-                print(err)
-                avg_x_velocity = "ERROR"
-
-            # Log the Task
-            log_tail = functions.logger(
-                log_tail,
-                count,
-                energy,
-                x_position,
-                x_velocity,
-                y_position,
-                y_velocity,
-                avg_x_velocity,
-                initial_x,
-                initial_y,
-                initial_z,
-                initial_rot,
-            )
-            print("Task: {}/{}, {}".format(count, total_task, avg_x_velocity))
+                print("Task: {}/{}, {}".format(count, total_task, avg_x_velocity))
 
-    writer(constants.log_head, log_tail)
-    lock.release()
-    return
+        lock.release()
+        return
+
+    finally:
+        run_log.close()
 
 
 # Check Device Health
@@ -413,6 +635,331 @@ def z_test(
     lock.release()
 
 
+# Segment the Matrix
+def mat_segments(mat, threshold=0):
+    """Finds the runs of pixels to print in every row of a matrix.
+
+    Args:
+        mat (numpy.ndarray): Matrix to print, e.g. from `img_2_mat`.
+        threshold (int): Pixel value to print. Defaults to 0.
+
+    Returns:
+        tuple: (rows, starts, lengths) integer arrays with one entry per run,
+            ordered by row and then by start column.
+    """
+    marked = np.asarray(mat) == threshold
+    padded = np.zeros((marked.shape[0], marked.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = marked
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends - starts
+
+
+# Laser-Off Travel of a Print Path
+def path_travel(rows, begins, ends, scale=(1.0, 1.0)):
+    """Returns the travel between segments of a print path, starting at row 0, column 0.
+
+    X and Y move one after another, so the travel is the sum of both axis distances.
+
+    Args:
+        rows (numpy.ndarray): Row of each segment in print order.
+        begins (numpy.ndarray): Column each segment starts at.
+        ends (numpy.ndarray): Column each segment ends at.
+        scale (tuple): (X per row, Y per column). Defaults to (1.0, 1.0).
+
+    Returns:
+        float: The travel with the laser off.
+    """
+    prev_rows = np.concatenate(([0], rows[:-1]))
+    prev_ends = np.concatenate(([0], ends[:-1]))
+    return float(
+        np.sum(np.abs(rows - prev_rows)) * scale[0]
+        + np.sum(np.abs(begins - prev_ends)) * scale[1]
+    )
+
+
+# Travel-Minimizing Segment Order
+def optimize_path(
+    rows,
+    begins,
+    ends,
+    scale=(1.0, 1.0),
+    window=constants.MATRIX_2OPT_WINDOW,
+    passes=constants.MATRIX_2OPT_PASSES,
+):
+    """Reorders and flips segments to minimize the travel with the laser off.
+
+    Builds a nearest-neighbour path from row 0, column 0 and improves it with 2-opt
+    reversals of up to `window` segments. A reversal also flips the direction of the
+    reversed segments.
+
+    Args:
+        rows (numpy.ndarray): Row of each segment.
+        begins (numpy.ndarray): Column each segment starts at.
+        ends (numpy.ndarray): Column each segment ends at.
+        scale (tuple): (X per row, Y per column). Defaults to (1.0, 1.0).
+        window (int): Maximum segments per reversal. Defaults to `constants.MATRIX_2OPT_WINDOW`.
+        passes (int): Maximum 2-opt passes. Defaults to `constants.MATRIX_2OPT_PASSES`.
+
+    Returns:
+        tuple: (rows, begins, ends) arrays in the optimized order.
+    """
+    n = len(rows)
+    x_begin = rows * scale[0]
+    y_begin = begins * scale[1]
+    y_end = ends * scale[1]
+
+    # Nearest Neighbour
+    path = np.zeros(n, dtype=int)
+    flip = np.zeros(n, dtype=bool)
+    used = np.zeros(n, dtype=bool)
+    x, y = 0.0, 0.0
+    for k in range(n):
+        to_x = np.abs(x_begin - x)
+        to_begin = np.where(used, np.inf, to_x + np.abs(y_begin - y))
+        to_end = np.where(used, np.inf, to_x + np.abs(y_end - y))
+        i_begin = np.argmin(to_begin)
+        i_end = np.argmin(to_end)
+        if to_end[i_end] < to_begin[i_begin]:
+            path[k], flip[k] = i_end, True
+            y = y_begin[i_end]
+        else:
+            path[k] = i_begin
+            y = y_end[i_begin]
+        used[path[k]] = True
+        x = x_begin[path[k]]
+
+    px = x_begin[path]
+    pb = np.where(flip, y_end[path], y_begin[path])
+    pe = np.where(flip, y_begin[path], y_end[path])
+
+    # 2-Opt
+    for _ in range(passes):
+        improved = False
+        for i in range(n):
+            j = np.arange(i, min(n, i + window))
+            prev_x = px[i - 1] if i > 0 else 0.0
+            prev_y = pe[i - 1] if i > 0 else 0.0
+            nxt = np.minimum(j + 1, n - 1)
+            has_next = j + 1 < n
+            before = (
+                np.abs(px[i] - prev_x)
+                + np.abs(pb[i] - prev_y)
+                + has_next * (np.abs(px[nxt] - px[j]) + np.abs(pb[nxt] - pe[j]))
+            )
+            after = (
+                np.abs(px[j] - prev_x)
+                + np.abs(pe[j] - prev_y)
+                + has_next * (np.abs(px[nxt] - px[i]) + np.abs(pb[nxt] - pb[i]))
+            )
+            gain = before - after
+            best = np.argmax(gain)
+            if gain[best] > 1e-9:
+                seg = slice(i, j[best] + 1)
+                px[seg] = px[seg][::-1]
+                pb[seg], pe[seg] = pe[seg][::-1].copy(), pb[seg][::-1].copy()
+                path[seg] = path[seg][::-1]
+                improved = True
+        if not improved:
+            break
+
+    return rows[path], pb / scale[1], pe / scale[1]
+
+
+# Order the Matrix Segments
+def mat_path(rows, starts, lengths, order=constants.MATRIX_ORDER, scale=(1.0, 1.0)):
+    """Orders matrix segments into a print path.
+
+    In "raster" order every segment is printed left to right. In "serpentine" order
+    every other printed row is traced right to left, so Y never returns to the start
+    of the row. In "optimized" order the segments are reordered with `optimize_path`
+    and the estimated travel before and after is printed.
+
+    Args:
+        rows (numpy.ndarray): Row of each segment, from `mat_segments`.
+        starts (numpy.ndarray): Start column of each segment, from `mat_segments`.
+        lengths (numpy.ndarray): Length of each segment, from `mat_segments`.
+        order (str): "raster", "serpentine" or "optimized". Defaults to `constants.MATRIX_ORDER`.
+        scale (tuple): (X per row, Y per column), used by "optimized". Defaults to (1.0, 1.0).
+
+    Returns:
+        tuple: (rows, begins, ends) arrays in print order. Each segment is traced
+            from column `begins` to column `ends`.
+    """
+    ends = starts + lengths
+    if order == "raster":
+        return rows, starts, ends
+    if order == "optimized":
+        path = optimize_path(rows, starts, ends, scale)
+        print(
+            "Laser-Off Travel: {:.2f} -> {:.2f}".format(
+                path_travel(rows, starts, ends, scale), path_travel(*path, scale)
+            )
+        )
+        return path
+    if order != "serpentine":
+        raise ValueError("Unknown matrix order: {}".format(order))
+
+    rank = np.unique(rows, return_inverse=True)[1]
+    reverse = rank % 2 == 1
+    path = np.lexsort((np.where(reverse, -starts, starts), rows))
+    begins = np.where(reverse, ends, starts)
+    ends = np.where(reverse, starts, ends)
+    return rows[path], begins[path], ends[path]
+
+
+# Render Path Preview
+def render_path(
+    x,
+    y,
+    values=None,
+    draw=None,
+    path=constants.PREVIEW_PATH,
+    size=constants.PREVIEW_SIZE,
+):
+    """Rasterizes a toolpath into a PNG without a display.
+
+    Every segment is sampled once per pixel and the samples are written into
+    the image buffer with NumPy in one pass, so dense paths with millions of
+    points render in about a second.
+
+    Args:
+        x (np.ndarray): X positions of the path points in millimeters.
+        y (np.ndarray): Y positions of the path points in millimeters.
+        values (np.ndarray): A value per point to colour the segment starting
+            at it, e.g. ring index or velocity. Defaults to None (black).
+        draw (np.ndarray): Whether the laser is on along each segment (one less
+            than the points). Travel segments are drawn in light grey.
+            Defaults to None (all on).
+        path (str): The PNG to write, or None to only return the image.
+            Defaults to `constants.PREVIEW_PATH`.
+        size (int): The image width and height in pixels. Defaults to
+            `constants.PREVIEW_SIZE`.
+
+    Returns:
+        np.ndarray: The BGR image.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Palette: 0 background, 1 travel, 2.. path colours
+    palette = np.full((258, 3), 255, dtype=np.uint8)
+    palette[1] = 200
+    palette[2:] = cv2.applyColorMap(
+        np.arange(256, dtype=np.uint8).reshape(-1, 1), cv2.COLORMAP_JET
+    )[:, 0]
+    canvas = np.zeros((size, size), dtype=np.uint16)
+
+    if len(x) > 1:
+        # Fit the path into the image, Y pointing up
+        margin = constants.PREVIEW_MARGIN
+        span = max(np.ptp(x), np.ptp(y)) or 1.0
+        scale = (size - 1 - 2 * margin) / span
+        columns = np.rint((x - x.min()) * scale + margin).astype(np.int32)
+        rows = np.rint(size - 1 - margin - (y - y.min()) * scale).astype(np.int32)
+
+        # Colour of every segment
+        draw = np.ones(len(x) - 1, dtype=bool) if draw is None else np.asarray(draw)
+        if values is None:
+            palette[2] = 0
+            colours = np.full(len(x) - 1, 2, dtype=np.uint16)
+        else:
+            values = np.asarray(values, dtype=float)[:-1]
+            low, high = values.min(), values.max()
+            colours = np.full(len(values), 2, dtype=np.uint16)
+            if high > low:
+                colours += np.rint((values - low) / (high - low) * 255).astype(
+                    np.uint16
+                )
+        colours[~draw] = 1
+
+        # Travel first, so laser segments are drawn over it
+        dx, dy = np.diff(columns), np.diff(rows)
+        length = np.maximum(np.abs(dx), np.abs(dy))
+        for segments in (np.flatnonzero(~draw), np.flatnonzero(draw)):
+            # Sample every segment once per pixel along its longer side
+            for block in np.array_split(segments, len(segments) // 100000 + 1):
+                counts = length[block] + 1
+                index = np.repeat(block, counts)
+                step = np.arange(len(index)) - np.repeat(
+                    np.cumsum(counts) - counts, counts
+                )
+                fraction = step / np.maximum(length[index], 1)
+                u = columns[index] + np.rint(dx[index] * fraction).astype(np.int32)
+                v = rows[index] + np.rint(dy[index] * fraction).astype(np.int32)
+                canvas[v, u] = colours[index]
+
+    image = palette[canvas]
+    if path is not None:
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        cv2.imwrite(path, image)
+    return image
+
+
+# Matrix Path Preview
+def mat_preview(rows, begins, ends, scale=(1.0, 1.0), path=constants.PREVIEW_PATH):
+    """Renders a `mat_path` print order, travel between runs in grey.
+
+    Args:
+        rows (numpy.ndarray): Row of each segment in print order.
+        begins (numpy.ndarray): Column each segment starts at.
+        ends (numpy.ndarray): Column each segment ends at.
+        scale (tuple): (X per row, Y per column). Defaults to (1.0, 1.0).
+        path (str): The PNG to write. Defaults to `constants.PREVIEW_PATH`.
+
+    Returns:
+        np.ndarray: The BGR image.
+    """
+    x = np.repeat(np.asarray(rows, dtype=float) * scale[0], 2)
+    y = np.stack([begins, ends], axis=1).ravel().astype(float) * scale[1]
+    draw = np.arange(len(x) - 1) % 2 == 0
+    return render_path(x, y, draw=draw, path=path)
+
+
+# G-Code Path Preview
+def gcode_preview(gcode: str, path=constants.PREVIEW_PATH, from_file=False):
+    """Renders the X/Y toolpath of a G-code program, coloured by feed rate.
+
+    Moves follow a `classes.GcodeState` from the origin, so arcs show as
+    their chords. The laser is on after M3/M4 and off after M5; travel with
+    the laser off is drawn in grey.
+
+    Args:
+        gcode (str): The G-code program, or the path of a file holding it.
+        path (str): The PNG to write. Defaults to `constants.PREVIEW_PATH`.
+        from_file (bool): Whether `gcode` is a path. Defaults to False.
+
+    Returns:
+        np.ndarray: The BGR image.
+    """
+    x, y, feeds, draw = [], [], [], []
+    state = classes.GcodeState([0.0, 0.0, 0.0, 0.0])
+    feed = 0.0
+    reader = classes.GcodeReader(gcode, from_file)
+    for line in reader:
+        event = state.step(line)
+        if event[0] == "move":
+            points = [event[2]]
+        elif event[0] == "arc":
+            points = event[2].tolist()
+        else:
+            continue
+        feed = event[3] if math.isfinite(event[3]) else feed
+        for point in points:
+            if x:
+                # The feed of a move colours the segment ending at it
+                feeds[-1] = feed
+                draw.append(state.laser)
+            x.append(point[0])
+            y.append(point[1])
+            feeds.append(feed)
+    reader.close()
+    return render_path(x, y, feeds, np.asarray(draw, dtype=bool), path)
+
+
 # Print Matrix (In Dev)
 def mat_print(
     device: classes.Device,
@@ -422,12 +969,15 @@ def mat_print(
     lock: threading.Lock,
     stop_event: threading.Event,
     resume_event: threading.Event,
+    order: str = constants.MATRIX_ORDER,
 ):
     """Prints a matrix using device movements based on threshold values.
 
     Moves the device axes to print a matrix on a surface, controlling movements
-    based on threshold values in the matrix. Progress is displayed on the window.
-    Stops if interrupted or when the stop button is pressed.
+    based on threshold values in the matrix. The matrix is first split into runs of
+    pixels to print with `mat_segments` and ordered with `mat_path`; each run is one
+    focused Y move. Progress is displayed on the window per run. Stops if interrupted
+    or when the stop button is pressed.
 
     Args:
         device (classes.Device): Device object controlling the axes.
@@ -437,6 +987,7 @@ def mat_print(
         lock (threading.Lock): Lock to synchronize access to shared resources.
         stop_event (threading.Event): Event to signal stop request.
         resume_event (threading.Event): Event to signal resume after pause.
+        order (str): Segment order, see `mat_path`. Defaults to `constants.MATRIX_ORDER`.
 
     Returns:
         None
@@ -450,106 +1001,129 @@ def mat_print(
     x_step = (constants.X_MAX - initial_positions[0]) / rows
     y_step = (constants.Y_MAX - initial_positions[1]) / cols
 
-    window.config_progress_text(0, rows * (cols - 1))
+    seg_rows, seg_begins, seg_ends = mat_path(
+        *mat_segments(mat, threshold), order, (x_step, y_step)
+    )
+    total = len(seg_rows)
+    print("Segments: ", total)
+    if constants.PREVIEW:
+        mat_preview(seg_rows, seg_begins, seg_ends, (x_step, y_step))
+    window.config_progress_text(0, total)
 
     lock.acquire()
 
-    # unfocus
-    device.axisz.move_absolute(position=constants.Z_MAX, unit=Units.LENGTH_MILLIMETRES)
-    count = 0
+    # Laser Off
+    gate = classes.LaserGate(device, focus_z=initial_positions[2])
+    gate.setup()
     window.bar["value"] = 0
 
-    def focus():
-        # Focus
+    # Digital Gating Queues the Y Moves and the Laser Output in the Y Stream
+    y_stream = None
+    if gate.digital:
+        y_stream = device.axisy.device.streams.get_stream(1)
+        y_stream.setup_live(1)
+
+    def finish():
+        if y_stream is not None and not y_stream.check_disabled():
+            y_stream.disable()
+        gate.finish()
+        lock.release()
+
+    # Laser Off Right Away, Not After the Moves Queued in the Y Stream
+    def halt_stream():
+        gate.set_output(DigitalOutputAction.OFF)
         try:
-            device.axisz.move_absolute(
-                position=initial_positions[2], unit=Units.LENGTH_MILLIMETRES
-            )
+            device.axisy.stop()
         except MotionLibException as err:
             print(err)
+        finish()
+
+    current_row = None
+    for i in range(total):
+        window.bar["value"] = ((i + 1) / total) * 100
+        window.config_progress_text(i + 1, total)
+
+        while not resume_event.is_set():
+            time.sleep(1)
+
+        # Return if Stop Button is Pressed
+        if stop_event.is_set():
+            if y_stream is not None:
+                halt_stream()
+            else:
+                finish()
+            return
+
+        row = int(seg_rows[i])
+        y_start = initial_positions[1] + y_step * float(seg_begins[i])
+        y_length = y_step * float(seg_ends[i] - seg_begins[i])
 
-    def un_focus():
-        # Un-Focus
+        # A Failed Stream Command Could Leave the Laser On, So the Job Is Aborted
+        if y_stream is not None:
+            try:
+                if row != current_row:
+                    y_stream.wait_until_idle()
+                    device.axisx.move_absolute(
+                        position=initial_positions[0] + x_step * row,
+                        unit=Units.LENGTH_MILLIMETRES,
+                    )
+                    current_row = row
+                y_stream.set_max_speed(
+                    constants.MAX_Y_VEL, Units.VELOCITY_MILLIMETRES_PER_SECOND
+                )
+                y_stream.line_absolute(Measurement(y_start, Units.LENGTH_MILLIMETRES))
+                gate.on(y_stream)
+                y_stream.set_max_speed(
+                    constants.MATRIX_VELOCITY, Units.VELOCITY_MILLIMETRES_PER_SECOND
+                )
+                y_stream.line_relative(Measurement(y_length, Units.LENGTH_MILLIMETRES))
+                gate.off(y_stream)
+            except Exception as err:
+                print(err)
+                window.print_msg("ERROR - TASK IS ABORTED!", "red")
+                halt_stream()
+                button.invoke()
+                return
+            continue
+
+        # move to positions
         try:
-            device.axisz.move_absolute(
-                position=constants.Z_MAX, unit=Units.LENGTH_MILLIMETRES
-            )
+            if row != current_row:
+                device.axisx.move_absolute(
+                    position=initial_positions[0] + x_step * row,
+                    unit=Units.LENGTH_MILLIMETRES,
+                )
+                current_row = row
+
+            device.axisy.move_absolute(position=y_start, unit=Units.LENGTH_MILLIMETRES)
         except MotionLibException as err:
             print(err)
+            continue
 
-    for row in range(0, rows):
-        x_pos = x_step * row
-        new_y_step = 0
-
-        # move to positions
+        gate.on()
+        # Move Y-Axis
         try:
-            device.axisx.move_relative(position=x_pos, unit=Units.LENGTH_MILLIMETRES)
-            device.axisy.move_absolute(
-                position=initial_positions[1], unit=Units.LENGTH_MILLIMETRES
+            device.axisy.move_relative(
+                position=y_length,
+                unit=Units.LENGTH_MILLIMETRES,
+                velocity=constants.MATRIX_VELOCITY,
+                velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
             )
         except MotionLibException as err:
             print(err)
+        gate.off()
 
-        for col in range(0, cols - 1):
-            window.bar["value"] = ((count + 1) / (rows * (cols - 1))) * 100
-            window.config_progress_text(count + 1, rows * (cols - 1))
-            count += 1
-
-            while not resume_event.is_set():
-                time.sleep(1)
-
-            # Return if Stop Button is Pressed
-            if stop_event.is_set():
-                un_focus()
-                lock.release()
-                return
-
-            if mat[row][col] == threshold:
-                new_y_step += y_step
-            else:
-                if new_y_step == 0:
-                    pass
-                else:
-                    focus()
-                    # Move Y-Axis
-                    try:
-                        device.axisy.move_relative(
-                            position=new_y_step,
-                            unit=Units.LENGTH_MILLIMETRES,
-                            velocity=constants.MATRIX_VELOCITY,
-                            velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
-                        )
-                    except MotionLibException as err:
-                        print(err)
-
-                    un_focus()
-                    new_y_step = 0
-
-        if new_y_step != 0:
-            focus()
-            # Move Y-Axis
-            try:
-                device.axisy.move_relative(
-                    position=new_y_step,
-                    unit=Units.LENGTH_MILLIMETRES,
-                    velocity=constants.MATRIX_VELOCITY,
-                    velocity_unit=Units.VELOCITY_MILLIMETRES_PER_SECOND,
-                )
-            except MotionLibException as err:
-                print(err)
-            un_focus()
-        un_focus()
-    un_focus()
-    lock.release()
+    if y_stream is not None:
+        y_stream.wait_until_idle()
+    finish()
     button.invoke()
     return
 
 
-import pvt_test
-
-
 # PVT (in dev)
 def PVT(device_list: List[Device]):
+    # Development script, only needed here
+    import pvt_test
 
     # Get the first axis from each device
     axis_list = [device.get_axis(1) for device in device_list]
@@ -608,115 +1182,538 @@ def PVT(device_list: List[Device]):
     return
 
 
-# Fresnel Rings(In Dev)
-def Fresnel(device_list: List[Device]):
-    # Initialize Device
-    axes_list = [device.get_axis(1) for device in device_list]
-    device = classes.Device(*axes_list)
-    device.set_axes(constants.X_CENTER, constants.Y_CENTER, constants.Z_MAX, 0)
-    # Radial distance (m),Sag (m),Height (m)
-    with open(constants.HEIGHT_PATH, encoding="utf-8-sig", mode="r") as file:
-        csvFile = csv.reader(file, quoting=csv.QUOTE_NONNUMERIC)
-        data = list(csvFile)
-
-    # Convert m to mm with µm precision
-    data = [[float("%.3f" % (j * 1000)) for j in i] for i in data]
-
-    # Calculate Angular Velocity
-    def calculate_theta_velocity(linear_speed, r_velocity, r):
-        if linear_speed <= r_velocity:
-            return 0
-        if r == 0:
-            return np.inf
-        else:
-            return math.sqrt(linear_speed**2 - r_velocity**2) / r
+# Calculate Angular Velocity
+def theta_velocity(linear_speed, r_velocity, r):
+    """Calculates the spiral's angular step for every radius at once.
 
-    # Calculate and Simulate Spirals
-    def calculate_path(RADIUS_LIST, R_VEL=0.02, LINEAR_VEL=100, view=False):
-        if view:
-            screen = Screen()
-            WIDTH, HEIGHT = screen.window_width(), screen.window_height()
-            turtle = Turtle(visible=False)
-            turtle.speed("fastest")
-            turtle.up()
-            turtle.goto(0, 0)
-            turtle.down()
-
-        r = 0
-        theta = 0
-        points = []
-        theta_vels = []
-        thetas = []
-        rings = []
+    Args:
+        linear_speed (float): The linear speed along the spiral.
+        r_velocity (float): The radial step of the spiral.
+        r (np.ndarray): The radii to evaluate.
 
-        for i in range(len(RADIUS_LIST)):
-            r = RADIUS_LIST[i][0]
-            x = r * math.cos(theta)
-            y = r * math.sin(theta)
-            points.append(classes.Point(x, y, constants.INITIAL_Z))
-
-            if view:
-                turtle.up()
-                turtle.goto(x / 10, y / 10)
-                turtle.color(random(), random(), random())
-                turtle.down()
-
-            while r <= RADIUS_LIST[i][1]:
-                x = r * math.cos(theta)
-                y = r * math.sin(theta)
-                r += R_VEL
-                theta_vel = calculate_theta_velocity(LINEAR_VEL, R_VEL, r)
-                theta += theta_vel
-                thetas.append(theta)
-                theta_vels.append(theta_vel)
-                points.append(classes.Point(x, y, constants.INITIAL_Z))
-
-                if view:
-                    linear_vel = math.sqrt(R_VEL**2 + (r * theta_vel) ** 2)
-                    print(
-                        "Linear Velocity = {}, Rotation Velocity = {}".format(
-                            linear_vel, theta_vel
-                        )
-                    )
-                    turtle.goto(x / 10, y / 10)
+    Returns:
+        np.ndarray: The angular steps, infinite at r == 0.
+    """
+    r = np.asarray(r, dtype=float)
+    if linear_speed <= r_velocity:
+        return np.zeros_like(r)
+    with np.errstate(divide="ignore"):
+        return math.sqrt(linear_speed**2 - r_velocity**2) / r
 
-            # Calculate Z Positions
-            z1_index = RADIUS_LIST[i][0]
-            z2_index = RADIUS_LIST[i][1]
 
-            z1_diff = data[z1_index][1]
-            z2_diff = data[z2_index][1]
+# Calculate Spiral Path
+def spiral_path(radius_list, r_vel, linear_vel):
+    """Calculates the spiral samples of every ring with NumPy.
 
-            z1 = constants.INITIAL_Z - z1_diff
-            z2 = constants.INITIAL_Z - z2_diff
+    Each ring starts with a point at its inner radius and continues with
+    samples every r_vel up to its outer radius. The angle accumulates
+    across rings, each sample being placed at the angle reached before
+    its own step.
 
-            # Get R Positions
-            r1 = RADIUS_LIST[i][0] / 1000
-            r2 = RADIUS_LIST[i][1] / 1000
+    Args:
+        radius_list (list): The (inner, outer) radius pairs.
+        r_vel (float): The radial step of the spiral.
+        linear_vel (float): The linear speed along the spiral.
 
-            # Create Ring Object
-            ring = classes.Ring(r1, r2, z1, z2, R_VEL, LINEAR_VEL)
-            rings.append(ring)
+    Returns:
+        tuple: x, y and ring index of every point, followed by the
+        accumulated angle and angular step of every sample.
+    """
+    theta = 0.0
+    xs, ys, ring_ids, thetas, theta_vels = [], [], [], [], []
+    for i, (r1, r2) in enumerate(radius_list):
+        # Accumulate radii the way the stage loop did to keep its end point
+        count = max(int((r2 - r1) / r_vel) + 3, 1)
+        r = np.cumsum(np.concatenate(([float(r1)], np.full(count, r_vel))))
+        count = int(np.count_nonzero(r[:-1] <= r2))
+        steps = theta_velocity(linear_vel, r_vel, r[1 : count + 1])
+        r = r[:count]
+        angles = theta + np.cumsum(steps)
+        before = np.concatenate(([theta], angles[:-1]))
+
+        r = np.concatenate(([r1], r))
+        angle = np.concatenate(([theta], before))
+        xs.append(r * np.cos(angle))
+        ys.append(r * np.sin(angle))
+        ring_ids.append(np.full(len(r), i))
+        thetas.append(angles)
+        theta_vels.append(steps)
+        if count:
+            theta = angles[-1]
+
+    return (
+        np.concatenate(xs),
+        np.concatenate(ys),
+        np.concatenate(ring_ids),
+        np.concatenate(thetas),
+        np.concatenate(theta_vels),
+    )
 
-        if view:
-            turtle.up()
-            screen.exitonclick()
 
-        return (points, thetas, theta_vels, rings)
+# Spiral Angle
+def spiral_angle(r, r_vel, linear_vel, max_rot_vel=constants.MAX_ROT_VEL):
+    """Returns the angle and angular velocity of a constant speed spiral.
 
-    R_VEL = 0.05
-    LINEAR_VEL = 30
-    points, thetas, theta_vels, rings = calculate_path(
-        RADIUS_LIST=constants.RADIUS_LIST,
-        R_VEL=R_VEL,
-        LINEAR_VEL=LINEAR_VEL,
-        view=False,
-    )
+    The spiral grows by `r_vel` while rotating at sqrt(linear_vel^2 - r_vel^2) / r,
+    capped at `max_rot_vel` near the centre, so the speed along it stays
+    `linear_vel` wherever the cap allows.
 
-    x_offset = constants.X_CENTER
-    r = []
-    for point in points:
-        r.append(point.r / 1000 + x_offset)
+    Args:
+        r (np.ndarray): Radii in millimeters.
+        r_vel (float): The radial speed in mm/s.
+        linear_vel (float): The speed along the spiral in mm/s.
+        max_rot_vel (float): The angular velocity cap in rad/s.
+
+    Returns:
+        tuple: (theta, omega). The angle in radians reached from r = 0 and the
+            angular velocity in rad/s at every radius.
+    """
+    r = np.asarray(r, dtype=float)
+    tangential = math.sqrt(max(linear_vel**2 - r_vel**2, 0.0))
+    if tangential == 0:
+        return np.zeros_like(r), np.zeros_like(r)
+    r_cap = tangential / max_rot_vel
+    outer = np.maximum(r, r_cap)
+    omega = tangential / outer
+    theta = (
+        max_rot_vel * np.minimum(r, r_cap) + tangential * np.log(outer / r_cap)
+    ) / r_vel
+    return theta, omega
+
+
+# Hermite Time
+def hermite_time(distance, velocity, acceleration):
+    """Returns the shortest PVT segment that moves `distance` from rest to rest.
+
+    A cubic segment of duration T peaks at 1.5 * distance / T and accelerates
+    at most 6 * distance / T^2.
+
+    Args:
+        distance (float): The move length.
+        velocity (float): The speed limit.
+        acceleration (float): The acceleration limit.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    distance = abs(distance)
+    return max(1.5 * distance / velocity, math.sqrt(6 * distance / acceleration))
+
+
+# Plan Fresnel PVT
+def plan_fresnel(
+    radius_list,
+    r_vel,
+    linear_vel,
+    profile,
+    digital=constants.LASER_GATE == "digital",
+    segment_time=constants.PVT_SEGMENT_TIME,
+):
+    """Compiles a whole lens into one PVT trajectory of X, Z and rotation.
+
+    Every ring is a spiral sampled at most `segment_time` apart, with X moving
+    at `r_vel` and the rotation following `spiral_angle`, so the speed along
+    the spiral is constant. The rotation keeps spinning between rings. X slows
+    down, travels to the next ring and speeds up again, while Z only moves to
+    the next ring's height, plus `constants.FRESNEL_Z_LIFT` out of focus when
+    the laser is gated by Z.
+
+    Args:
+        radius_list (list): [Inner, Outer] radius pairs in µm.
+        r_vel (float): The radial speed in mm/s.
+        linear_vel (float): The speed along the spiral in mm/s.
+        profile (classes.HeightProfile): The lens profile giving each ring's Z.
+        digital (bool): Whether the laser is switched with a digital output.
+        segment_time (float): The longest segment along a ring in seconds.
+
+    Returns:
+        dict: Arrays with one entry per point: time (segment duration ending
+            at the point, s), x, x_velocity, z, z_velocity (mm, mm/s), rot,
+            rot_velocity (rad, rad/s) and laser (state from the point on).
+    """
+    radii = np.asarray(radius_list, dtype=float) / 1000
+    heights = np.asarray(profile.z(radii[:, 0]), dtype=float)
+    lift = 0.0 if digital else constants.FRESNEL_Z_LIFT
+    plan = {
+        name: []
+        for name in (
+            "time",
+            "x",
+            "x_velocity",
+            "z",
+            "z_velocity",
+            "rot",
+            "rot_velocity",
+            "laser",
+        )
+    }
+    state = {}
+
+    def add(duration, x, x_velocity, z, rot_velocity, laser, rot=None):
+        if rot is None:
+            # Velocity ramps linearly, so the cubic ends at the trapezoid area
+            rot = state["rot"]
+            rot += (state["rot_velocity"] + rot_velocity) * duration / 2
+        state["rot"] = rot
+        state["rot_velocity"] = rot_velocity
+        for name, value in (
+            ("time", duration),
+            ("x", x),
+            ("x_velocity", x_velocity),
+            ("z", z),
+            ("z_velocity", 0.0),
+            ("rot", state["rot"]),
+            ("rot_velocity", rot_velocity),
+            ("laser", laser),
+        ):
+            plan[name].append(value)
+
+    def ramp_time(omega0, omega1, z_distance):
+        return max(
+            constants.PVT_RAMP_TIME,
+            abs(omega1 - omega0) / constants.MAX_ROT_ACC,
+            hermite_time(
+                z_distance, constants.FRESNEL_TRAVEL_VEL, constants.MAX_Z_ACC
+            ),
+        )
+
+    def out_of_focus(z1, z2):
+        return min(max(z1, z2) + lift, constants.Z_MAX)
+
+    # Start at rest, one speed-up segment before the first ring
+    r1, r2 = radii[0]
+    omega1 = float(spiral_angle(r1, r_vel, linear_vel)[1])
+    z_start = out_of_focus(heights[0], heights[0])
+    duration = ramp_time(0.0, omega1, z_start - heights[0])
+    state.update(rot=0.0, rot_velocity=0.0)
+    x_start = constants.X_CENTER + r1 - r_vel * duration / 2
+    add(0.0, x_start, 0.0, z_start, 0.0, False)
+
+    for i in range(len(radii)):
+        r1, r2 = radii[i]
+        z = heights[i]
+        add(duration, constants.X_CENTER + r1, r_vel, z, omega1, True)
+
+        # Spiral
+        count = max(int(math.ceil((r2 - r1) / r_vel / segment_time)), 1)
+        r = np.linspace(r1, r2, count + 1)[1:]
+        theta, omega = spiral_angle(np.concatenate(([r1], r)), r_vel, linear_vel)
+        step = (r2 - r1) / r_vel / count
+        rot = state["rot"] - theta[0]
+        for k in range(count):
+            add(
+                step,
+                constants.X_CENTER + r[k],
+                r_vel,
+                z,
+                float(omega[k + 1]),
+                k < count - 1,
+                rot + float(theta[k + 1]),
+            )
+        omega2 = state["rot_velocity"]
+
+        if i == len(radii) - 1:
+            # Slow everything down to rest after the last ring
+            z_end = out_of_focus(z, z)
+            duration = ramp_time(omega2, 0.0, z_end - z)
+            x_end = constants.X_CENTER + r2 + r_vel * duration / 2
+            add(duration, x_end, 0.0, z_end, 0.0, False)
+            break
+
+        # Slow X down, travel to the next ring while spinning, speed up again
+        next_r1 = radii[i + 1][0]
+        next_z = heights[i + 1]
+        omega1 = float(spiral_angle(next_r1, r_vel, linear_vel)[1])
+        z_travel = out_of_focus(z, next_z) if lift else z
+        duration = ramp_time(omega2, omega2, z_travel - z)
+        x_stop = constants.X_CENTER + r2 + r_vel * duration / 2
+        add(duration, x_stop, 0.0, z_travel, omega2, False)
+
+        z_travel_end = out_of_focus(z, next_z) if lift else next_z
+        duration = ramp_time(omega2, omega1, next_z - z_travel_end)
+        x_start = constants.X_CENTER + next_r1 - r_vel * duration / 2
+        travel = max(
+            constants.PVT_RAMP_TIME,
+            hermite_time(
+                x_start - x_stop, constants.FRESNEL_TRAVEL_VEL, constants.MAX_X_ACC
+            ),
+            hermite_time(
+                z_travel_end - z_travel,
+                constants.FRESNEL_TRAVEL_VEL,
+                constants.MAX_Z_ACC,
+            ),
+        )
+        add(travel, x_start, 0.0, z_travel_end, omega2, False)
+
+    return {name: np.asarray(values) for name, values in plan.items()}
+
+
+# Run Fresnel PVT
+def run_fresnel_pvt(device: classes.Device, gate: classes.LaserGate, plan):
+    """Runs a `plan_fresnel` trajectory on the PVT sequences of the devices.
+
+    X, Z and rotation each get a live sequence fed with the same segment
+    durations. In "digital" gate mode Y gets one too, holding its position,
+    so the laser output can be switched inside it at the planned points.
+    The first `constants.PVT_PRELOAD` points are queued while the sequences
+    are corked, then all of them start together.
+
+    Args:
+        device (classes.Device): The device object controlling the axes.
+        gate (classes.LaserGate): The laser gate.
+        plan (dict): The trajectory returned by `plan_fresnel`.
+
+    Returns:
+        None
+    """
+    velocity_units = {
+        Units.LENGTH_MILLIMETRES: Units.VELOCITY_MILLIMETRES_PER_SECOND,
+        Units.ANGLE_RADIANS: Units.ANGULAR_VELOCITY_RADIANS_PER_SECOND,
+    }
+    count = len(plan["time"])
+    columns = {
+        "x": (plan["x"], plan["x_velocity"]),
+        "z": (plan["z"], plan["z_velocity"]),
+        "rot": (plan["rot"], plan["rot_velocity"]),
+    }
+    if gate.digital:
+        columns["y"] = (np.full(count, constants.Y_CENTER), np.zeros(count))
+
+    for name, low, high in (
+        ("x", constants.X_MIN, constants.X_MAX),
+        ("z", constants.Z_MIN, constants.Z_MAX),
+    ):
+        if plan[name].min() < low or plan[name].max() > high:
+            print("Fresnel PVT leaves the {} range!".format(name.upper()))
+            return
+
+    sequences = {}
+    try:
+        device.set_axes(
+            plan["x"][0], constants.Y_CENTER, plan["z"][0], plan["rot"][0]
+        )
+        for name in columns:
+            axis = device.axis_units[name][0]
+            sequences[name] = axis.device.pvt.get_sequence(1)
+            sequences[name].disable()
+            sequences[name].setup_live(1)
+            sequences[name].cork()
+
+        laser = False
+        corked = True
+        for k in range(1, count):
+            if corked and k > constants.PVT_PRELOAD:
+                for sequence in sequences.values():
+                    sequence.uncork()
+                corked = False
+            duration = Measurement(plan["time"][k], Units.TIME_SECONDS)
+            for name, (positions, velocities) in columns.items():
+                unit = device.axis_units[name][1]
+                sequences[name].point(
+                    [Measurement(positions[k], unit)],
+                    [Measurement(velocities[k], velocity_units[unit])],
+                    duration,
+                )
+            if gate.digital and plan["laser"][k] != laser:
+                laser = bool(plan["laser"][k])
+                if laser:
+                    gate.on(stream=sequences["y"])
+                else:
+                    gate.off(stream=sequences["y"])
+
+        if corked:
+            for sequence in sequences.values():
+                sequence.uncork()
+        for sequence in sequences.values():
+            sequence.wait_until_idle()
+    except MotionLibException as err:
+        print(err)
+    finally:
+        for sequence in sequences.values():
+            try:
+                sequence.disable()
+            except MotionLibException as err:
+                print(err)
+
+
+# Fresnel Sweep Case
+def fresnel_case(case):
+    """Evaluates one Fresnel parameter combination without a stage.
+
+    Runs in a worker process of `sweep_fresnel`, so it only takes and returns
+    plain picklable values.
+
+    Args:
+        case (tuple): (r_vel, linear_vel, radius index, radius list, height path).
+
+    Returns:
+        dict: One row of the sweep table.
+    """
+    r_vel, linear_vel, index, radius_list, height_path = case
+    profile = classes.HeightProfile.get(height_path)
+    radii = np.asarray(radius_list, dtype=float) / 1000
+    laser_time = float(np.sum(radii[:, 1] - radii[:, 0]) / r_vel)
+
+    # Angular velocity over every ring, saturated where the cap is reached
+    saturated_time = 0.0
+    length = 0.0
+    ring_omegas = []
+    tangential = math.sqrt(max(linear_vel**2 - r_vel**2, 0.0))
+    for r1, r2 in radii:
+        r = np.linspace(r1, r2, 1000)
+        omega = spiral_angle(r, r_vel, linear_vel)[1]
+        ring_omegas.append((omega[0], omega[-1]))
+        speed = np.hypot(r_vel, r * omega)
+        length += np.sum((speed[1:] + speed[:-1]) * np.diff(r)) / 2 / r_vel
+        capped = np.clip(tangential / constants.MAX_ROT_VEL - r1, 0.0, r2 - r1)
+        saturated_time += capped / r_vel
+    ring_omegas = np.asarray(ring_omegas)
+
+    plan = plan_fresnel(radius_list, r_vel, linear_vel, profile)
+    return {
+        "r_vel": r_vel,
+        "linear_vel": linear_vel,
+        "radius_list": index,
+        "rings": len(radii),
+        "max_rot_vel": float(ring_omegas.max()),
+        "min_rot_vel": float(ring_omegas.min()),
+        "saturated": saturated_time / laser_time if laser_time else 0.0,
+        "path_length": float(length),
+        "laser_time": laser_time,
+        "time": float(plan["time"].sum()),
+    }
+
+
+# Fresnel Parameter Sweep
+def sweep_fresnel(
+    r_vels,
+    linear_vels,
+    radius_lists=(constants.RADIUS_LIST,),
+    height_path=constants.HEIGHT_PATH,
+    processes=None,
+):
+    """Compares Fresnel process parameters offline on all CPU cores.
+
+    Every combination of radial speed, linear speed and radius list is
+    evaluated in a process pool: ring angular velocities, the share of the
+    laser time spent at `constants.MAX_ROT_VEL` (where the linear speed can
+    no longer be held), the spiral length and the machining time of the
+    `plan_fresnel` trajectory.
+
+    Args:
+        r_vels (list): Radial speeds in mm/s.
+        linear_vels (list): Speeds along the spiral in mm/s.
+        radius_lists (list): `constants.RADIUS_LIST`-shaped radius lists.
+        height_path (str): The lens profile CSV. Defaults to `constants.HEIGHT_PATH`.
+        processes (int): Worker processes. Defaults to the CPU count.
+
+    Returns:
+        list: Table rows (dicts) sorted by machining time.
+    """
+    # Build the profile cache once instead of in every worker
+    classes.HeightProfile.get(height_path)
+    cases = [
+        (float(r_vel), float(linear_vel), index, radius_list, height_path)
+        for index, radius_list in enumerate(radius_lists)
+        for r_vel in r_vels
+        for linear_vel in linear_vels
+    ]
+    with multiprocessing.Pool(processes) as pool:
+        rows = pool.map(fresnel_case, cases)
+    return sorted(rows, key=lambda row: row["time"])
+
+
+# Fresnel Sweep Table
+def sweep_table(rows):
+    """Formats `sweep_fresnel` rows as a fixed-width text table.
+
+    Args:
+        rows (list): The rows returned by `sweep_fresnel`.
+
+    Returns:
+        str: The table, one combination per line.
+    """
+    columns = [
+        ("R_VEL", "r_vel", "{:.4f}"),
+        ("LINEAR_VEL", "linear_vel", "{:.2f}"),
+        ("List", "radius_list", "{}"),
+        ("Rings", "rings", "{}"),
+        ("Max w(rad/s)", "max_rot_vel", "{:.2f}"),
+        ("Min w(rad/s)", "min_rot_vel", "{:.2f}"),
+        ("Saturated", "saturated", "{:.1%}"),
+        ("Length(mm)", "path_length", "{:.1f}"),
+        ("Laser(s)", "laser_time", "{:.1f}"),
+        ("Time(s)", "time", "{:.1f}"),
+    ]
+    cells = [[title for title, _, _ in columns]] + [
+        [fmt.format(row[key]) for _, key, fmt in columns] for row in rows
+    ]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(columns))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(line, widths))
+        for line in cells
+    )
+
+
+# Fresnel Rings(In Dev)
+def Fresnel(device_list: List[Device], mode=constants.FRESNEL_MODE):
+    # Initialize Device
+    axes_list = [device.get_axis(1) for device in device_list]
+    device = classes.Device(*axes_list)
+    device.set_axes(constants.X_CENTER, constants.Y_CENTER, constants.Z_MAX, 0)
+    gate = classes.LaserGate(device)
+    gate.setup()
+    profile = classes.HeightProfile.get(constants.HEIGHT_PATH)
+
+    # Calculate and Simulate Spirals
+    def calculate_path(RADIUS_LIST, R_VEL=0.02, LINEAR_VEL=100, view=False):
+        x, y, ring_ids, thetas, theta_vels = spiral_path(
+            RADIUS_LIST, R_VEL, LINEAR_VEL
+        )
+        points = classes.PointArray(x, y, profile.z(np.hypot(x, y) / 1000))
+        rings = []
+
+        if view:
+            # Colour by ring, jumps between rings in grey
+            render_path(x / 1000, y / 1000, ring_ids, ring_ids[1:] == ring_ids[:-1])
+            print("Path Preview: {}".format(constants.PREVIEW_PATH))
+
+        for i in range(len(RADIUS_LIST)):
+            # Get R Positions
+            r1 = RADIUS_LIST[i][0] / 1000
+            r2 = RADIUS_LIST[i][1] / 1000
+
+            # Calculate Z Positions
+            z1, z2 = (float(z) for z in profile.z([r1, r2]))
+
+            # Create Ring Object
+            ring = classes.Ring(r1, r2, z1, z2, R_VEL, LINEAR_VEL)
+            rings.append(ring)
+
+        return (points, thetas, theta_vels, rings)
+
+    R_VEL = constants.FRESNEL_R_VEL
+    LINEAR_VEL = constants.FRESNEL_LINEAR_VEL
+    points, thetas, theta_vels, rings = calculate_path(
+        RADIUS_LIST=constants.RADIUS_LIST,
+        R_VEL=R_VEL,
+        LINEAR_VEL=LINEAR_VEL,
+        view=False,
+    )
+
+    if mode == "pvt":
+        plan = plan_fresnel(
+            constants.RADIUS_LIST, R_VEL, LINEAR_VEL, profile, gate.digital
+        )
+        start = time.time()
+        run_fresnel_pvt(device, gate, plan)
+        gate.finish()
+        end = time.time()
+        print("Elapsed Time = {}".format(end - start))
+        return
+
+    x_offset = constants.X_CENTER
+    r = points.r / 1000 + x_offset
 
     threads = []
     start = time.time()
@@ -734,9 +1731,9 @@ def Fresnel(device_list: List[Device]):
         # Start Rotational Movement
         device.axisrot.move_velocity(ring.w2, Units.ANGULAR_VELOCITY_RADIANS_PER_SECOND)
 
-        # Go to Rings' X and Z Positions
+        # Go to Rings' X and Z Positions, Laser On
         device.axisx.move_absolute(position=x1, unit=Units.LENGTH_MILLIMETRES)
-        device.axisz.move_absolute(ring.z1, unit=Units.LENGTH_MILLIMETRES)
+        gate.on(z=ring.z1)
 
         # Start X Movement
         device.axisx.move_absolute(
@@ -747,16 +1744,1331 @@ def Fresnel(device_list: List[Device]):
             Units.VELOCITY_MILLIMETRES_PER_SECOND,
         )
 
-        # Set Z-Axis to Max Position (Unfocus)
-        device.axisz.move_absolute(constants.Z_MAX, unit=Units.LENGTH_MILLIMETRES)
+        # Laser Off
+        gate.off()
 
         # Stop Rotational Movement
         device.axisrot.stop()
 
+    gate.finish()
     end = time.time()
     print("Elapsed Tİme = {}".format(end - start))
 
 
+# Compile G-Code Moves
+def compile_gcode(lines, state: classes.GcodeState, gate: classes.LaserGate):
+    """Turns parsed G-code lines into straight 4-axis moves.
+
+    The modal state (G90/G91, G20/G21, G92, feed, laser) is tracked by the
+    `classes.GcodeState`, so X, Y and Z are millimeters and A a rotation in
+    radians. The state is left at the end of the lines, so a program can be
+    compiled in consecutive chunks. M3/M4/M5 switch the laser: in "digital"
+    gate mode they set the laser state of the following moves, in "z" mode
+    they become a Z move in or out of focus. Moves stop before and after a
+    laser switch and around G4 P (seconds) dwells.
+
+    Args:
+        lines (iterable): `GcodeParser` lines.
+        state (classes.GcodeState): The state at the first line.
+        gate (classes.LaserGate): The laser gate.
+
+    Returns:
+        dict: positions ((n + 1, 4) array of X, Y, Z, rotation), from_start
+            (whether each of them is measured from the start), and per move:
+            feed (mm/s, inf for G0), stop (velocity must reach 0 at its end),
+            dwell (seconds spent still instead of moving), laser, line (index
+            of the program line it came from). stop_before tells whether the
+            move before the first one must end at rest and errors lists the
+            (line, command) pairs that could not be compiled.
+    """
+    positions = [list(state.position)]
+    from_start = [list(state.from_start)]
+    moves = {name: [] for name in ("feed", "stop", "dwell", "laser", "line")}
+    errors = []
+    stop_before = False
+
+    def add(target, move_feed, index, dwell=0.0, stop=False):
+        nonlocal stop_before
+        if stop and moves["stop"]:
+            moves["stop"][-1] = True
+        elif stop:
+            stop_before = True
+        if dwell == 0.0 and target == positions[-1]:
+            return
+        positions.append(target)
+        from_start.append(list(state.from_start))
+        for name, value in (
+            ("feed", move_feed),
+            ("stop", stop),
+            ("dwell", dwell),
+            ("laser", state.laser and gate.digital),
+            ("line", index),
+        ):
+            moves[name].append(value)
+
+    for line in lines:
+        index = line.line_index
+        event = state.step(line)
+        if event[0] == "move":
+            add(list(event[2]), event[3], index)
+        elif event[0] == "arc":
+            for point in event[2].tolist():
+                add(point, event[3], index)
+        elif event[0] == "laser":
+            if gate.digital:
+                add(list(positions[-1]), np.inf, index, stop=True)
+            else:
+                state.set_axis(2, gate.z_target(event[1]))
+                add(list(state.position), np.inf, index, stop=True)
+        elif event[0] == "dwell":
+            add(list(positions[-1]), np.inf, index, event[1], True)
+        elif event[0] == "unknown":
+            errors.append((index, line.gcode_str))
+
+    compiled = {name: np.asarray(values) for name, values in moves.items()}
+    compiled["positions"] = np.asarray(positions, dtype=float)
+    compiled["from_start"] = np.asarray(from_start, dtype=bool)
+    compiled["stop_before"] = stop_before
+    compiled["errors"] = errors
+    return compiled
+
+
+# Simple G-Code Lines
+GCODE_NUMBER = rb"[-+]?(?:\d+(?:\.\d+)?|\.\d+)"
+GCODE_SIMPLE = re.compile(
+    rb"[ \t]*(?:(G0*[014]|M0*[2345]|G17|G21|G90|G94|M30)((?:[ \t]*[XYZAFPS][ \t]*"
+    + GCODE_NUMBER
+    + rb")*))?[ \t]*(?:;[^\n]*)?\r?"
+)
+GCODE_WORD = re.compile(rb"([XYZAFPS])[ \t]*(" + GCODE_NUMBER + rb")|\n")
+
+
+# Forward Fill
+def forward_fill(source, initial):
+    """Carries the last given value forward, like a modal G-code word.
+
+    Args:
+        source (np.ndarray): Values, NaN where none is given.
+        initial (float): The value before the first one.
+
+    Returns:
+        np.ndarray: The value in effect at every index.
+    """
+    index = np.where(np.isnan(source), -1, np.arange(len(source)))
+    np.maximum.accumulate(index, out=index)
+    return np.where(index >= 0, source[np.maximum(index, 0)], initial)
+
+
+# Compile Simple G-Code Lines
+def compile_simple(commands, params, indexes, state: classes.GcodeState, gate):
+    """Compiles `GCODE_SIMPLE` lines with NumPy, the way `compile_gcode` would.
+
+    Args:
+        commands (list): The command of every line (b"G1", b"M3", ...), None for
+            blank lines.
+        params (list): The parameter words of every line.
+        indexes (list): The line index of every line.
+        state (classes.GcodeState): The state at the first line, left at the last one.
+        gate (classes.LaserGate): The laser gate.
+
+    Returns:
+        dict: Like `compile_gcode`, or None if the lines need the line by line
+            compiler (relative mode, unit or plane changes, repeated words).
+    """
+    if not state.absolute or (
+        (b"G17" in commands and state.plane != state.PLANES["G17"])
+        or (b"G21" in commands and state.scale != 1.0)
+    ):
+        return None
+    # Command -> 0: G0, 1: G1, 2: laser on, 3: laser off, 4: G4, 5: no-op
+    kinds = {b"G0": 0, b"G1": 1, b"M3": 2, b"M4": 2, b"M5": 3, b"G4": 4}
+    lookup = {None: 5}
+    for command in set(commands).difference(lookup):
+        # G01 is G1
+        lookup[command] = kinds.get(command[:1] + b"%d" % int(command[1:]), 5)
+    kind = np.array([lookup[command] for command in commands])
+
+    words = GCODE_WORD.findall(b"\n".join(param or b"" for param in params))
+    letters = np.frombuffer(b"".join(word[0] or b"\n" for word in words), np.uint8)
+    newline = letters == ord("\n")
+    row = np.cumsum(newline)[~newline]
+    letters = letters[~newline]
+    if len(letters) and np.bincount(row * 128 + letters).max() > 1:
+        return None
+    values = np.array([word[1] for word in words if word[0]]).astype(float)
+    count = len(kind)
+
+    def word(letter, lines):
+        source = np.full(count, np.nan)
+        given = letters == ord(letter)
+        source[row[given]] = values[given]
+        source[~lines] = np.nan
+        return source
+
+    move, dwell = kind <= 1, kind == 4
+    switch = (kind == 2) | (kind == 3)
+    feed = forward_fill(word("F", ~dwell) * state.scale, state.feed)
+    laser_source = np.where(switch, kind == 2, np.nan)
+    laser = forward_fill(laser_source, float(state.laser)) > 0.5
+
+    position = np.empty((count, 4))
+    from_start = np.empty((count, 4), dtype=bool)
+    for axis, letter in enumerate("XYZA"):
+        source = word(letter, move)
+        if axis == 3 and state.a_relative:
+            steps = np.concatenate([[state.position[3]], np.nan_to_num(source)])
+            position[:, 3] = np.cumsum(steps)[1:]
+            from_start[:, 3] = state.from_start[3]
+            continue
+        source = source * (state.scale if axis < 3 else 1.0) + state.offset[axis]
+        start_source = np.where(np.isnan(source), np.nan, state.offset_from_start[axis])
+        if axis == 2 and not gate.digital:
+            source[switch] = np.where(
+                kind[switch] == 2, gate.z_target(True), gate.z_target(False)
+            )
+            start_source[switch] = 0.0
+        position[:, axis] = forward_fill(source, state.position[axis])
+        from_start[:, axis] = forward_fill(start_source, state.from_start[axis]) > 0.5
+
+    # Rows appended by compile_gcode, and the stops asked before them
+    previous = np.vstack([state.position, position[:-1]])
+    changed = np.any(position != previous, axis=1)
+    pause = np.nan_to_num(word("P", dwell))
+    keep = (move & changed) | (dwell & (pause != 0))
+    if not gate.digital:
+        keep |= switch & changed
+    kept = np.flatnonzero(keep)
+    stop = np.isin(kind[kept], (2, 3, 4))
+    before = np.searchsorted(kept, np.flatnonzero(switch | dwell)) - 1
+    stop[before[before >= 0]] = True
+
+    compiled = {
+        "feed": np.where(kind[kept] == 1, feed[kept], np.inf),
+        "stop": stop,
+        "dwell": np.where(dwell[kept], pause[kept], 0.0),
+        "laser": laser[kept] & gate.digital,
+        "line": np.asarray(indexes)[kept],
+        "positions": np.vstack([state.position, position[kept]]),
+        "from_start": np.vstack([state.from_start, from_start[kept]]),
+        "stop_before": bool((before < 0).any()),
+        "errors": [],
+    }
+    state.position = position[-1].tolist()
+    state.from_start = from_start[-1].tolist()
+    state.feed = float(feed[-1])
+    state.laser = bool(laser[-1])
+    return compiled
+
+
+# Compile G-Code Text
+def compile_text(text: bytes, state: classes.GcodeState, gate, first_line=0):
+    """Compiles whole lines of G-code text into the moves of `compile_gcode`.
+
+    Runs of plain G0/G1, M3/M4/M5, G4 and no-op lines are compiled with
+    NumPy by `compile_simple`, the rest line by line, so programs made of
+    straight moves compile many times faster than through `GcodeParser`.
+
+    Args:
+        text (bytes): The lines.
+        state (classes.GcodeState): The state at the first line, left at the last one.
+        gate (classes.LaserGate): The laser gate.
+        first_line (int): The index of the first line in the program. Defaults to 0.
+
+    Returns:
+        dict: Like `compile_gcode`.
+    """
+    lines = text.split(b"\n")
+    pieces = []
+    simple = []
+
+    def flush_slow(first, end):
+        program = b"\n".join(lines[first:end]).decode("utf-8", errors="replace")
+        compiled = compile_gcode(parse_gcode_lines(program), state, gate)
+        compiled["line"] = np.asarray(compiled["line"], dtype=int) + first_line + first
+        compiled["errors"] = [
+            (index + first_line + first, command)
+            for index, command in compiled["errors"]
+        ]
+        pieces.append(compiled)
+
+    def flush_simple():
+        commands, params, indexes = zip(*simple)
+        compiled = compile_simple(commands, params, indexes, state, gate)
+        if compiled is None:
+            flush_slow(indexes[0], indexes[-1] + 1)
+        else:
+            compiled["line"] = compiled["line"] + first_line
+            pieces.append(compiled)
+        simple.clear()
+
+    slow = None
+    for index, line in enumerate(lines):
+        match = GCODE_SIMPLE.fullmatch(line)
+        if match is None:
+            if simple:
+                flush_simple()
+            if slow is None:
+                slow = index
+            continue
+        if slow is not None:
+            flush_slow(slow, index)
+            slow = None
+        simple.append((match.group(1), match.group(2), index))
+    if simple:
+        flush_simple()
+    if slow is not None:
+        flush_slow(slow, len(lines))
+    return join_moves(pieces, state)
+
+
+# Join Compiled Moves
+def join_moves(pieces, state=None):
+    """Concatenates consecutive `compile_gcode` results.
+
+    Args:
+        pieces (list): The results, each starting where the previous one ends.
+        state (classes.GcodeState): Gives the start when there is no piece.
+            Defaults to None.
+
+    Returns:
+        dict: Like `compile_gcode`.
+    """
+    if not pieces:
+        return compile_gcode([], state, None)
+    types = {"feed": float, "stop": bool, "dwell": float, "laser": bool, "line": int}
+    stops = [np.array(piece["stop"], dtype=bool) for piece in pieces]
+    stop_before = False
+    last = None
+    for index, piece in enumerate(pieces):
+        if piece["stop_before"] and last is None:
+            stop_before = True
+        elif piece["stop_before"]:
+            stops[last][-1] = True
+        if len(stops[index]):
+            last = index
+
+    joined = {
+        name: np.concatenate([np.asarray(piece[name], dtype=kind) for piece in pieces])
+        for name, kind in types.items()
+    }
+    joined["stop"] = np.concatenate(stops)
+    for name in ("positions", "from_start"):
+        joined[name] = np.concatenate(
+            [pieces[0][name]] + [piece[name][1:] for piece in pieces[1:]]
+        )
+    joined["stop_before"] = stop_before
+    joined["errors"] = [error for piece in pieces for error in piece["errors"]]
+    return joined
+
+
+# Compiled Move Record
+MOVE_NAMES = ("feed", "stop", "dwell", "laser", "line")
+MOVE_DTYPE = np.dtype(
+    [
+        ("target", "f8", 4),
+        ("from_start", "?", 4),
+        ("feed", "f8"),
+        ("stop", "?"),
+        ("dwell", "f8"),
+        ("laser", "?"),
+        ("line", "i8"),
+    ]
+)
+
+
+# G-Code Cache Key
+def gcode_key(gcode: str, gate: classes.LaserGate, from_file=False):
+    """Returns the cache key of a program: the SHA-256 of its text and of
+    the settings `compile_gcode` depends on.
+
+    Args:
+        gcode (str): The program, or the path of a file holding it.
+        gate (classes.LaserGate): The laser gate.
+        from_file (bool): Whether `gcode` is a path. Defaults to False.
+
+    Returns:
+        str: Hex digest.
+    """
+    settings = {
+        "version": 2,
+        "gate": gate.mode,
+        "focus_z": gate.focus_z,
+        "z_max": constants.Z_MAX,
+        "a_relative": constants.GCODE_A_RELATIVE,
+        "arc_tolerance": constants.GCODE_ARC_TOLERANCE,
+    }
+    sha = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    if not from_file:
+        sha.update(gcode.encode())
+        return sha.hexdigest()
+    with open(gcode, "rb") as file:
+        for chunk in iter(lambda: file.read(constants.GCODE_READ_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# Compiled G-Code Program
+def gcode_program(
+    gcode: str,
+    gate: classes.LaserGate,
+    start,
+    from_file=False,
+    folder=constants.GCODE_CACHE_FOLDER,
+):
+    """Compiles a program chunk by chunk, or reads it back from the cache.
+
+    The moves are cached as `MOVE_DTYPE` records in `<key>.bin` with the
+    line count and the errors in `<key>.json`, written once the program
+    has been compiled to its end. Records keep which coordinates are
+    measured from the start position (`from_start`) and hold them relative
+    to it, so the same cached program runs from anywhere; programs whose
+    arcs depend on the start in other ways are not cached. A cached program
+    is memory-mapped and handed out in chunks of `constants.GCODE_CHUNK_LINES`
+    moves without parsing it again.
+
+    Args:
+        gcode (str): The program, or the path of a file holding it.
+        gate (classes.LaserGate): The laser gate.
+        start (list): X, Y, Z in millimeters and rotation in radians.
+        from_file (bool): Whether `gcode` is a path. Defaults to False.
+        folder (str): The cache folder, or None to not cache. Defaults to
+            `constants.GCODE_CACHE_FOLDER`.
+
+    Returns:
+        tuple: The number of lines and a generator of `compile_gcode` chunks.
+    """
+    path = None
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+        evict_gcode_cache(folder)
+        path = os.path.join(folder, gcode_key(gcode, gate, from_file))
+        meta = cached_meta(path)
+        if meta is not None:
+            return meta["total_lines"], cached_chunks(path, meta, start)
+
+    reader = classes.GcodeReader(gcode, from_file)
+    return reader.total_lines, compiled_chunks(reader, gate, start, path)
+
+
+# Compile G-Code Chunks
+def compiled_chunks(
+    reader: classes.GcodeReader, gate: classes.LaserGate, start, path=None
+):
+    """Compiles the lines of a reader, caching the moves at `path`.
+
+    Args:
+        reader (classes.GcodeReader): The program.
+        gate (classes.LaserGate): The laser gate.
+        start (list): X, Y, Z in millimeters and rotation in radians.
+        path (str): The cache path without suffix, or None. Defaults to None.
+
+    Yields:
+        dict: `compile_gcode` chunks of `constants.GCODE_CHUNK_LINES` lines.
+    """
+    state = classes.GcodeState(start)
+    start = np.asarray(state.position)
+    lines = iter(reader)
+    file = open(path + ".bin.tmp", "wb") if path is not None else None
+    errors = []
+    count = 0
+    held = None
+    try:
+        while chunk := list(itertools.islice(lines, constants.GCODE_CHUNK_LINES)):
+            compiled = compile_gcode(chunk, state, gate)
+            errors += compiled["errors"]
+            if file is not None:
+                # The previous records are written once their last stop is known
+                if held is not None:
+                    if compiled["stop_before"] and len(held):
+                        held["stop"][-1] = True
+                    held.tofile(file)
+                    count += len(held)
+                held = np.empty(len(compiled["feed"]), dtype=MOVE_DTYPE)
+                held["target"] = (
+                    compiled["positions"][1:] - start * compiled["from_start"][1:]
+                )
+                held["from_start"] = compiled["from_start"][1:]
+                for name in ("feed", "stop", "dwell", "laser", "line"):
+                    held[name] = compiled[name]
+            yield compiled
+
+        if file is not None and state.shiftable:
+            if held is not None:
+                held.tofile(file)
+                count += len(held)
+            file.close()
+            os.replace(path + ".bin.tmp", path + ".bin")
+            with open(path + ".json.tmp", "w", encoding="utf-8") as meta:
+                json.dump(
+                    {"count": count, "total_lines": reader.total_lines, "errors": errors},
+                    meta,
+                )
+            os.replace(path + ".json.tmp", path + ".json")
+    finally:
+        reader.close()
+        if file is not None and not file.closed:
+            file.close()
+            os.remove(path + ".bin.tmp")
+
+
+# Read Cached G-Code Metadata
+def cached_meta(path):
+    """Returns the metadata of a cached program, or None on a cache miss.
+
+    Metadata that cannot be read, or that does not match the size of
+    `<path>.bin`, counts as a miss and the program is compiled again.
+    A hit marks the program as used for `evict_gcode_cache`.
+
+    Args:
+        path (str): The cache path without suffix.
+
+    Returns:
+        dict: The contents of `<path>.json`, or None.
+    """
+    try:
+        with open(path + ".json", encoding="utf-8") as file:
+            meta = json.load(file)
+        count, meta["total_lines"] = int(meta["count"]), int(meta["total_lines"])
+        size = os.path.getsize(path + ".bin")
+        if size != count * MOVE_DTYPE.itemsize or not isinstance(meta["errors"], list):
+            return None
+        os.utime(path + ".json")
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        if not isinstance(err, FileNotFoundError):
+            print(f"Ignoring the cached program {path}: {err}")
+        return None
+    return meta
+
+
+# Evict Cached G-Code Programs
+def evict_gcode_cache(
+    folder,
+    max_bytes=constants.GCODE_CACHE_MAX_BYTES,
+    max_age=constants.GCODE_CACHE_MAX_AGE,
+):
+    """Deletes cached programs not used for `max_age` seconds, then the least
+    recently used ones until the cache fits in `max_bytes`.
+
+    Leftover temporary files older than `max_age` are deleted as well.
+
+    Args:
+        folder (str): The cache folder.
+        max_bytes (int): The size limit of the folder. Defaults to
+            `constants.GCODE_CACHE_MAX_BYTES`.
+        max_age (float): Seconds since the last use. Defaults to
+            `constants.GCODE_CACHE_MAX_AGE`.
+
+    Returns:
+        int: The number of programs deleted.
+    """
+    now = time.time()
+    entries = {}
+    for entry in os.scandir(folder):
+        key, _, suffix = entry.name.partition(".")
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if suffix.endswith(".tmp"):
+            if now - stat.st_mtime > max_age:
+                remove_files([entry.path])
+            continue
+        if suffix not in {"bin", "json"}:
+            continue
+        used, size, paths = entries.get(key, (0.0, 0, []))
+        if suffix == "json":
+            used = stat.st_mtime
+        entries[key] = (used, size + stat.st_size, paths + [entry.path])
+
+    total = sum(size for _, size, _ in entries.values())
+    deleted = 0
+    for used, size, paths in sorted(entries.values()):
+        if now - used <= max_age and total <= max_bytes:
+            break
+        remove_files(paths)
+        total -= size
+        deleted += 1
+    return deleted
+
+
+# Remove Files
+def remove_files(paths):
+    """Removes files, printing the ones that cannot be removed.
+
+    Args:
+        paths (list): The file paths.
+
+    Returns:
+        None
+    """
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError as err:
+            print(err)
+
+
+# Read Cached G-Code Chunks
+def cached_chunks(path, meta, start):
+    """Hands out a cached program in the chunks `compile_gcode` would give.
+
+    Args:
+        path (str): The cache path without suffix.
+        meta (dict): The contents of `<path>.json`.
+        start (list): X, Y, Z in millimeters and rotation in radians.
+
+    Yields:
+        dict: Chunks of `constants.GCODE_CHUNK_LINES` moves.
+    """
+    start = np.asarray(start, dtype=float)
+    records = np.zeros(0, dtype=MOVE_DTYPE)
+    if meta["count"]:
+        records = np.memmap(
+            path + ".bin", dtype=MOVE_DTYPE, mode="r", shape=(meta["count"],)
+        )
+    previous = np.zeros(1, dtype=MOVE_DTYPE)
+    previous["from_start"] = True
+    errors = [tuple(error) for error in meta["errors"]]
+    for first in range(0, max(len(records), 1), constants.GCODE_CHUNK_LINES):
+        end = first + constants.GCODE_CHUNK_LINES
+        chunk = np.concatenate([previous, records[first:end]])
+        compiled = {
+            name: chunk[name][1:] for name in ("feed", "stop", "dwell", "laser", "line")
+        }
+        compiled["positions"] = chunk["target"] + start * chunk["from_start"]
+        compiled["from_start"] = chunk["from_start"]
+        compiled["stop_before"] = False
+        compiled["errors"] = errors
+        errors = []
+        previous = chunk[-1:]
+        yield compiled
+
+
+# Plan Move Velocities
+def plan_moves(positions, feeds, stops, dwells, entry=0.0):
+    """Plans blended trapezoidal velocity profiles for consecutive moves.
+
+    Every move is a straight line in X, Y, Z and rotation, the rotation
+    weighted by the radius around (X_CENTER, Y_CENTER) so that the feed is a
+    surface speed. Corner speeds follow the junction deviation model, then a
+    backward and a forward pass keep every move within its acceleration so
+    the last move ends at rest.
+
+    Args:
+        positions (np.ndarray): (n + 1, 4) move end points, the first being the start.
+        feeds (np.ndarray): Feed of every move in mm/s (inf for the axis limits).
+        stops (np.ndarray): Whether every move has to end at rest.
+        dwells (np.ndarray): Seconds every move stays still instead of moving.
+        entry (float): Speed at the start of the first move. Defaults to 0.0.
+
+    Returns:
+        dict: Per move arrays: start, delta (axis distances), length, entry,
+            exit, cruise, acceleration, and the durations t_acc, t_cruise,
+            t_dec of its three phases (t_cruise holds the dwell of a dwell).
+    """
+    positions = np.asarray(positions, dtype=float)
+    start = positions[:-1]
+    delta = np.diff(positions, axis=0)
+
+    # Rotation as arc length at the start radius (not less than 1 µm)
+    radius = np.maximum(
+        np.hypot(start[:, 0] - constants.X_CENTER, start[:, 1] - constants.Y_CENTER),
+        1e-3,
+    )
+    weighted = delta.copy()
+    weighted[:, 3] *= radius
+    length = np.linalg.norm(weighted, axis=1)
+    moving = length > 0
+    direction = np.zeros_like(weighted)
+    direction[moving] = weighted[moving] / length[moving, None]
+
+    # Speed and acceleration along each move within every axis limit
+    velocity_limits = np.empty_like(weighted)
+    velocity_limits[:, :3] = (constants.MAX_X_VEL, constants.MAX_Y_VEL, constants.MAX_Z_VEL)
+    velocity_limits[:, 3] = constants.MAX_ROT_VEL * radius
+    acceleration_limits = np.empty_like(weighted)
+    acceleration_limits[:, :3] = (constants.MAX_X_ACC, constants.MAX_Y_ACC, constants.MAX_Z_ACC)
+    acceleration_limits[:, 3] = constants.MAX_ROT_ACC * radius
+    share = np.abs(direction)
+    with np.errstate(divide="ignore"):
+        top = np.min(velocity_limits / share, axis=1)
+        acceleration = np.min(acceleration_limits / share, axis=1)
+    top = np.minimum(top, np.asarray(feeds, dtype=float))
+    acceleration[~moving] = np.inf
+
+    # Corner speeds from the junction deviation
+    junction = np.zeros(len(length))
+    if len(length) > 1:
+        # Half of the angle between the reversed entry and the exit direction
+        cos = np.clip(np.sum(direction[:-1] * direction[1:], axis=1), -1.0, 1.0)
+        sin_half = np.sqrt((1 + cos) / 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corner = np.sqrt(
+                np.minimum(acceleration[:-1], acceleration[1:])
+                * constants.GCODE_JUNCTION_DEVIATION
+                * sin_half
+                / (1 - sin_half)
+            )
+        corner[sin_half > 1 - 1e-9] = np.inf
+        junction[:-1] = np.minimum(corner, np.minimum(top[:-1], top[1:]))
+        junction[:-1][~(moving[:-1] & moving[1:])] = 0.0
+    junction[np.asarray(stops, dtype=bool)] = 0.0
+    junction[-1:] = 0.0
+
+    # Backward pass: every move must be able to slow down to the next one
+    length_list = length.tolist()
+    reach = np.zeros(len(length))
+    reach[moving] = 2 * acceleration[moving] * length[moving]
+    reach_list = reach.tolist()
+    top_list = top.tolist()
+    exit = junction.tolist()
+    entries = [0.0] * len(exit)
+    sqrt = math.sqrt
+    following = 0.0
+    for k in range(len(exit) - 1, -1, -1):
+        speed = exit[k]
+        if speed > following:
+            speed = following
+        exit[k] = speed
+        if length_list[k]:
+            reach = sqrt(speed * speed + reach_list[k])
+            speed = reach if reach < top_list[k] else top_list[k]
+        entries[k] = following = speed
+
+    # Forward pass: and speed up from the previous one
+    previous = entry
+    for k in range(len(exit)):
+        speed = entries[k]
+        if speed > previous:
+            speed = previous
+        entries[k] = speed
+        if not length_list[k]:
+            exit[k] = speed
+        else:
+            reach = sqrt(speed * speed + reach_list[k])
+            if reach < exit[k]:
+                exit[k] = reach
+        previous = exit[k]
+
+    entry_speed = np.asarray(entries)
+    exit_speed = np.asarray(exit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cruise = np.minimum(
+            top,
+            np.sqrt(acceleration * length + (entry_speed**2 + exit_speed**2) / 2),
+        )
+        cruise = np.maximum(cruise, np.maximum(entry_speed, exit_speed))
+        t_acc = np.where(moving, (cruise - entry_speed) / acceleration, 0.0)
+        t_dec = np.where(moving, (cruise - exit_speed) / acceleration, 0.0)
+        cruise_length = (
+            length
+            - (cruise**2 - entry_speed**2) / (2 * acceleration)
+            - (cruise**2 - exit_speed**2) / (2 * acceleration)
+        )
+        t_cruise = np.where(moving, np.maximum(cruise_length, 0.0) / cruise, 0.0)
+    t_cruise = np.where(moving, t_cruise, np.asarray(dwells, dtype=float))
+    cruise[~moving] = 0.0
+
+    return {
+        "start": start,
+        "delta": delta,
+        "length": length,
+        "entry": entry_speed,
+        "exit": exit_speed,
+        "cruise": cruise,
+        "acceleration": acceleration,
+        "t_acc": np.nan_to_num(t_acc),
+        "t_cruise": np.nan_to_num(t_cruise),
+        "t_dec": np.nan_to_num(t_dec),
+    }
+
+
+# Move Knots
+def move_knots(plan):
+    """Splits planned moves into PVT points at their phase boundaries.
+
+    Every move gives up to three points: end of speed-up, end of cruise and
+    end of slow-down. Phases without duration are dropped.
+
+    Args:
+        plan (dict): The plan returned by `plan_moves`.
+
+    Returns:
+        dict: Per point arrays: time (seconds from the previous point),
+            position and velocity ((m, 4) arrays), and move (index of its move).
+    """
+    length = plan["length"]
+    moving = length > 0
+    unit = np.zeros_like(plan["delta"])
+    unit[moving] = plan["delta"][moving] / length[moving, None]
+
+    speed = np.stack([plan["cruise"], plan["cruise"], plan["exit"]], axis=1)
+    speed[~moving] = 0.0
+    acc_length = (plan["entry"] + plan["cruise"]) / 2 * plan["t_acc"]
+    dec_length = (plan["cruise"] + plan["exit"]) / 2 * plan["t_dec"]
+    distance = np.stack([acc_length, length - dec_length, length], axis=1)
+    durations = np.stack([plan["t_acc"], plan["t_cruise"], plan["t_dec"]], axis=1)
+
+    keep = durations > 1e-9
+    move, phase = np.nonzero(keep)
+    position = plan["start"][move] + unit[move] * distance[keep][:, None]
+    return {
+        "time": durations[keep],
+        "position": position,
+        "velocity": unit[move] * speed[keep][:, None],
+        "move": move,
+        "end": phase == 2,
+    }
+
+
+# Merge Knots
+def merge_knots(
+    knots,
+    start,
+    min_time=constants.GCODE_MIN_SEGMENT_TIME,
+    tolerance=constants.GCODE_TOLERANCE,
+):
+    """Drops PVT points closer than `min_time` where the cubic between their
+    neighbours stays within `tolerance` of them.
+
+    Tiny segments would otherwise be sent faster than the devices accept them.
+    Points at rest and the last point are always kept.
+
+    Args:
+        knots (dict): The points returned by `move_knots`, starting at rest.
+        start (np.ndarray): The position before the first point.
+        min_time (float): The shortest segment wanted in seconds.
+            Defaults to `constants.GCODE_MIN_SEGMENT_TIME`.
+        tolerance (float): The largest error allowed on every axis.
+            Defaults to `constants.GCODE_TOLERANCE`.
+
+    Returns:
+        dict: The kept points, with the times of the dropped ones added to the
+            following kept point.
+    """
+    count = len(knots["time"])
+    if count == 0:
+        return knots
+    clock = np.cumsum(knots["time"])
+    still = ~np.any(knots["velocity"], axis=1)
+
+    # Greedy pass on time
+    keep = np.zeros(count, dtype=bool)
+    last = 0.0
+    for i, (now, rest) in enumerate(zip(clock.tolist(), still.tolist())):
+        if rest or now - last >= min_time:
+            keep[i] = True
+            last = now
+    keep[-1] = True
+
+    # Put back the dropped points the cubic misses
+    times = np.concatenate(([0.0], clock))
+    positions = np.vstack([start, knots["position"]])
+    velocities = np.vstack([np.zeros_like(start), knots["velocity"]])
+    while True:
+        kept = np.concatenate(([0], np.flatnonzero(keep) + 1))
+        dropped = np.flatnonzero(~keep) + 1
+        if len(dropped) == 0:
+            break
+        after = kept[np.searchsorted(kept, dropped)]
+        before = kept[np.searchsorted(kept, dropped) - 1]
+        span = (times[after] - times[before])[:, None]
+        s = (times[dropped][:, None] - times[before][:, None]) / span
+        estimate = (
+            (2 * s**3 - 3 * s**2 + 1) * positions[before]
+            + (s**3 - 2 * s**2 + s) * span * velocities[before]
+            + (-2 * s**3 + 3 * s**2) * positions[after]
+            + (s**3 - s**2) * span * velocities[after]
+        )
+        error = np.abs(estimate - positions[dropped]).max(axis=1)
+        missed = dropped[error > tolerance] - 1
+        if len(missed) == 0:
+            break
+        keep[missed] = True
+
+    merged = {name: values[keep] for name, values in knots.items()}
+    merged["time"] = np.diff(np.concatenate(([0.0], clock[keep])))
+    return merged
+
+
+# Braking Cut
+def braking_cut(plan):
+    """Returns how many planned moves can run before more moves are known.
+
+    The moves within braking distance of the end of the plan (at the highest
+    planned speed and the lowest acceleration) are held back, since a longer
+    plan may let them end faster.
+
+    Args:
+        plan (dict): The plan returned by `plan_moves`.
+
+    Returns:
+        int: The number of moves to run, 0 if the plan is too short.
+    """
+    moving = plan["length"] > 0
+    brake = 0.0
+    if moving.any():
+        brake = plan["cruise"].max() ** 2 / (2 * plan["acceleration"][moving].min())
+    remaining = np.cumsum(plan["length"][::-1])[::-1]
+    return max(int(np.count_nonzero(remaining >= brake)) - 1, 0)
+
+
+# Run Planned G-Code
+def run_moves(
+    device: classes.Device,
+    gate: classes.LaserGate,
+    chunks,
+    window: classes.WindowController,
+    stop_event: threading.Event,
+    resume_event: threading.Event,
+    total_lines,
+    streamer: classes.PvtStreamer = None,
+):
+    """Streams compiled moves as blended PVT points, pausing along the path.
+
+    Points are queued `constants.GCODE_LOOKAHEAD_TIME` ahead of the stage and
+    the axes only come to rest where the plan does (laser switches, dwells,
+    the end). Moves arrive in compiled chunks: the ones within braking
+    distance of the last compiled move wait for the next chunk, so only about
+    `constants.GCODE_CHUNK_LINES` moves are planned at once. A pause slows
+    down along the next moves, at least `constants.GCODE_HOLD_MOVES` of them,
+    and resumes from rest.
+
+    Args:
+        device (classes.Device): The device object controlling the axes.
+        gate (classes.LaserGate): The laser gate.
+        chunks (iterable): Moves returned by `compile_gcode`, each chunk
+            starting where the previous one ends.
+        window (classes.WindowController): Window controller for UI updates.
+        stop_event (threading.Event): Event to signal stop request.
+        resume_event (threading.Event): Event to signal resume after pause.
+        total_lines (int): The number of lines, for the progress bar.
+        streamer (classes.PvtStreamer): Live sequences kept open after the
+            moves, e.g. from a `classes.GcodeSession`. Defaults to None (set
+            up and closed here).
+
+    Returns:
+        bool: True if every move was sent and executed. The sequences are
+            disabled otherwise.
+    """
+    names = MOVE_NAMES
+    chunks = iter(chunks)
+    owned = streamer is None
+    if owned:
+        streamer = classes.PvtStreamer(device, gate)
+    pending = None
+    final = False
+    entry = 0.0
+
+    # Appends the next chunk to the moves not sent yet
+    def extend():
+        nonlocal pending, final
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+        elif pending is None:
+            pending = chunk
+        else:
+            pending = join_moves([pending, chunk])
+
+    # Queues points, returns the move to slow down from on a pause or -1
+    def send(knots, first, hold=False):
+        for i in range(len(knots["time"])):
+            if stop_event.is_set():
+                return None
+            # Pauses start on a move boundary
+            if not hold and not resume_event.is_set():
+                if i == 0:
+                    return first
+                if knots["end"][i - 1]:
+                    return first + int(knots["move"][i - 1]) + 1
+            move = first + int(knots["move"][i])
+            line = int(pending["line"][move]) + 1
+            window.bar["value"] = (line / total_lines) * 100
+            window.config_progress_text(line, total_lines)
+            streamer.point(
+                knots["time"][i],
+                knots["position"][i],
+                knots["velocity"][i],
+                bool(pending["laser"][move]),
+            )
+        return -1
+
+    try:
+        while True:
+            while not final and (
+                pending is None or len(pending["feed"]) < constants.GCODE_CHUNK_LINES
+            ):
+                extend()
+            if pending is None or not len(pending["feed"]):
+                break
+            positions = pending["positions"]
+            pending_start = pending["from_start"]
+            columns = [pending[name] for name in ("feed", "stop", "dwell")]
+            count = len(columns[0])
+            plan = plan_moves(positions, *columns, entry=entry)
+
+            # Keep the moves needed to brake at the end until more are compiled
+            cut = count if final else braking_cut(plan)
+            if cut == 0:
+                extend()
+                continue
+
+            sent = {name: value[:cut] for name, value in plan.items()}
+            knots = merge_knots(move_knots(sent), positions[0])
+            held = send(knots, 0)
+            if held is None:
+                streamer.abort()
+                return False
+            if held == -1:
+                entry = float(plan["exit"][cut - 1])
+                pending = {name: pending[name][cut:] for name in names}
+                pending["positions"] = positions[cut:]
+                pending["from_start"] = pending_start[cut:]
+                pending["stop_before"], pending["errors"] = False, []
+                continue
+            if held >= count:
+                break
+
+            # Pause: slow down to rest along the next moves
+            speed = float(plan["entry"][held])
+            first = held
+            moves = constants.GCODE_HOLD_MOVES
+            while speed > 0:
+                end = min(first + moves, count)
+                hold = plan_moves(
+                    positions[first : end + 1],
+                    *(column[first:end] for column in columns),
+                    entry=speed,
+                )
+                if hold["entry"][0] >= speed - 1e-9 or end == count:
+                    if send(move_knots(hold), first, hold=True) is None:
+                        streamer.abort()
+                        return False
+                    first = end
+                    break
+                moves *= 2
+            streamer.drain()
+            while not resume_event.is_set():
+                time.sleep(1)
+                if stop_event.is_set():
+                    streamer.abort()
+                    return False
+            entry = 0.0
+            pending = {name: pending[name][first:] for name in names}
+            pending["positions"] = positions[first:]
+            pending["from_start"] = pending_start[first:]
+            pending["stop_before"], pending["errors"] = False, []
+        streamer.drain()
+    except MotionLibException as err:
+        print(err)
+        window.print_msg("ERROR - TASK IS ABORTED!", "red")
+        streamer.abort()
+        return False
+    except Exception:
+        streamer.abort()
+        raise
+    if owned:
+        streamer.close()
+    return True
+
+
+# G-Code Look-Ahead
+def gcode_lookahead(
+    gcode: str,
+    device_list: List[Device],
+    window: classes.WindowController,
+    button: Button,
+    lock: threading.Lock,
+    stop_event: threading.Event,
+    resume_event: threading.Event,
+    from_file: bool = False,
+    session: classes.GcodeSession = None,
+):
+    """Runs G-code as blended PVT motion instead of one translator move per line.
+
+    The program comes from `gcode_program`, compiled
+    `constants.GCODE_CHUNK_LINES` lines at a time while `run_moves` runs the
+    chunks compiled before, or read back from the cache when
+    `constants.GCODE_CACHE` is set. Every chunk is checked against the axis
+    ranges before it is run; a chunk out of range ends the program at rest
+    after the previous one. Arguments are the same as `GCode`; the sequences
+    of `session` stay live after a program that ran to the end.
+
+    Returns:
+        None
+    """
+    owned = session is None
+    if owned:
+        session = classes.GcodeSession(device_list)
+    all_devices = session.device
+    lock.acquire()
+
+    low = (constants.X_MIN, constants.Y_MIN, constants.Z_MIN)
+    high = (constants.X_MAX, constants.Y_MAX, constants.Z_MAX)
+
+    def checked_chunks(chunks):
+        for compiled in chunks:
+            for _, command in compiled["errors"]:
+                window.print_msg("Wrong Command", "red")
+                print(f"Wrong Command: {command}.")
+            linear = compiled["positions"][:, :3]
+            if (linear < low).any() or (linear > high).any():
+                window.print_msg("OUT OF RANGE - TASK IS ABORTED!", "red")
+                return
+            yield compiled
+
+    chunks = None
+    done = False
+    try:
+        if constants.PREVIEW and not from_file:
+            gcode_preview(gcode)
+        gate = classes.LaserGate(all_devices)
+        gate.setup()
+        start = all_devices.read_positions()[:3] + [
+            all_devices.axisrot.get_position(Units.ANGLE_RADIANS)
+        ]
+        folder = constants.GCODE_CACHE_FOLDER if constants.GCODE_CACHE else None
+        total_lines, chunks = gcode_program(gcode, gate, start, from_file, folder)
+        done = run_moves(
+            all_devices,
+            gate,
+            checked_chunks(chunks),
+            window,
+            stop_event,
+            resume_event,
+            total_lines,
+            session.streamer(gate),
+        )
+        gate.off()
+    except (MotionLibException, OSError) as err:
+        print(err)
+        window.print_msg("ERROR - TASK IS ABORTED!", "red")
+    finally:
+        if chunks is not None:
+            chunks.close()
+        if owned or not done:
+            session.close()
+        lock.release()
+        button.invoke()
+
+
+# Read G-Code Text Chunks
+def gcode_text_chunks(gcode: str, from_file=False):
+    """Splits a program into chunks of whole lines of about
+    `constants.GCODE_READ_SIZE` bytes.
+
+    Args:
+        gcode (str): The program, or the path of a file holding it.
+        from_file (bool): Whether `gcode` is a path. Defaults to False.
+
+    Yields:
+        tuple: The lines (bytes) and the index of their first line.
+    """
+    file = open(gcode, "rb") if from_file else io.BytesIO(gcode.encode())
+    first_line = 0
+    rest = b""
+    with file:
+        while chunk := file.read(constants.GCODE_READ_SIZE):
+            chunk = rest + chunk
+            end = chunk.rfind(b"\n") + 1
+            if end == 0:
+                rest = chunk
+                continue
+            rest = chunk[end:]
+            yield chunk[:end], first_line
+            first_line += chunk.count(b"\n", 0, end)
+    if rest:
+        yield rest, first_line
+
+
+# Dry-Run G-Code
+def dry_run(
+    gcode: str,
+    from_file=False,
+    start=None,
+    mode=constants.LASER_GATE,
+    slowest=constants.DRY_RUN_SLOWEST,
+):
+    """Runs a program through the interpreter and the planner without devices.
+
+    Every target is checked against the X/Y/Z ranges and every feed against
+    `constants.MAX_ROT_VEL` at its radius. The cycle time is the duration of
+    the moves planned like `run_moves` does, within the axis velocity and
+    acceleration limits. Programs are compiled with `compile_text`, so a
+    million lines of straight moves take seconds.
+
+    Args:
+        gcode (str): The program, or the path of a file holding it.
+        from_file (bool): Whether `gcode` is a path. Defaults to False.
+        start (list): X, Y, Z in millimeters and rotation in radians.
+            Defaults to the initial X, Y, Z and no rotation.
+        mode (str): The laser gate mode. Defaults to `constants.LASER_GATE`.
+        slowest (int): How many of the longest moves to report. Defaults to
+            `constants.DRY_RUN_SLOWEST`.
+
+    Returns:
+        dict: lines, moves, errors ((line, command) pairs), out_of_range and
+            rot_capped (lines of the moves outside the ranges or asking for
+            more than `constants.MAX_ROT_VEL`), path_length (mm, X/Y/Z),
+            rotation (rad), time (s) and slowest, a list of (duration, line,
+            length, feed, average speed) of the longest moves.
+    """
+    if start is None:
+        start = [constants.INITIAL_X, constants.INITIAL_Y, constants.INITIAL_Z, 0.0]
+    state = classes.GcodeState(start)
+    gate = classes.LaserGate(None, mode)
+    low = (constants.X_MIN, constants.Y_MIN, constants.Z_MIN)
+    high = (constants.X_MAX, constants.Y_MAX, constants.Z_MAX)
+    report = {
+        "lines": 0,
+        "moves": 0,
+        "errors": [],
+        "out_of_range": [],
+        "rot_capped": [],
+        "path_length": 0.0,
+        "rotation": 0.0,
+        "time": 0.0,
+        "slowest": [],
+    }
+
+    def plan(pending, final, entry):
+        planned = plan_moves(
+            pending["positions"],
+            pending["feed"],
+            pending["stop"],
+            pending["dwell"],
+            entry,
+        )
+        cut = len(pending["feed"]) if final else braking_cut(planned)
+        duration = (planned["t_acc"] + planned["t_cruise"] + planned["t_dec"])[:cut]
+        report["time"] += float(duration.sum())
+        longest = np.argsort(duration)[::-1][:slowest]
+        length, feed = planned["length"][longest], pending["feed"][longest]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = np.where(duration[longest] > 0, length / duration[longest], 0.0)
+        report["slowest"] = sorted(
+            report["slowest"]
+            + list(
+                zip(
+                    duration[longest].tolist(),
+                    (pending["line"][longest] + 1).tolist(),
+                    length.tolist(),
+                    feed.tolist(),
+                    speed.tolist(),
+                )
+            ),
+            reverse=True,
+        )[:slowest]
+        return cut, (float(planned["exit"][cut - 1]) if cut else entry)
+
+    pending = None
+    entry = 0.0
+    for text, first_line in gcode_text_chunks(gcode, from_file):
+        report["lines"] = first_line + text.count(b"\n") + (not text.endswith(b"\n"))
+        compiled = compile_text(text, state, gate, first_line)
+        report["errors"] += compiled["errors"]
+
+        positions = compiled["positions"]
+        delta = np.diff(positions, axis=0)
+        linear = positions[1:, :3]
+        outside = np.any((linear < low) | (linear > high), axis=1)
+        report["out_of_range"] += (compiled["line"][outside] + 1).tolist()
+        length = np.linalg.norm(delta[:, :3], axis=1)
+        radius = np.hypot(
+            positions[:-1, 0] - constants.X_CENTER,
+            positions[:-1, 1] - constants.Y_CENTER,
+        )
+        surface = np.hypot(length, delta[:, 3] * np.maximum(radius, 1e-3))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rot_vel = np.abs(delta[:, 3]) * compiled["feed"] / surface
+        capped = np.isfinite(rot_vel) & (rot_vel > constants.MAX_ROT_VEL)
+        report["rot_capped"] += (compiled["line"][capped] + 1).tolist()
+        report["path_length"] += float(length.sum())
+        report["rotation"] += float(np.abs(delta[:, 3]).sum())
+        report["moves"] += len(compiled["feed"])
+
+        pending = compiled if pending is None else join_moves([pending, compiled])
+        if len(pending["feed"]) >= constants.GCODE_CHUNK_LINES:
+            cut, entry = plan(pending, False, entry)
+            names = MOVE_NAMES + ("positions", "from_start")
+            pending = {name: pending[name][cut:] for name in names}
+            pending["stop_before"], pending["errors"] = False, []
+
+    if pending is not None and len(pending["feed"]):
+        plan(pending, True, entry)
+    return report
+
+
+# Dry-Run Report
+def dry_run_text(report, limit=constants.DRY_RUN_SLOWEST):
+    """Formats a `dry_run` report.
+
+    Args:
+        report (dict): The report returned by `dry_run`.
+        limit (int): How many offending lines to list. Defaults to
+            `constants.DRY_RUN_SLOWEST`.
+
+    Returns:
+        str: A summary, the problems found and a table of the longest moves.
+    """
+
+    def lines(values):
+        listed = ", ".join(str(value) for value in values[:limit])
+        return listed + (", ..." if len(values) > limit else "")
+
+    text = [
+        "Lines: {}  Moves: {}".format(report["lines"], report["moves"]),
+        "Path length: {:.1f} mm  Rotation: {:.2f} rad".format(
+            report["path_length"], report["rotation"]
+        ),
+        "Cycle time: {}".format(datetime.timedelta(seconds=round(report["time"]))),
+    ]
+    if report["errors"]:
+        text.append(
+            "Wrong commands ({}): {}".format(
+                len(report["errors"]),
+                lines(
+                    [
+                        "{} {}".format(line + 1, command)
+                        for line, command in report["errors"]
+                    ]
+                ),
+            )
+        )
+    if report["out_of_range"]:
+        text.append(
+            "OUT OF RANGE ({}) at lines: {}".format(
+                len(report["out_of_range"]), lines(report["out_of_range"])
+            )
+        )
+    if report["rot_capped"]:
+        text.append(
+            "Rotation above MAX_ROT_VEL ({}) at lines: {}".format(
+                len(report["rot_capped"]), lines(report["rot_capped"])
+            )
+        )
+
+    columns = ("Time(s)", "Line", "Length(mm)", "Feed(mm/s)", "Speed(mm/s)")
+    cells = [list(columns)] + [
+        [
+            "{:.3f}".format(duration),
+            str(line),
+            "{:.3f}".format(length),
+            "{:.2f}".format(feed) if math.isfinite(feed) else "G0",
+            "{:.2f}".format(speed),
+        ]
+        for duration, line, length, feed, speed in report["slowest"]
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+    text.append("Longest moves:")
+    text += [
+        "  ".join(cell.rjust(width) for cell, width in zip(row, widths))
+        for row in cells
+    ]
+    return "\n".join(text)
+
+
 # GCode(In Dev)
 def GCode(
     gcode: str,
@@ -766,33 +3078,45 @@ def GCode(
     lock: threading.Lock,
     stop_event: threading.Event,
     resume_event: threading.Event,
+    lookahead: bool = constants.GCODE_LOOKAHEAD,
+    from_file: bool = False,
+    session: classes.GcodeSession = None,
 ):
     """
     Executes G-code commands on a list of devices, controlling their movements
     based on the parsed G-code instructions.
 
     Parameters:
-    - gcode (str): The G-code string containing the movement commands.
+    - gcode (str): The G-code string containing the movement commands, or the path of
+      a G-code file if `from_file` is set.
     - device_list (List[Device]): List of Device objects representing the axes to be controlled.
     - window (classes.WindowController): The window controller for updating UI elements.
     - button (Button): Button to invoke upon completion or error.
     - lock (threading.Lock): Thread lock to control access to shared resources.
     - stop_event (threading.Event): Event to signal stopping the execution.
     - resume_event (threading.Event): Event to signal resuming the execution.
+    - lookahead (bool): Run the program as blended PVT motion with `gcode_lookahead`
+      instead of waiting for the axes after every line. Defaults to `constants.GCODE_LOOKAHEAD`.
+    - from_file (bool): Read the program from the file at `gcode`. Defaults to False.
+    - session (classes.GcodeSession): Keeps the streams and translators live for the
+      next job, which then only resets their modal state. Defaults to None (set up
+      and torn down here).
 
     This function performs the following steps:
-    1. Parses the G-code lines.
-    2. Sets up the device streams and translators.
+    1. Parses the G-code lines lazily with a `classes.GcodeReader`, so motion starts
+       after the first lines and memory does not grow with the program.
+    2. Gets the device streams and translators from the session.
     3. Iterates over the parsed G-code lines, controlling the devices accordingly.
     4. Updates the progress bar and text in the UI.
-    5. Handles threading for concurrent execution of commands.
-    6. Waits for threads to complete and then flushes translators and disables streams.
+    5. Sends the commands to one long-lived worker per translator (`classes.AxisDispatcher`).
+    6. Flushes the translators through the dispatcher at the end of every line, and
+       tears the session down after an error, a stop or when it is not shared.
     7. Releases the lock and invokes the button upon completion or if an error occurs.
 
     Internal helper functions:
-    - axis_stream(translator: Translator, command: str): Sends a command to a specific translator.
-    - calculate_speeds(axis_params, previous_positions, speed): Calculates the speeds for each axis based on the parameters.
-    - setup_devices(): Sets up the device streams and translators.
+    - sync(): Flushes every translator of the dispatcher and reports failed commands.
+    - axis_commands(command, start, target, feed): Sends one command per moving axis, with
+      feeds split along the programmed path tracked by `classes.GcodeState`.
 
     Example usage:
     ```python
@@ -803,154 +3127,121 @@ def GCode(
     - The function prints and updates the UI in case of errors.
     """
 
-    def axis_stream(translator: Translator, command: str):
-        print(f"Command: {command}, Translator: {translator}")
-        try:
-            translator.translate(command)
-            translator.flush()
-        except MotionLibException as err:
+    def sync():
+        nonlocal failed
+        for index, command, err in dispatcher.sync():
+            failed = True
             window.print_msg("Wrong Command", "red")
-            print(f"Wrong Command: {command}.")
-            print(err)
-        finally:
-            return
-
-    def calculate_speeds(axis_params, previous_positions, speed):
-        check = ["X", "Y", "Z"]
-        position_differences = [0, 0, 0]
-        pre_sum = 0
-        axis_speeds = {axis: 0 for axis in axis_params}
-
-        for i in range(3):
-            param, _ = axis_params[check[i]]
-            if param is not None:
-                dif = abs(previous_positions[i] - param)
-                position_differences[i] = dif
-                pre_sum += dif**2
-
-        total_len = math.sqrt(pre_sum)
-
-        for i in range(3):
-            param, _ = axis_params[check[i]]
-            if param is not None:
-                axis_speeds[check[i]] = (
-                    (position_differences[i] * speed / total_len)
-                    if total_len != 0
-                    else 0
-                )
-
-        param_a, _ = axis_params["A"]
-        if param_a is not None and speed != 0:
-            radius = math.sqrt(
-                (constants.X_CENTER - previous_positions[0]) ** 2
-                + (constants.Y_CENTER - previous_positions[1]) ** 2
-            )
-            rot_speed = speed / radius if radius != 0 else 0
-            rot_speed = min(rot_speed, constants.MAX_ROT_VEL)
-        else:
-            rot_speed = 0
-        axis_speeds["A"] = rot_speed * 57.2957795
-
-        return axis_speeds
-
-    def setup_devices():
-        try:
-            axis_list = [device.get_axis(1) for device in device_list]
-            stream_list = [device.streams.get_stream(1) for device in device_list]
-            for stream in stream_list:
-                stream.setup_live(1)
-            translator_list = [Translator.setup(stream) for stream in stream_list]
-            return axis_list, stream_list, translator_list
-        except MotionLibException as err:
-            print(err)
-            window.print_msg("ERROR - TASK IS ABORTED!", "red")
-            lock.release()
-            button.invoke()
-            return None, None, None
+            print(f"Wrong Command: {command}, Translator: {translator_list[index]}.")
+
+    def axis_commands(command, start, target, feed):
+        # Per-axis feeds follow the programmed path, in mm/min and deg/min
+        length = math.dist(start[:3], target[:3])
+        radius = math.hypot(constants.X_CENTER - start[0], constants.Y_CENTER - start[1])
+        for index in range(4):
+            delta = target[index] - start[index]
+            if delta == 0:
+                continue
+            if index == 3:
+                speed = min(feed / radius, constants.MAX_ROT_VEL) if radius != 0 else 0
+                axis_command = f"G91 {command} X{math.degrees(delta)}"
+                speed = math.degrees(speed) * 60
+            else:
+                speed = abs(delta) * feed / length * 60
+                axis_command = f"G90 {command} X{target[index]}"
+            if math.isfinite(feed) and speed != 0:
+                axis_command += f" F{speed}"
+            elif math.isfinite(feed):
+                continue
+            dispatcher.send(index, axis_command)
+
+    if lookahead:
+        gcode_lookahead(
+            gcode,
+            device_list,
+            window,
+            button,
+            lock,
+            stop_event,
+            resume_event,
+            from_file,
+            session,
+        )
+        return
 
-    axis_list, stream_list, translator_list = setup_devices()
+    owned = session is None
+    if owned:
+        session = classes.GcodeSession(device_list)
+    all_devices = session.device
+    failed = False
     lock.acquire()
-    lines = GcodeParser(gcode).lines
-    total_count = len(lines)
-    all_devices = classes.Device(*axis_list)
-    threads = []
+    try:
+        translator_list, dispatcher = session.translate()
+    except MotionLibException as err:
+        print(err)
+        window.print_msg("ERROR - TASK IS ABORTED!", "red")
+        lock.release()
+        button.invoke()
+        return
+    reader = classes.GcodeReader(gcode, from_file)
+    total_count = reader.total_lines
+    if constants.PREVIEW and not from_file:
+        gcode_preview(gcode)
+
+    # Laser Off, Z Was Moved Outside the Translator
+    gate = classes.LaserGate(all_devices)
+    gate.setup()
+    translator_list[2].reset_position()
+    state = classes.GcodeState(
+        all_devices.read_positions()[:3]
+        + [all_devices.axisrot.get_position(Units.ANGLE_RADIANS)]
+    )
 
-    count = 0
-    for line in lines:
+    for line in reader:
         while not resume_event.is_set():
             time.sleep(1)
             if stop_event.is_set():
                 break
         if stop_event.is_set():
             break
-        count += 1
+        count = line.line_index + 1
         window.bar["value"] = (count / total_count) * 100
         window.config_progress_text(count, total_count)
-
-        axis_params = {
-            "X": (line.get_param("X"), translator_list[0]),
-            "Y": (line.get_param("Y"), translator_list[1]),
-            "Z": (line.get_param("Z"), translator_list[2]),
-            "A": (line.get_param("A"), translator_list[3]),
-        }
         print(line.comment)
-        speed = (line.get_param("F") or 0) * 60
-
-        previous_positions = all_devices.get_current_positions()
-        axis_speeds = calculate_speeds(axis_params, previous_positions, speed)
 
-        if all(param is None for param, _ in axis_params.values()):
-            command = line.command_str
-            if command in {"M3", "M4"}:
-                command = f"G90 G0 X{constants.Z_MAX}"
-                thread = threading.Thread(
-                    target=axis_stream, args=(translator_list[2], command)
-                )
-                threads.append(thread)
-                thread.start()
-            elif command == "M5":
-                command = f"G90 G0 X{constants.INITIAL_Z}"
-                thread = threading.Thread(
-                    target=axis_stream, args=(translator_list[2], command)
-                )
-                threads.append(thread)
-                thread.start()
+        event = state.step(line)
+        if event[0] == "move":
+            axis_commands(line.command_str, *event[1:])
+        elif event[0] == "arc":
+            # One chord at a time keeps the separate translators together
+            previous = event[1]
+            for point in event[2].tolist():
+                axis_commands("G1", previous, point, event[3])
+                sync()
+                all_devices.wait_axes()
+                previous = point
+        elif event[0] == "laser" and gate.digital:
+            if event[1]:
+                gate.on()
             else:
-                for i in range(4):
-                    thread = threading.Thread(
-                        target=axis_stream, args=(translator_list[i], command)
-                    )
-                    threads.append(thread)
-                    thread.start()
-        else:
-            non_none_params = {
-                axis: (param, translator)
-                for axis, (param, translator) in axis_params.items()
-                if param is not None
-            }
-            for axis, (param, translator) in non_none_params.items():
-                if axis == "A":
-                    command = f"G91 {line.command_str} X{param*57.2957795}"
-                else:
-                    command = f"G90 {line.command_str} X{param}"
-                if line.get_param("F") is not None and axis_speeds[axis] != 0:
-                    command += f" F{axis_speeds[axis]}"
-                elif line.get_param("F") is not None and axis_speeds[axis] == 0:
-                    continue
-                thread = threading.Thread(
-                    target=axis_stream, args=(translator, command)
-                )
-                thread.daemon = True
-                threads.append(thread)
-                thread.start()
+                gate.off()
+        elif event[0] == "laser":
+            state.set_axis(2, gate.z_target(event[1]))
+            dispatcher.send(2, f"G90 G0 X{state.position[2]}")
+        elif event[0] == "unknown":
+            for i in range(4):
+                dispatcher.send(i, line.command_str)
+        sync()
         all_devices.wait_axes()
-
-    for translator in translator_list:
-        translator.flush()
-    for stream in stream_list:
-        if not stream.check_disabled():
-            stream.disable()
-    all_devices.stop_axes()
+        if event[0] == "dwell":
+            time.sleep(event[1])
+
+    sync()
+    reader.close()
+    gate.off()
+    if owned or failed or stop_event.is_set():
+        session.close()
+        all_devices.stop_axes()
     lock.release()
     button.invoke()
     return
@@ -1000,6 +3291,24 @@ def stage_controller(device_list):
     window = Tk()
     window_controller = classes.WindowController(device, window)
 
+    # Warm G-code Session, Released Before Anything Else Moves the Axes
+    gcode_session = classes.GcodeSession(device_list) if constants.GCODE_SESSION else None
+
+    def release_gcode_session():
+        if gcode_session is not None:
+            gcode_session.close()
+
+    def set_command():
+        release_gcode_session()
+        window_controller.setter(device)
+
+    def exit_command():
+        release_gcode_session()
+        window_controller.exit_button(device)
+
+    window_controller.set_btn.config(command=set_command)
+    window_controller.exit_btn.config(command=exit_command)
+
     # Check Device Health
     check_device_thread = threading.Thread(
         target=functions.check_device, args=(device, window_controller)
@@ -1015,6 +3324,7 @@ def stage_controller(device_list):
 
     # Z-Test Button Configuration
     z_test_initial_funcs = [
+        lambda: release_gcode_session(),
         lambda: extract_btn.config(state=DISABLED),
         lambda: window_controller.set_btn.config(state=DISABLED),
         lambda: run_btn.config(state=DISABLED),
@@ -1045,6 +3355,8 @@ def stage_controller(device_list):
 
     # Run Button Configuration
     run_initial_funcs = [
+        lambda: release_gcode_session(),
+        lambda: streamed_check.config(state=DISABLED),
         lambda: extract_btn.config(state=DISABLED),
         lambda: window_controller.set_btn.config(state=DISABLED),
         lambda: z_test_btn.config(state=DISABLED),
@@ -1059,6 +3371,7 @@ def stage_controller(device_list):
 
     run_final_funcs = [
         lambda: device.extract_axes(),
+        lambda: streamed_check.config(state=NORMAL),
         lambda: extract_btn.config(state=NORMAL),
         lambda: window_controller.set_btn.config(state=NORMAL),
         lambda: z_test_btn.config(state=NORMAL),
@@ -1074,13 +3387,26 @@ def stage_controller(device_list):
     run_command = lambda: functions.thread_switch(
         functions.runner,
         start_event,
-        (window_controller, device, run_btn, lock, start_event, pause_event),
+        (
+            window_controller,
+            device,
+            run_btn,
+            lock,
+            start_event,
+            pause_event,
+            streamed.get(),
+        ),
         run_initial_funcs,
         run_final_funcs,
     )
 
     run_btn = create_button("RUN", run_command, 1, 10)
 
+    # Streamed Runner Switch
+    streamed = BooleanVar(window, value=constants.RUNNER_STREAMED)
+    streamed_check = Checkbutton(window, text="Streamed", variable=streamed)
+    streamed_check.grid(column=2, row=10)
+
     # Pause Button Configuration
     pause_initial_funcs = [
         lambda: window_controller.print_msg("PAUSED THE TASK", "red"),
@@ -1101,6 +3427,7 @@ def stage_controller(device_list):
     # Matrix Print Button Configuration
     mat = functions.img_2_mat(constants.IMAGE_PATH)
     mat_print_initial_funcs = [
+        lambda: release_gcode_session(),
         lambda: extract_btn.config(state=DISABLED),
         lambda: window_controller.set_btn.config(state=DISABLED),
         lambda: z_test_btn.config(state=DISABLED),
@@ -1138,7 +3465,11 @@ def stage_controller(device_list):
     )
 
     # Extract Button Configuration
-    extract_btn = create_button("EXTRACT", lambda: device.extract_axes(), 5, 10)
+    def extract_command():
+        release_gcode_session()
+        device.extract_axes()
+
+    extract_btn = create_button("EXTRACT", extract_command, 5, 10)
 
     # GCode Button Configuration
     gcode_initial_funcs = [
@@ -1147,6 +3478,7 @@ def stage_controller(device_list):
         lambda: z_test_btn.config(state=DISABLED),
         lambda: run_btn.config(state=DISABLED),
         lambda: mat_print_btn.config(state=DISABLED),
+        lambda: gcode_file_btn.config(state=DISABLED),
         lambda: pause_event.set(),
         lambda: window_controller.print_msg("STARTED GCode", "green"),
         lambda: gcode_btn.config(text="STOP GCODE"),
@@ -1158,6 +3490,7 @@ def stage_controller(device_list):
         lambda: z_test_btn.config(state=NORMAL),
         lambda: run_btn.config(state=NORMAL),
         lambda: mat_print_btn.config(state=NORMAL),
+        lambda: gcode_file_btn.config(state=NORMAL),
         lambda: pause_event.clear(),
         lambda: pause_btn.config(text="PAUSE"),
         lambda: window_controller.print_msg("STOPPED GCode", "red"),
@@ -1168,13 +3501,17 @@ def stage_controller(device_list):
         functions.GCode,
         start_event,
         (
-            window_controller.gcode_text.get("1.0", END),
+            window_controller.gcode_path
+            or window_controller.gcode_text.get("1.0", END),
             device_list,
             window_controller,
             gcode_btn,
             lock,
             start_event,
             pause_event,
+            constants.GCODE_LOOKAHEAD,
+            bool(window_controller.gcode_path),
+            gcode_session,
         ),
         gcode_initial_funcs,
         gcode_final_funcs,
@@ -1182,4 +3519,33 @@ def stage_controller(device_list):
 
     gcode_btn = create_button("Start GCode", gcode_command, 6, 3)
 
+    # GCode File Button Configuration, Cancelling Goes Back to the Text Input
+    def gcode_file_command():
+        window_controller.gcode_path = filedialog.askopenfilename(
+            filetypes=[("G-code", "*.gcode *.nc *.ngc *.txt"), ("All files", "*")]
+        ) or ""
+        gcode_file_btn.config(
+            text=os.path.basename(window_controller.gcode_path) or "Open GCode File"
+        )
+
+    gcode_file_btn = create_button("Open GCode File", gcode_file_command, 6, 2)
+
+    # GCode Preview Button Configuration, Rendered Only on Request
+    def gcode_preview_command():
+        try:
+            gcode_preview(
+                window_controller.gcode_path
+                or window_controller.gcode_text.get("1.0", END),
+                from_file=bool(window_controller.gcode_path),
+            )
+            window_controller.print_msg(
+                "PREVIEW WRITTEN TO {}".format(constants.PREVIEW_PATH), "green"
+            )
+        except (OSError, ValueError) as err:
+            print(err)
+            window_controller.print_msg("PREVIEW FAILED", "red")
+
+    create_button("Preview GCode", gcode_preview_command, 6, 4)
+
     window.mainloop()
+    release_gcode_session()
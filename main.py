@@ -1,6 +1,6 @@
 from zaber_motion import Library
 from zaber_motion.ascii import Connection
-import constants, functions
+import constants, functions, simulator
 import sys
 
 if __name__ == "__main__":
@@ -34,8 +34,26 @@ if __name__ == "__main__":
 
         except Exception as e:
             print(f"Error with virtual device connection: {e}")
+    elif arg in {"-s", "--sim"}:
+        try:
+            speedup = float(sys.argv[2]) if n > 2 else constants.SIM_SPEEDUP
+            with simulator.SimConnection(speedup) as connection:
+                connection.enable_alerts()
+                device_list = connection.detect_devices()
+                print("RUNNING ON SIMULATED DEVICE ({}x)".format(speedup))
+                functions.stage_controller(device_list)
+
+        except Exception as e:
+            print(f"Error with simulated device connection: {e}")
+
+    elif arg in {"-d", "--dry-run"} and n > 2:
+        report = functions.dry_run(sys.argv[2], from_file=True)
+        print(functions.dry_run_text(report))
+        sys.exit(
+            1 if report["errors"] or report["out_of_range"] or report["rot_capped"] else 0
+        )
 
     else:
         print(
-            "WRONG ARGUMENT. Possible arguments are: -p/--physical: Physical, -v/--virtual: Virtual"
+            "WRONG ARGUMENT. Possible arguments are: -p/--physical: Physical, -v/--virtual: Virtual, -s/--sim [SPEEDUP]: Simulated, -d/--dry-run PATH: Check a G-code file offline"
         )
@@ -0,0 +1,971 @@
+from zaber_motion import Units, MotionLibException, Measurement
+from zaber_motion.ascii import DigitalOutputAction
+import constants, math, re, threading, time
+
+
+# Unit Conversions (Base Units: mm for linear axes, radians for rotary axes)
+LINEAR_UNITS = {
+    Units.LENGTH_MILLIMETRES: 1.0,
+    Units.LENGTH_MICROMETRES: 1e-3,
+    Units.VELOCITY_MILLIMETRES_PER_SECOND: 1.0,
+    Units.VELOCITY_MICROMETRES_PER_SECOND: 1e-3,
+    Units.ACCELERATION_MILLIMETRES_PER_SECOND_SQUARED: 1.0,
+}
+ROTARY_UNITS = {
+    Units.ANGLE_RADIANS: 1.0,
+    Units.ANGLE_DEGREES: math.pi / 180,
+    Units.ANGULAR_VELOCITY_RADIANS_PER_SECOND: 1.0,
+    Units.ANGULAR_VELOCITY_DEGREES_PER_SECOND: math.pi / 180,
+    Units.ANGULAR_ACCELERATION_RADIANS_PER_SECOND_SQUARED: 1.0,
+    Units.ANGULAR_ACCELERATION_DEGREES_PER_SECOND_SQUARED: math.pi / 180,
+}
+TIME_UNITS = {
+    Units.NATIVE: 1e-3,
+    Units.TIME_SECONDS: 1.0,
+    Units.TIME_MILLISECONDS: 1e-3,
+}
+# Native velocity and acceleration scales of Zaber controllers
+NATIVE_SCALES = {"position": 1.0, "velocity": 1.6384, "acceleration": 1.6384e-4}
+
+
+class VirtualClock:
+    """
+    A clock that runs `speedup` times faster than real time.
+    """
+
+    def __init__(self, speedup: float = constants.SIM_SPEEDUP):
+        """Starts the clock at zero virtual seconds.
+
+        Args:
+            speedup (float): Virtual seconds per real second.
+
+        Returns:
+            None
+        """
+        if speedup <= 0:
+            raise ValueError("Speedup must be positive: {}".format(speedup))
+        self.speedup = speedup
+        self._real_start = time.perf_counter()
+
+    def time(self):
+        """Returns the virtual time in seconds."""
+        return (time.perf_counter() - self._real_start) * self.speedup
+
+    def real_seconds(self, seconds):
+        """Converts a virtual duration to the real duration it takes."""
+        return max(seconds, 0) / self.speedup
+
+    def sleep(self, seconds):
+        """Sleeps for the given number of virtual seconds."""
+        time.sleep(self.real_seconds(seconds))
+
+
+class Motion:
+    """
+    A motion segment of a simulated axis, evaluated analytically in virtual time.
+    """
+
+    def __init__(self, start_time: float, start_position: float, duration: float):
+        self.start_time = start_time
+        self.start_position = start_position
+        self.duration = duration
+        self.end_time = start_time + duration
+        self.end_position = start_position
+
+    def state(self, t: float):
+        """Returns (position, velocity) of the segment at virtual time `t`."""
+        return (self.start_position, 0.0)
+
+
+class Dwell(Motion):
+    """
+    Stays at the start position for the given duration.
+    """
+
+
+class Trapezoid(Motion):
+    """
+    Point-to-point move with a trapezoidal (or triangular) velocity profile.
+    """
+
+    def __init__(self, start_time, start_position, end_position, velocity, acceleration):
+        distance = abs(end_position - start_position)
+        self.sign = 1 if end_position >= start_position else -1
+        self.acceleration = acceleration
+        self.peak_velocity = min(velocity, math.sqrt(distance * acceleration))
+        if distance == 0:
+            self.acc_time = self.flat_time = 0
+        else:
+            self.acc_time = self.peak_velocity / acceleration
+            self.flat_time = (
+                distance - self.peak_velocity * self.acc_time
+            ) / self.peak_velocity
+        self.distance = distance
+        super().__init__(
+            start_time, start_position, 2 * self.acc_time + self.flat_time
+        )
+        self.end_position = end_position
+
+    def state(self, t):
+        tau = min(max(t - self.start_time, 0), self.duration)
+        if tau < self.acc_time:
+            s = 0.5 * self.acceleration * tau**2
+            v = self.acceleration * tau
+        elif tau < self.acc_time + self.flat_time:
+            s = self.peak_velocity * (tau - 0.5 * self.acc_time)
+            v = self.peak_velocity
+        else:
+            rest = self.duration - tau
+            s = self.distance - 0.5 * self.acceleration * rest**2
+            v = self.acceleration * rest
+        return (self.start_position + self.sign * s, self.sign * v)
+
+
+class Ramp(Motion):
+    """
+    Velocity move: ramps from the current velocity to the target velocity and keeps it.
+    A ramp to zero velocity is a stop; a non-zero ramp ends at the travel limits.
+    """
+
+    def __init__(
+        self, start_time, start_position, start_velocity, velocity, acceleration, limits
+    ):
+        self.start_velocity = start_velocity
+        self.velocity = velocity
+        self.limits = limits
+        self.ramp_time = abs(velocity - start_velocity) / acceleration
+        self.ramp_acceleration = math.copysign(acceleration, velocity - start_velocity)
+        self.ramp_position = (
+            start_position
+            + start_velocity * self.ramp_time
+            + 0.5 * self.ramp_acceleration * self.ramp_time**2
+        )
+
+        duration = self.ramp_time
+        if velocity != 0:
+            duration = math.inf
+            if limits is not None:
+                limit = limits[1] if velocity > 0 else limits[0]
+                duration = self.ramp_time + max(
+                    (limit - self.ramp_position) / velocity, 0
+                )
+        super().__init__(start_time, start_position, duration)
+        self.end_position = self.state(self.end_time)[0]
+
+    def state(self, t):
+        tau = min(max(t - self.start_time, 0), self.duration)
+        if tau < self.ramp_time:
+            position = (
+                self.start_position
+                + self.start_velocity * tau
+                + 0.5 * self.ramp_acceleration * tau**2
+            )
+            velocity = self.start_velocity + self.ramp_acceleration * tau
+        else:
+            position = self.ramp_position + self.velocity * (tau - self.ramp_time)
+            velocity = self.velocity
+        if tau >= self.duration and self.velocity != 0:
+            velocity = 0.0
+        if self.limits is not None:
+            position = min(max(position, self.limits[0]), self.limits[1])
+        return (position, velocity)
+
+
+class Hermite(Motion):
+    """
+    PVT segment: cubic Hermite interpolation between two position/velocity points.
+    """
+
+    def __init__(self, start_time, start_position, start_velocity, end_position, end_velocity, duration):
+        self.start_velocity = start_velocity
+        self.end_velocity = end_velocity
+        super().__init__(start_time, start_position, duration)
+        self.end_position = end_position
+
+    def state(self, t):
+        tau = min(max(t - self.start_time, 0), self.duration)
+        s = tau / self.duration
+        p0, p1 = self.start_position, self.end_position
+        m0, m1 = self.start_velocity * self.duration, self.end_velocity * self.duration
+        position = (
+            (2 * s**3 - 3 * s**2 + 1) * p0
+            + (s**3 - 2 * s**2 + s) * m0
+            + (-2 * s**3 + 3 * s**2) * p1
+            + (s**3 - s**2) * m1
+        )
+        velocity = (
+            (6 * s**2 - 6 * s) * p0
+            + (3 * s**2 - 4 * s + 1) * m0
+            + (-6 * s**2 + 6 * s) * p1
+            + (3 * s**2 - 2 * s) * m1
+        ) / self.duration
+        return (position, velocity)
+
+
+class SimWarnings:
+    """
+    Warning flags of a simulated axis.
+    """
+
+    def __init__(self):
+        self.flags = set()
+
+    def get_flags(self):
+        """Returns the active warning flags."""
+        return set(self.flags)
+
+    def clear_flags(self):
+        """Returns and clears the active warning flags."""
+        flags = self.get_flags()
+        self.flags.clear()
+        return flags
+
+
+class SimAxis:
+    """
+    Simulated axis with velocity, acceleration and travel limits.
+
+    Motions are stored as a timeline of segments and evaluated against the virtual
+    clock, so positions can be read while moves or queued stream segments run.
+    """
+
+    def __init__(
+        self,
+        device,
+        max_velocity: float,
+        acceleration: float,
+        limits,
+        position: float = 0.0,
+        rotary: bool = False,
+    ):
+        """Initializes the axis at rest.
+
+        Args:
+            device (SimDevice): The device owning the axis.
+            max_velocity (float): Maximum velocity in mm/s (radians/s if rotary).
+            acceleration (float): Acceleration in mm/s^2 (radians/s^2 if rotary).
+            limits (tuple): (min, max) travel in mm, or None for unlimited travel.
+            position (float): Initial position in mm (radians if rotary).
+            rotary (bool): Whether the axis is rotary.
+
+        Returns:
+            None
+        """
+        self.device = device
+        self.axis_number = 1
+        self.max_velocity = max_velocity
+        self.acceleration = acceleration
+        self.limits = limits
+        self.rotary = rotary
+        self.resolution = (
+            constants.SIM_ROT_RESOLUTION if rotary else constants.SIM_LINEAR_RESOLUTION
+        )
+        self.warnings = SimWarnings()
+        self._clock = device.clock
+        self._condition = threading.Condition()
+        self._position = position
+        self._motions = []
+
+    def __repr__(self):
+        return "SimAxis {} -> {}".format(self.axis_number, self.device)
+
+    def to_base(self, value, unit, quantity="position"):
+        """Converts a value in `unit` to the base unit of the axis."""
+        if unit is None or unit == Units.NATIVE:
+            return value / (self.resolution * NATIVE_SCALES[quantity])
+        scales = ROTARY_UNITS if self.rotary else LINEAR_UNITS
+        if unit not in scales:
+            raise MotionLibException("Unit {} is not supported by {}".format(unit, self))
+        return value * scales[unit]
+
+    def from_base(self, value, unit, quantity="position"):
+        """Converts a value in the base unit of the axis to `unit`."""
+        return value / self.to_base(1.0, unit, quantity)
+
+    def check_range(self, position):
+        """Raises MotionLibException if the position is outside the travel limits."""
+        if self.limits is None:
+            return
+        if not self.limits[0] - 1e-9 <= position <= self.limits[1] + 1e-9:
+            raise MotionLibException(
+                "Command failed: BADDATA - {} is outside of travel range {}".format(
+                    position, self.limits
+                )
+            )
+
+    def check_velocity(self, velocity, unit):
+        """Returns the velocity in base units, using the maximum velocity for zero."""
+        if velocity == 0:
+            return self.max_velocity
+        velocity = abs(self.to_base(velocity, unit, "velocity"))
+        if velocity > self.max_velocity * (1 + 1e-9):
+            raise MotionLibException(
+                "Command failed: BADDATA - velocity {} exceeds {}".format(
+                    velocity, self.max_velocity
+                )
+            )
+        return velocity
+
+    def check_acceleration(self, acceleration, unit):
+        """Returns the acceleration in base units, using the default for zero."""
+        if acceleration == 0:
+            return self.acceleration
+        return abs(self.to_base(acceleration, unit, "acceleration"))
+
+    def _settle(self, now):
+        while self._motions and self._motions[0].end_time <= now:
+            self._position = self._motions.pop(0).end_position
+
+    def _state(self, now):
+        self._settle(now)
+        if self._motions:
+            return self._motions[0].state(now)
+        return (self._position, 0.0)
+
+    def _start(self, factory):
+        # Interrupts the current motion and starts a new one from the current state
+        with self._condition:
+            now = self._clock.time()
+            position, velocity = self._state(now)
+            motion = factory(now, position, velocity)
+            self._position = position
+            self._motions = [motion]
+            self._condition.notify_all()
+
+    def queue_state(self):
+        """Returns (end time, end position) of the queued motions."""
+        with self._condition:
+            now = self._clock.time()
+            self._settle(now)
+            if self._motions:
+                return (max(now, self._motions[-1].end_time), self._motions[-1].end_position)
+            return (now, self._position)
+
+    def queue(self, factory, start_time=None):
+        """Appends a motion after the queued ones, as a device stream buffer does.
+
+        Args:
+            factory (callable): Builds the motion from (start time, start position).
+            start_time (float): Earliest virtual start time. Gaps are filled with a dwell.
+
+        Returns:
+            float: The virtual end time of the queued motion.
+        """
+        with self._condition:
+            now = self._clock.time()
+            self._settle(now)
+            end_time, end_position = now, self._position
+            if self._motions:
+                end_time = max(now, self._motions[-1].end_time)
+                end_position = self._motions[-1].end_position
+            if start_time is not None and start_time > end_time:
+                self._motions.append(Dwell(end_time, end_position, start_time - end_time))
+                end_time = start_time
+            motion = factory(end_time, end_position)
+            self._motions.append(motion)
+            self._condition.notify_all()
+            return motion.end_time
+
+    def move_absolute(
+        self,
+        position: float,
+        unit=Units.NATIVE,
+        wait_until_idle: bool = True,
+        velocity: float = 0,
+        velocity_unit=Units.NATIVE,
+        acceleration: float = 0,
+        acceleration_unit=Units.NATIVE,
+        **kwargs,
+    ):
+        """Moves the axis to an absolute position (see zaber_motion.ascii.Axis)."""
+        target = self.to_base(position, unit)
+        self.check_range(target)
+        velocity = self.check_velocity(velocity, velocity_unit)
+        acceleration = self.check_acceleration(acceleration, acceleration_unit)
+        self._start(lambda t, p, v: Trapezoid(t, p, target, velocity, acceleration))
+        if wait_until_idle:
+            self.wait_until_idle()
+
+    def move_relative(
+        self,
+        position: float,
+        unit=Units.NATIVE,
+        wait_until_idle: bool = True,
+        velocity: float = 0,
+        velocity_unit=Units.NATIVE,
+        acceleration: float = 0,
+        acceleration_unit=Units.NATIVE,
+        **kwargs,
+    ):
+        """Moves the axis by a relative distance (see zaber_motion.ascii.Axis)."""
+        distance = self.to_base(position, unit)
+        velocity = self.check_velocity(velocity, velocity_unit)
+        acceleration = self.check_acceleration(acceleration, acceleration_unit)
+
+        def factory(t, p, v):
+            self.check_range(p + distance)
+            return Trapezoid(t, p, p + distance, velocity, acceleration)
+
+        self._start(factory)
+        if wait_until_idle:
+            self.wait_until_idle()
+
+    def move_velocity(
+        self,
+        velocity: float,
+        unit=Units.NATIVE,
+        acceleration: float = 0,
+        acceleration_unit=Units.NATIVE,
+    ):
+        """Starts moving the axis at a constant velocity (see zaber_motion.ascii.Axis)."""
+        target = math.copysign(self.check_velocity(velocity, unit), velocity)
+        if velocity == 0:
+            target = 0.0
+        acceleration = self.check_acceleration(acceleration, acceleration_unit)
+        self._start(
+            lambda t, p, v: Ramp(t, p, v, target, acceleration, self.limits)
+        )
+
+    def stop(self, wait_until_idle: bool = True):
+        """Decelerates the axis to zero velocity and drops queued motions."""
+        self._start(
+            lambda t, p, v: Ramp(t, p, v, 0.0, self.acceleration, self.limits)
+        )
+        if wait_until_idle:
+            self.wait_until_idle()
+
+    def get_position(self, unit=Units.NATIVE):
+        """Returns the current position of the axis in `unit`."""
+        with self._condition:
+            position, _ = self._state(self._clock.time())
+        return self.from_base(position, unit)
+
+    def is_busy(self):
+        """Returns True while the axis has motions to execute."""
+        with self._condition:
+            self._settle(self._clock.time())
+            return bool(self._motions)
+
+    def wait_until_idle(self, throw_error_on_fault: bool = True):
+        """Blocks until all motions of the axis have finished."""
+        with self._condition:
+            while True:
+                now = self._clock.time()
+                self._settle(now)
+                if not self._motions:
+                    return
+                end_time = self._motions[-1].end_time
+                timeout = None
+                if end_time != math.inf:
+                    timeout = self._clock.real_seconds(end_time - now)
+                self._condition.wait(timeout)
+
+
+class SimDeviceIo:
+    """
+    Digital outputs of a simulated device, recorded in virtual time.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.history = []  # (virtual time, channel, value)
+        self._lock = threading.Lock()
+
+    def schedule_digital_output(self, t, channel_number, value):
+        """Records a digital output change at virtual time `t`."""
+        with self._lock:
+            current = self._get(t, channel_number)
+            if value == DigitalOutputAction.TOGGLE:
+                value = not current
+            elif value == DigitalOutputAction.KEEP:
+                value = current
+            else:
+                value = value in (True, DigitalOutputAction.ON)
+            entry = (t, channel_number, value)
+            self.history.append(entry)
+            self.history.sort(key=lambda entry: entry[0])
+            return entry
+
+    def cancel(self, entries, t):
+        """Drops the given output changes scheduled after virtual time `t`."""
+        with self._lock:
+            dropped = {id(entry) for entry in entries if entry[0] > t}
+            self.history = [entry for entry in self.history if id(entry) not in dropped]
+
+    def set_digital_output(self, channel_number: int, value):
+        """Sets a digital output immediately."""
+        self.schedule_digital_output(self.device.clock.time(), channel_number, value)
+
+    def _get(self, t, channel_number):
+        value = False
+        for time_, channel, state in self.history:
+            if time_ > t:
+                break
+            if channel == channel_number:
+                value = state
+        return value
+
+    def get_digital_output(self, channel_number: int):
+        """Returns the current value of a digital output."""
+        with self._lock:
+            return self._get(self.device.clock.time(), channel_number)
+
+
+class SimBuffer:
+    """
+    Stored stream or PVT buffer: a list of recorded actions.
+    """
+
+    def __init__(self, buffer_number: int):
+        self.buffer_number = buffer_number
+        self.actions = []
+
+    def erase(self):
+        """Erases the buffer."""
+        self.actions = []
+
+
+class SimSequence:
+    """
+    Common live/store handling of simulated streams and PVT sequences.
+    """
+
+    def __init__(self, device, sequence_id: int):
+        self.device = device
+        self.axes = []
+        self.mode = "DISABLED"
+        self._buffer = None
+        self.io = SimSequenceIo(self)
+
+    def setup_live(self, *axes: int):
+        """Sets the sequence up in live mode on the given axis numbers."""
+        self.axes = [self.device.get_axis(axis) for axis in axes]
+        self.mode = "LIVE"
+
+    def setup_store(self, buffer: SimBuffer, *axes: int):
+        """Sets the sequence up to record actions into the given buffer."""
+        self.axes = [self.device.get_axis(axis) for axis in axes]
+        self._buffer = buffer
+        self.mode = "STORE"
+
+    def disable(self):
+        """Disables the sequence, dropping its queued output changes."""
+        self.mode = "DISABLED"
+        self.io.cancel()
+
+    def check_disabled(self):
+        """Returns True if the sequence is disabled."""
+        return self.mode == "DISABLED"
+
+    def call(self, buffer: SimBuffer):
+        """Executes the actions of a stored buffer."""
+        for action in buffer.actions:
+            self._submit(action)
+
+    def _submit(self, action):
+        if self.mode == "DISABLED":
+            raise MotionLibException("Command failed: sequence is disabled")
+        if self.mode == "STORE":
+            self._buffer.actions.append(action)
+        else:
+            action(self)
+
+    def _start_time(self):
+        return max(axis.queue_state()[0] for axis in self.axes)
+
+    def wait(self, time: float, unit=Units.NATIVE):
+        """Queues a dwell on all axes."""
+        duration = time * TIME_UNITS[unit]
+
+        def action(sequence):
+            start = sequence._start_time()
+            for axis in sequence.axes:
+                axis.queue(lambda t, p: Dwell(t, p, duration), start)
+
+        self._submit(action)
+
+    def wait_until_idle(self, throw_error_on_fault: bool = True):
+        """Waits until all queued motions are executed."""
+        for axis in self.axes:
+            axis.wait_until_idle()
+
+    def is_busy(self):
+        """Returns True while any axis has queued motions."""
+        return any(axis.is_busy() for axis in self.axes)
+
+    def cork(self):
+        """Streams are executed in virtual time, corking is a no-op."""
+
+    def uncork(self):
+        """Streams are executed in virtual time, uncorking is a no-op."""
+
+
+class SimSequenceIo:
+    """
+    Digital outputs set from inside a stream or PVT sequence.
+    """
+
+    def __init__(self, sequence: SimSequence):
+        self.sequence = sequence
+        self.scheduled = []
+
+    def set_digital_output(self, channel_number: int, value):
+        """Sets the output once all previously queued motions are done."""
+
+        def action(sequence):
+            self.scheduled.append(
+                sequence.device.io.schedule_digital_output(
+                    sequence._start_time(), channel_number, value
+                )
+            )
+
+        self.sequence._submit(action)
+
+    def cancel(self):
+        """Drops the output changes not reached yet, like a disabled sequence does."""
+        self.sequence.device.io.cancel(self.scheduled, self.sequence.device.clock.time())
+        self.scheduled = []
+
+
+class SimStream(SimSequence):
+    """
+    Simulated stream: coordinated straight lines queued behind each other.
+    """
+
+    def __init__(self, device, stream_id: int):
+        super().__init__(device, stream_id)
+        self.stream_id = stream_id
+        self.max_speed = None
+
+    def __repr__(self):
+        return "SimStream {} -> {}".format(self.stream_id, self.device)
+
+    def set_max_speed(self, max_speed: float, unit=Units.NATIVE):
+        """Sets the maximum speed of the following lines."""
+
+        def action(stream):
+            stream.max_speed = abs(stream.axes[0].to_base(max_speed, unit, "velocity"))
+
+        self._submit(action)
+
+    def line_absolute(self, *endpoint: Measurement):
+        """Queues an absolute line movement."""
+        self._submit(lambda stream: stream._line(endpoint, relative=False))
+
+    def line_relative(self, *endpoint: Measurement):
+        """Queues a relative line movement."""
+        self._submit(lambda stream: stream._line(endpoint, relative=True))
+
+    def _line(self, endpoint, relative):
+        start = self._start_time()
+        starts = [axis.queue_state()[1] for axis in self.axes]
+        targets = []
+        for axis, position, measurement in zip(self.axes, starts, endpoint):
+            target = axis.to_base(measurement.value, measurement.unit)
+            target = position + target if relative else target
+            axis.check_range(target)
+            targets.append(target)
+        distances = [abs(target - position) for target, position in zip(targets, starts)]
+        length = math.sqrt(sum(distance**2 for distance in distances))
+        if length == 0:
+            return
+        speed = min(axis.max_velocity for axis in self.axes)
+        if self.max_speed is not None:
+            speed = min(speed, self.max_speed)
+        acceleration = min(axis.acceleration for axis in self.axes)
+
+        # Scale each axis so that all of them finish together
+        for axis, target, distance in zip(self.axes, targets, distances):
+            ratio = distance / length
+            if ratio == 0:
+                continue
+            axis.queue(
+                lambda t, p, target=target, ratio=ratio: Trapezoid(
+                    t, p, target, speed * ratio, acceleration * ratio
+                ),
+                start,
+            )
+
+
+class SimPvtSequence(SimSequence):
+    """
+    Simulated PVT sequence: cubic position-velocity-time segments.
+    """
+
+    def __init__(self, device, pvt_id: int):
+        super().__init__(device, pvt_id)
+        self.pvt_id = pvt_id
+        self._velocities = {}
+
+    def __repr__(self):
+        return "SimPvtSequence {} -> {}".format(self.pvt_id, self.device)
+
+    def point(self, positions, velocities, time: Measurement):
+        """Queues a point with absolute positions."""
+        self._submit(lambda sequence: sequence._point(positions, velocities, time, False))
+
+    def point_relative(self, positions, velocities, time: Measurement):
+        """Queues a point with positions relative to the previous point."""
+        self._submit(lambda sequence: sequence._point(positions, velocities, time, True))
+
+    def _point(self, positions, velocities, time, relative):
+        duration = time.value * TIME_UNITS[time.unit or Units.NATIVE]
+        if duration == 0:
+            return
+        start = self._start_time()
+        for i, axis in enumerate(self.axes):
+            position = axis.queue_state()[1]
+            target = axis.to_base(positions[i].value, positions[i].unit)
+            target = position + target if relative else target
+            axis.check_range(target)
+            if i < len(velocities) and velocities[i] is not None:
+                velocity = axis.to_base(velocities[i].value, velocities[i].unit, "velocity")
+            else:
+                velocity = (target - position) / duration
+            start_velocity = self._velocities.get(i, 0.0)
+            self._velocities[i] = velocity
+            axis.queue(
+                lambda t, p, v0=start_velocity, p1=target, v1=velocity: Hermite(
+                    t, p, v0, p1, v1, duration
+                ),
+                start,
+            )
+
+    def setup_live(self, *axes: int):
+        super().setup_live(*axes)
+        self._velocities = {}
+
+
+class SimStreams:
+    """
+    Stream access of a simulated device (see zaber_motion.ascii.Streams).
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self._streams = {}
+        self._buffers = {}
+
+    def get_stream(self, stream_id: int):
+        if stream_id not in self._streams:
+            self._streams[stream_id] = SimStream(self.device, stream_id)
+        return self._streams[stream_id]
+
+    def get_buffer(self, buffer_number: int):
+        if buffer_number not in self._buffers:
+            self._buffers[buffer_number] = SimBuffer(buffer_number)
+        return self._buffers[buffer_number]
+
+
+class SimPvt(SimStreams):
+    """
+    PVT access of a simulated device (see zaber_motion.ascii.Pvt).
+    """
+
+    def get_sequence(self, pvt_id: int):
+        if pvt_id not in self._streams:
+            self._streams[pvt_id] = SimPvtSequence(self.device, pvt_id)
+        return self._streams[pvt_id]
+
+
+class SimDevice:
+    """
+    Simulated single-axis device.
+    """
+
+    def __init__(self, connection, device_address: int, name: str, **axis_settings):
+        self.connection = connection
+        self.clock = connection.clock
+        self.device_address = device_address
+        self.name = name
+        self.axis = SimAxis(self, **axis_settings)
+        self.streams = SimStreams(self)
+        self.pvt = SimPvt(self)
+        self.io = SimDeviceIo(self)
+
+    def __repr__(self):
+        return "SimDevice {} ({})".format(self.device_address, self.name)
+
+    def get_axis(self, axis_number: int):
+        if axis_number != 1:
+            raise MotionLibException("Device has no axis {}".format(axis_number))
+        return self.axis
+
+
+class SimConnection:
+    """
+    In-process replacement of zaber_motion.ascii.Connection with X, Y, Z and
+    rotation devices modelled after the limits in constants.
+    """
+
+    def __init__(self, speedup: float = constants.SIM_SPEEDUP):
+        """Creates the simulated devices.
+
+        Args:
+            speedup (float): Virtual seconds per real second.
+
+        Returns:
+            None
+        """
+        self.clock = VirtualClock(speedup)
+        self.devices = [
+            SimDevice(
+                self,
+                1,
+                "X",
+                max_velocity=constants.MAX_X_VEL,
+                acceleration=constants.MAX_X_ACC,
+                limits=(constants.X_MIN, constants.X_MAX),
+                position=constants.X_MIN,
+            ),
+            SimDevice(
+                self,
+                2,
+                "Y",
+                max_velocity=constants.MAX_Y_VEL,
+                acceleration=constants.MAX_Y_ACC,
+                limits=(constants.Y_MIN, constants.Y_MAX),
+                position=constants.Y_MIN,
+            ),
+            SimDevice(
+                self,
+                3,
+                "Z",
+                max_velocity=constants.MAX_Z_VEL,
+                acceleration=constants.MAX_Z_ACC,
+                limits=(constants.Z_MIN, constants.Z_MAX),
+                position=constants.Z_MAX,
+            ),
+            SimDevice(
+                self,
+                4,
+                "Rotation",
+                max_velocity=constants.MAX_ROT_VEL,
+                acceleration=constants.MAX_ROT_ACC,
+                limits=None,
+                rotary=True,
+            ),
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def enable_alerts(self):
+        """Alerts are not needed by the simulator."""
+
+    def detect_devices(self):
+        """Returns the simulated devices in [x, y, z, rot] order."""
+        return list(self.devices)
+
+    def close(self):
+        """Stops all axes and prints the simulated time."""
+        for device in self.devices:
+            device.axis.stop(wait_until_idle=False)
+        print(
+            "Simulated {:.1f} s at {}x real time".format(
+                self.clock.time(), self.clock.speedup
+            )
+        )
+
+
+class SimTranslator:
+    """
+    Minimal single-axis G-code translator on top of a SimStream
+    (see zaber_motion.gcode.Translator). Rotary axes are programmed in degrees.
+    """
+
+    def __init__(self, stream: SimStream):
+        self.stream = stream
+        self.absolute = True
+        self.inches = False
+        self.feed_rate = 0.0
+        self.rapid = True
+        self.traverse_rate = None
+
+    @staticmethod
+    def setup(stream: SimStream, config=None):
+        """Sets up the translator on top of a simulated stream."""
+        return SimTranslator(stream)
+
+    def __repr__(self):
+        return "SimTranslator -> {}".format(self.stream)
+
+    def _units(self):
+        if self.stream.axes[0].rotary:
+            return Units.ANGLE_DEGREES, Units.ANGULAR_VELOCITY_DEGREES_PER_SECOND
+        return Units.LENGTH_MILLIMETRES, Units.VELOCITY_MILLIMETRES_PER_SECOND
+
+    def translate(self, block: str):
+        """Translates a single block (line) of G-code into stream commands."""
+        block = re.sub(r"\(.*?\)", "", block.split(";")[0]).upper()
+        words = re.findall(r"([A-Z])\s*([-+]?\d*\.?\d+)", block)
+        target = None
+        dwell = None
+        scale = 25.4 if self.inches else 1.0
+        for letter, value in words:
+            value = float(value)
+            if letter == "G":
+                if value in (0, 1):
+                    self.rapid = value == 0
+                elif value in (90, 91):
+                    self.absolute = value == 90
+                elif value in (20, 21):
+                    self.inches = value == 20
+                    scale = 25.4 if self.inches else 1.0
+                elif value == 4:
+                    dwell = 0.0
+                elif value not in (17, 94):
+                    raise MotionLibException("Unsupported G-code: G{:g}".format(value))
+            elif letter == "M":
+                if value in (2, 30):
+                    self.flush()
+                else:
+                    raise MotionLibException("Unsupported M-code: M{:g}".format(value))
+            elif letter == "F":
+                self.feed_rate = value * scale / 60
+            elif letter == "X":
+                target = value * scale
+            elif letter == "P" and dwell is not None:
+                dwell = value
+            elif letter != "N":
+                raise MotionLibException("Axis {} is not mapped".format(letter))
+
+        position_unit, velocity_unit = self._units()
+        if dwell is not None:
+            self.stream.wait(dwell, Units.TIME_SECONDS)
+        if target is None:
+            return
+        if self.rapid:
+            speed = self.traverse_rate or self.stream.axes[0].max_velocity
+            self.stream.set_max_speed(
+                self.stream.axes[0].from_base(speed, velocity_unit, "velocity"),
+                velocity_unit,
+            )
+        else:
+            if self.feed_rate <= 0:
+                raise MotionLibException("Feed rate is not set")
+            self.stream.set_max_speed(self.feed_rate, velocity_unit)
+        if self.absolute:
+            self.stream.line_absolute(Measurement(target, position_unit))
+        else:
+            self.stream.line_relative(Measurement(target, position_unit))
+
+    def flush(self, wait_until_idle: bool = True):
+        """Lines are queued immediately; optionally waits for the stream."""
+        if wait_until_idle:
+            self.stream.wait_until_idle()
+        return []
+
+    def reset_position(self):
+        """Positions are read from the stream, nothing to reset."""
+
+    def set_traverse_rate(self, traverse_rate: float, unit):
+        """Sets the speed of G0 moves."""
+        self.traverse_rate = self.stream.axes[0].to_base(traverse_rate, unit, "velocity")
+
+
+# The G-code translator matching the simulated streams
+SimStream.translator_class = SimTranslator
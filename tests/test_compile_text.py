@@ -0,0 +1,109 @@
+import random
+
+import numpy as np
+import pytest
+from gcodeparser import parse_gcode_lines
+
+import classes, functions
+
+START = [1.0, 2.0, 3.0, 0.5]
+KEYS = ("feed", "stop", "dwell", "laser", "line", "positions", "from_start")
+
+
+# Random Program of Simple and Other Lines
+def random_program(rng, n):
+    lines = []
+    for _ in range(n):
+        r = rng.random()
+        if r < 0.5:
+            command = rng.choice(["G1", "G0", "G01", "G00"])
+            words = [
+                "{}{}".format(
+                    letter, rng.choice([round(rng.uniform(0, 40), 3), 5, -1.5, ".5"])
+                )
+                for letter in rng.sample("XYZAF", rng.randint(0, 4))
+            ]
+            lines.append(
+                command + " " + " ".join(words) + rng.choice(["", ";c", " (x)", "\r"])
+            )
+        elif r < 0.6:
+            lines.append(rng.choice(["M3", "M4", "M5", "M3 S100", "M5 F3"]))
+        elif r < 0.65:
+            lines.append(rng.choice(["G4 P0.1", "G4 P0", "G4", "G04 P1"]))
+        elif r < 0.7:
+            lines.append(
+                rng.choice(
+                    ["G90", "G91", "G21", "G20", "G17", "G92 X1", "G18", "G94", "M30", ""]
+                )
+            )
+        elif r < 0.75:
+            lines.append(
+                rng.choice(
+                    ["G2 X10 Y10 I5 J0", "G3 X1 Y1 R5", "T1", "G1 X1 X2", "g1 x3", "M7"]
+                )
+            )
+        else:
+            lines.append(
+                rng.choice(["G1 X1 Y2 F10", "G1 A0.1", "G0 Z30", ";comment", "   "])
+            )
+    return "\n".join(lines)
+
+
+def assert_same_moves(expected, actual):
+    for key in KEYS:
+        np.testing.assert_array_equal(
+            np.asarray(actual[key], dtype=float),
+            np.asarray(expected[key], dtype=float),
+            err_msg=key,
+        )
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("mode", ["z", "digital"])
+def test_compile_text_matches_compile_gcode(seed, mode):
+    rng = random.Random(seed)
+    gate = classes.LaserGate(None, mode)
+    for _ in range(15):
+        program = random_program(rng, rng.randint(1, 60))
+        expected = functions.compile_gcode(
+            parse_gcode_lines(program), classes.GcodeState(START), gate
+        )
+        actual = functions.compile_text(program.encode(), classes.GcodeState(START), gate)
+        assert_same_moves(expected, actual)
+        assert actual["errors"] == expected["errors"]
+        assert actual["stop_before"] == expected["stop_before"]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_compile_text_chunks_join_like_one_program(seed):
+    rng = random.Random(seed)
+    gate = classes.LaserGate(None, "z")
+    for _ in range(15):
+        lines = random_program(rng, rng.randint(1, 60)).split("\n")
+        split = rng.randint(1, len(lines))
+        whole = classes.GcodeState(START)
+        expected = functions.compile_gcode(
+            parse_gcode_lines("\n".join(lines)), whole, gate
+        )
+        chunked = classes.GcodeState(START)
+        first = functions.compile_text(
+            ("\n".join(lines[:split]) + "\n").encode(), chunked, gate
+        )
+        rest = functions.compile_text(
+            "\n".join(lines[split:]).encode(), chunked, gate, split
+        )
+        assert_same_moves(expected, functions.join_moves([first, rest]))
+        assert (chunked.position, chunked.feed, chunked.laser) == (
+            whole.position,
+            whole.feed,
+            whole.laser,
+        )
+
+
+def test_dry_run_reports_range_and_time():
+    report = functions.dry_run("G0 X22 Y16\nM3\nG1 X23 F5\nG4 P0.5\nM5\nG0 X-5\n")
+    assert report["lines"] == 6
+    assert report["moves"] == 5
+    assert report["out_of_range"] == [6]
+    assert report["errors"] == []
+    assert report["time"] > 0.5
@@ -0,0 +1,79 @@
+import math
+
+import numpy as np
+import pytest
+from gcodeparser import parse_gcode_lines
+
+import classes
+
+ROOT3 = math.sqrt(3)
+
+
+def arc_points(program, start=(0.0, 0.0, 0.0, 0.0), tolerance=0.002):
+    state = classes.GcodeState(list(start), arc_tolerance=tolerance)
+    events = [state.step(line) for line in parse_gcode_lines(program)]
+    assert events[-1][0] == "arc"
+    return np.vstack([events[-1][1], events[-1][2]])
+
+
+def sweep(points, center):
+    # Signed angle swept around the center, positive counterclockwise
+    angles = np.unwrap(np.arctan2(points[:, 1] - center[1], points[:, 0] - center[0]))
+    return angles[-1] - angles[0]
+
+
+# Chord of 10 mm with R 10: centers 5√3 mm on either side
+@pytest.mark.parametrize(
+    "program, center, expected_sweep",
+    [
+        ("G2 X10 Y0 R10", (5, -5 * ROOT3), -math.pi / 3),
+        ("G2 X10 Y0 R-10", (5, 5 * ROOT3), -5 * math.pi / 3),
+        ("G3 X10 Y0 R10", (5, 5 * ROOT3), math.pi / 3),
+        ("G3 X10 Y0 R-10", (5, -5 * ROOT3), 5 * math.pi / 3),
+    ],
+)
+def test_r_form_center_follows_sign_and_direction(program, center, expected_sweep):
+    points = arc_points(program)
+    radii = np.hypot(points[:, 0] - center[0], points[:, 1] - center[1])
+    np.testing.assert_allclose(radii, 10, atol=1e-9)
+    assert sweep(points, center) == pytest.approx(expected_sweep, abs=1e-9)
+    np.testing.assert_allclose(points[-1], [10, 0, 0, 0], atol=1e-12)
+
+
+@pytest.mark.parametrize("program, direction", [("G2 X0 Y0 I5 J0", -1), ("G3 X0 Y0 I5", 1)])
+def test_arc_ending_at_its_start_is_a_full_circle(program, direction):
+    points = arc_points(program)
+    assert len(points) > 100
+    np.testing.assert_allclose(np.hypot(points[:, 0] - 5, points[:, 1]), 5, atol=1e-9)
+    assert sweep(points, (5, 0)) == pytest.approx(direction * 2 * math.pi, abs=1e-9)
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 0.01, 0.002])
+@pytest.mark.parametrize("radius", [0.5, 3, 40])
+def test_chords_stay_within_the_tolerance(tolerance, radius):
+    points = arc_points(
+        "G3 X{} Y{} I{} J0".format(radius, radius, radius),
+        start=(0, 0, 0, 0),
+        tolerance=tolerance,
+    )
+    middle = (points[1:, :2] + points[:-1, :2]) / 2
+    sagitta = radius - np.hypot(middle[:, 0] - radius, middle[:, 1])
+    assert sagitta.max() <= tolerance * (1 + 1e-9)
+    # One chord fewer would break the tolerance
+    chords = len(points) - 1
+    angle = abs(sweep(points, (radius, 0)))
+    assert angle == pytest.approx(3 * math.pi / 2)
+    if chords > 1:
+        assert radius * (1 - math.cos(angle / (chords - 1) / 2)) > tolerance
+
+
+def test_out_of_plane_axes_move_linearly_along_the_arc():
+    points = arc_points("G3 X10 Y0 Z5 A1 R-10")
+    np.testing.assert_allclose(np.diff(points[:, 2]), 5 / (len(points) - 1), atol=1e-12)
+    assert points[-1, 3] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("program", ["G2 X30 Y0 R10", "G2 X0 Y0 R10", "G2 X10 Y0"])
+def test_ill_defined_arc_is_unknown(program):
+    state = classes.GcodeState([0.0, 0.0, 0.0, 0.0])
+    assert state.step(next(iter(parse_gcode_lines(program)))) == ("unknown",)
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+from gcodeparser import parse_gcode_lines
+
+import classes, constants, functions
+
+LINEAR_ACC = np.array([constants.MAX_X_ACC, constants.MAX_Y_ACC, constants.MAX_Z_ACC])
+LINEAR_VEL = np.array([constants.MAX_X_VEL, constants.MAX_Y_VEL, constants.MAX_Z_VEL])
+
+
+def random_path(seed, n):
+    rng = np.random.default_rng(seed)
+    positions = np.zeros((n + 1, 4))
+    positions[0, :3] = (20, 15, 10)
+    steps = rng.normal(scale=(2, 2, 0.2), size=(n, 3))
+    steps[rng.random(n) < 0.1] = 0  # Zero-length moves
+    positions[1:, :3] = positions[0, :3] + np.cumsum(steps, axis=0)
+    feeds = rng.choice([np.inf, 5.0, 20.0, 80.0], size=n)
+    stops = rng.random(n) < 0.1
+    return positions, feeds, stops, np.zeros(n)
+
+
+def assert_plan_within_limits(plan, feeds, stops, entry):
+    eps = 1e-9
+    assert plan["entry"][0] == pytest.approx(entry)
+    assert plan["exit"][-1] == 0
+    assert np.all(plan["exit"][stops] == 0)
+    np.testing.assert_allclose(plan["entry"][1:], plan["exit"][:-1], atol=eps)
+
+    moving = plan["length"] > 0
+    length = plan["length"][moving]
+    acceleration = plan["acceleration"][moving]
+    entry_speed, exit_speed = plan["entry"][moving], plan["exit"][moving]
+    cruise = plan["cruise"][moving]
+    # Speed changes are reachable within each move
+    assert np.all(np.abs(exit_speed**2 - entry_speed**2) <= 2 * acceleration * length + eps)
+    assert np.all(cruise <= feeds[moving] + eps)
+    assert np.all(cruise >= np.maximum(entry_speed, exit_speed) - eps)
+    # Every axis stays within its velocity and acceleration limits
+    share = np.abs(plan["delta"][moving, :3]) / length[:, None]
+    assert np.all(share * cruise[:, None] <= LINEAR_VEL + 1e-6)
+    assert np.all(share * acceleration[:, None] <= LINEAR_ACC + 1e-6)
+    # The phases cover the move
+    covered = (
+        (entry_speed + cruise) / 2 * plan["t_acc"][moving]
+        + cruise * plan["t_cruise"][moving]
+        + (cruise + exit_speed) / 2 * plan["t_dec"][moving]
+    )
+    np.testing.assert_allclose(covered, length, rtol=1e-6, atol=1e-9)
+    assert np.all(plan["t_acc"] >= 0) and np.all(plan["t_dec"] >= 0)
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("entry", [0.0, 1.0])
+def test_plan_moves_ends_at_rest_within_limits(seed, entry):
+    positions, feeds, stops, dwells = random_path(seed, 200)
+    plan = functions.plan_moves(positions, feeds, stops, dwells, entry)
+    assert_plan_within_limits(plan, feeds, stops, entry)
+
+
+def test_straight_line_is_not_slowed_at_its_joints():
+    positions = np.zeros((11, 4))
+    positions[:, 0] = np.linspace(10, 30, 11)
+    feeds = np.full(10, 5.0)
+    plan = functions.plan_moves(positions, feeds, np.zeros(10, bool), np.zeros(10))
+    np.testing.assert_allclose(plan["exit"][2:-2], 5.0)
+
+
+def test_dwell_holds_still_between_stops():
+    positions = np.array([[20, 15, 10, 0], [22, 15, 10, 0], [22, 15, 10, 0], [24, 15, 10, 0]])
+    plan = functions.plan_moves(
+        positions, np.full(3, 5.0), np.array([False, True, False]), np.array([0, 0.5, 0])
+    )
+    assert plan["exit"][0] == 0 and plan["entry"][2] == 0
+    assert plan["t_cruise"][1] == 0.5
+
+
+@pytest.mark.parametrize("mode", ["z", "digital"])
+def test_compile_gcode_stops_at_laser_switches_and_dwells(mode):
+    gate = classes.LaserGate(None, mode)
+    compiled = functions.compile_gcode(
+        parse_gcode_lines("G0 X22 Y16\nM3\nG1 X23 F5\nG4 P0.5\nM5\nG1 Y17 F5\n"),
+        classes.GcodeState([20.0, 15.0, 10.0, 0.0]),
+        gate,
+    )
+    positions = compiled["positions"]
+    dwell = np.flatnonzero(compiled["dwell"])
+    assert compiled["dwell"][dwell].tolist() == [0.5]
+    assert compiled["stop"][dwell - 1].all() and compiled["stop"][dwell].all()
+    np.testing.assert_allclose(positions[-1, :2], [23, 17])
+    if gate.digital:
+        assert compiled["laser"].tolist() == [False, True, True, False]
+        assert np.all(positions[:, 2] == 10)
+    else:
+        assert not compiled["laser"].any()
+        z = positions[1:, 2]
+        assert z[compiled["line"] == 1].tolist() == [gate.focus_z]
+        assert z[compiled["line"] == 4].tolist() == [constants.Z_MAX]
+    plan = functions.plan_moves(
+        positions, compiled["feed"], compiled["stop"], compiled["dwell"]
+    )
+    assert_plan_within_limits(plan, compiled["feed"], compiled["stop"], 0.0)